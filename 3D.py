@@ -2,11 +2,12 @@ import sys
 import os
 
 import matplotlib.pyplot as plt
-import numpy as np
+
+from parsers.epoch_parser import load_groups
 
 
 def main():
-    files = os.listdir("groups")
+    files = [file for file in os.listdir("groups") if file.endswith(".groups")]
 
     data = dict()
     global_groups = []
@@ -15,7 +16,7 @@ def main():
     for file in files:
         file_name = "groups/" + file
         epoch = file.split(".")[0]
-        group, channel, velocity, ra, dec = np.loadtxt(file_name, unpack=True, usecols=(0, 1, 2, 5, 6))
+        group, channel, velocity, intensity, integral_intensity, ra, dec = load_groups(file_name, unpack=True)
         groups = list(set(group))
         global_groups += groups
         global_epochs.append(epoch)
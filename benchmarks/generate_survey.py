@@ -0,0 +1,37 @@
+"""
+write synthetic survey of maser spots: .out and .groups epoch files, configuration file, track table and true
+group parameters, the survey directory can be used as working directory of the analysis scripts
+
+run from repository root: python -m benchmarks.generate_survey survey --spots 10000
+"""
+import sys
+import argparse
+
+from utils.synthetic import generate_survey, write_survey
+
+
+def main(directory, spots, epochs, spots_per_group, noise, motion, detection, seed):
+    survey = generate_survey(spots, epochs=epochs, spots_per_group=spots_per_group, noise=noise, motion=motion,
+                             detection=detection, seed=seed)
+    write_survey(survey, directory)
+    print("Groups", len(survey["truth"]))
+    for epoch, groups in zip(survey["epochs"], survey["groups"]):
+        print(epoch, "spots", len(groups))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='write synthetic survey of maser spots')
+    parser.add_argument('directory', type=str, help='survey directory')
+    parser.add_argument('--spots', type=int, help='spots of every epoch when all groups are detected', default=1000)
+    parser.add_argument('--epochs', type=int, help='number of epochs', default=5)
+    parser.add_argument('--spots_per_group', type=int, help='channels of every group', default=5)
+    parser.add_argument('--noise', type=float, help='standard deviation of intensity noise', default=0.05)
+    parser.add_argument('--motion', type=float, help='standard deviation of proper motion in mas per year',
+                        default=0.3)
+    parser.add_argument('--detection', type=float, help='probability that a group is detected in an epoch',
+                        default=0.9)
+    parser.add_argument('--seed', type=int, help='random seed', default=0)
+    args = parser.parse_args()
+    main(args.directory, args.spots, args.epochs, args.spots_per_group, args.noise, args.motion, args.detection,
+         args.seed)
+    sys.exit(0)
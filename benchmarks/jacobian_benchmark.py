@@ -0,0 +1,87 @@
+"""
+compare analytic jacobian and finite difference gaussian fits on epoch spectra
+
+run from repository root: python -m benchmarks.jacobian_benchmark
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from parsers.configparser_ import get_file_order
+from parsers.epoch_parser import load_group_index
+from utils.fitting import fit, MAXFEV
+
+
+def get_spectra(groups_dir):
+    """
+
+    :param groups_dir: directory with .groups files
+    :return: list of (epoch, group, velocity, intensity) for groups with at least 6 channels
+    """
+    spectra = []
+    for file in get_file_order():
+        epoch = file.split(".")[0]
+        group_index = load_group_index(groups_dir + "/" + epoch + ".groups")
+        for group in group_index.groups:
+            rows = np.sort(group_index.rows(group), order=["velocity"])
+            if len(rows) >= 6:
+                spectra.append((epoch, group, rows["velocity"], rows["intensity"]))
+    return spectra
+
+
+def get_starts(velocity, intensity):
+    """
+    same initial guesses as g78s.py
+    """
+    p1 = [max(intensity), min(velocity) + 0.5 * (max(velocity) - min(velocity)), 0.2]
+    p2 = [max(intensity), min(velocity) + 0.5 * (max(velocity) - min(velocity)), 0.3,
+          max(intensity) / 4, min(velocity) + 0.5 * (max(velocity) - min(velocity)), 0.1]
+    return [p1, p2]
+
+
+def run(spectra, analytic_jacobian, maxfev):
+    """
+
+    :return: dict with totals of function evaluations, jacobian evaluations, wall time and fit outcomes
+    """
+    stats = {"fits": 0, "success": 0, "maxfev": 0, "nfev": 0, "njev": 0, "time": 0.0}
+    for epoch, group, velocity, intensity in spectra:
+        for p0 in get_starts(velocity, intensity):
+            start = time.perf_counter()
+            result = fit(velocity, intensity, p0, maxfev=maxfev, analytic_jacobian=analytic_jacobian)
+            stats["time"] += time.perf_counter() - start
+            stats["fits"] += 1
+            stats["nfev"] += result.nfev
+            stats["njev"] += result.njev
+            if result.success:
+                stats["success"] += 1
+            elif "maxfev" in result.message:
+                stats["maxfev"] += 1
+    return stats
+
+
+def main(groups_dir, maxfev, repeat):
+    spectra = get_spectra(groups_dir)
+    print("Spectra", len(spectra))
+    if len(spectra) == 0:
+        return
+
+    print("%-20s %8s %8s %8s %10s %10s %12s" % ("jacobian", "fits", "success", "maxfev", "nfev", "njev", "time (s)"))
+    for name, analytic_jacobian in (("finite difference", False), ("analytic", True)):
+        stats = [run(spectra, analytic_jacobian, maxfev) for r in range(0, repeat)]
+        best_time = min(s["time"] for s in stats)
+        s = stats[0]
+        print("%-20s %8d %8d %8d %10d %10d %12.4f" % (name, s["fits"], s["success"], s["maxfev"], s["nfev"],
+                                                      s["njev"], best_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='compare analytic jacobian and finite difference fits')
+    parser.add_argument('--groups_dir', type=str, help='directory with .groups files', default="groups")
+    parser.add_argument('--maxfev', type=int, help='maximum number of function evaluations', default=MAXFEV)
+    parser.add_argument('--repeat', type=int, help='number of timing repeats', default=3)
+    args = parser.parse_args()
+    main(args.groups_dir, args.maxfev, args.repeat)
+    sys.exit(0)
@@ -0,0 +1,287 @@
+"""
+throughput and peak memory of loaders, gaussian fitting, test.py cross epoch matching, mean_motion aggregation and
+linear_fit on synthetic surveys of growing size, results can be compared with a saved baseline to catch regressions
+
+run from repository root: python -m benchmarks.scaling_benchmark --sizes 100 1000 10000 --output scaling.json
+"""
+import os
+import sys
+import csv
+import json
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from parsers.epoch_parser import load_out, load_groups, load_group_index
+from parsers.table_parser import load_table
+from utils import metrics
+from utils.fitting import fit_epochs
+from utils.matching import match_epochs, connected_groups, close_runs
+from utils.proper_motion import fit_linear_motions
+from utils.regions import aggregate_runs
+from utils.synthetic import generate_survey, write_survey
+
+SIZES = [100, 1000, 10000, 100000, 1000000]
+STAGES = ["load_out", "load_out_cached", "load_groups", "load_groups_cached", "group_index", "load_table", "fit",
+          "match", "mean_motion", "linear_fit"]
+# library functions record their own stages as "fit", "match", "load_table", ..., stages of same name are summed
+STAGE_PREFIX = "bench_"
+COLUMNS = ["spots", "stage", "items", "wall_time", "throughput", "peak_increase"]
+
+
+def run_stages(directory, survey, max_fits):
+    """
+    run every stage once on survey written to directory, epoch files are not cached yet
+
+    :return: dict stage: number of processed items (spots, rows or fitted groups)
+    """
+    out_files = [os.path.join(directory, "data_files", epoch + ".out") for epoch in survey["epochs"]]
+    groups_files = [os.path.join(directory, "groups", epoch + ".groups") for epoch in survey["epochs"]]
+    items = dict()
+
+    with metrics.stage(STAGE_PREFIX + "load_out"):
+        epochs = [np.array(load_out(file)) for file in out_files]
+    with metrics.stage(STAGE_PREFIX + "load_out_cached"):
+        epochs = [np.array(load_out(file)) for file in out_files]
+    items["load_out"] = items["load_out_cached"] = sum(len(epoch) for epoch in epochs)
+    with metrics.stage(STAGE_PREFIX + "load_groups"):
+        groups = [np.array(load_groups(file)) for file in groups_files]
+    with metrics.stage(STAGE_PREFIX + "load_groups_cached"):
+        groups = [np.array(load_groups(file)) for file in groups_files]
+    items["load_groups"] = items["load_groups_cached"] = sum(len(epoch) for epoch in groups)
+    with metrics.stage(STAGE_PREFIX + "group_index"):
+        group_indexes = [load_group_index(file) for file in groups_files]
+    items["group_index"] = items["load_groups"]
+
+    # fitting time per group does not depend on survey size, so only first max_fits groups of first epoch are fitted
+    fitted = group_indexes[0].groups[0:max_fits]
+    rows = groups[0][np.isin(groups[0]["group_nr"], fitted)]
+    with metrics.stage(STAGE_PREFIX + "fit"):
+        fit_epochs({survey["epochs"][0]: (rows["group_nr"], rows["velocity"], rows["intensity"])})
+    items["fit"] = len(fitted)
+
+    with metrics.stage(STAGE_PREFIX + "match"):
+        ra = np.concatenate([epoch["ra"] for epoch in epochs])
+        dec = np.concatenate([epoch["dec"] for epoch in epochs])
+        velocity = np.concatenate([epoch["velocity"] for epoch in epochs])
+        epoch_ids = np.concatenate([np.full(len(epochs[index]), index) for index in range(0, len(epochs))])
+        nodes1, nodes2 = match_epochs(ra, dec, velocity, epoch_ids, radius=10.0)[0:2]
+        connected_groups(len(ra), nodes1, nodes2)
+    items["match"] = len(ra)
+
+    with metrics.stage(STAGE_PREFIX + "load_table"):
+        table = load_table(os.path.join(directory, "output2", "output.dat"))
+    columns = list(table.values())
+    velocity = columns[0]
+    ras = np.array(columns[1::3], dtype=float)
+    decs = np.array(columns[2::3], dtype=float)
+    fluxes = np.array(columns[3::3], dtype=float)
+    items["load_table"] = items["mean_motion"] = items["linear_fit"] = len(velocity)
+
+    with metrics.stage(STAGE_PREFIX + "mean_motion"):
+        starts, ends = close_runs(ras[0], decs[0], 1.27)
+        aggregate_runs(starts, ends, velocity, ras, decs, fluxes)
+
+    with metrics.stage(STAGE_PREFIX + "linear_fit"):
+        starts, ends = close_runs(ras[0], decs[0], 1.27)
+        runs = aggregate_runs(starts, ends, velocity, ras, decs, fluxes)
+        mjd = survey["mjd"] - survey["mjd"][0]
+        fit_linear_motions(mjd, (runs["x"] / runs["count"]).T)
+        fit_linear_motions(mjd, (runs["y"] / runs["count"]).T)
+    return items
+
+
+def benchmark_size(spots, epochs, repeat, max_fits, seed, work_dir, trace_memory):
+    """
+    survey of spots spots in all epochs is written once, every run works on fresh copy, so loaders start without
+    binary caches, tracing slows python code down, so times are taken from repeat runs without tracing and peak
+    memory from one more traced run
+
+    :return: list of result rows with fastest wall time of repeats and peak increase of memory in stage, peak
+    increase is increase of peak resident set size without trace_memory
+    """
+    survey = generate_survey(max(1, spots // epochs), epochs=epochs, seed=seed)
+    survey_directory = os.path.join(work_dir, "survey_%d" % spots)
+    write_survey(survey, survey_directory)
+
+    wall_times = {name: [] for name in STAGES}
+    peak_increases = {name: 0 for name in STAGES}
+    for index in range(0, repeat + 1 if trace_memory else repeat):
+        tracing = index == repeat
+        # group indexes are also kept in memory by path, so every run uses own directory
+        directory = os.path.join(work_dir, "run_%d_%d" % (spots, index))
+        shutil.copytree(survey_directory, directory)
+        metrics.reset()
+        if tracing:
+            tracemalloc.start()
+        try:
+            items = run_stages(directory, survey, max_fits)
+        finally:
+            if tracing:
+                tracemalloc.stop()
+            shutil.rmtree(directory)
+        stages = metrics.report()["stages"]
+        for name in STAGES:
+            if not tracing:
+                wall_times[name].append(stages[STAGE_PREFIX + name]["wall_time"])
+            if tracing or not trace_memory:
+                peak_increases[name] = max(peak_increases[name], stages[STAGE_PREFIX + name]["peak_increase"])
+    shutil.rmtree(survey_directory)
+
+    results = []
+    for name in STAGES:
+        wall_time = min(wall_times[name])
+        results.append({"spots": spots, "stage": name, "items": items[name], "wall_time": wall_time,
+                        "throughput": items[name] / wall_time if wall_time > 0 else float("inf"),
+                        "peak_increase": peak_increases[name]})
+    return results
+
+
+def write_results(results, file):
+    """
+    write results as CSV if file name ends with .csv, else as JSON
+
+    :param results: list of result rows
+    :param file: results file
+    :return: None
+    """
+    directory = os.path.dirname(file)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    if not file.endswith(".csv"):
+        with open(file, "w") as results_file:
+            json.dump(results, results_file, indent=1)
+        return
+
+    with open(file, "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def read_results(file):
+    """
+
+    :param file: JSON or CSV results file of write_results
+    :return: list of result rows
+    """
+    if not file.endswith(".csv"):
+        with open(file) as results_file:
+            return json.load(results_file)
+
+    with open(file, newline="") as results_file:
+        return [{"spots": int(row["spots"]), "stage": row["stage"], "items": int(row["items"]),
+                 "wall_time": float(row["wall_time"]), "throughput": float(row["throughput"]),
+                 "peak_increase": int(row["peak_increase"])} for row in csv.DictReader(results_file)]
+
+
+def compare(results, baseline, tolerance, min_time, min_memory):
+    """
+    stages with same size in results and baseline are compared, short stages and small allocations are skipped
+    because their timings and peaks are mostly noise
+
+    :param results: list of result rows
+    :param baseline: list of result rows of baseline run
+    :param tolerance: allowed relative increase of wall time and peak memory
+    :param min_time: baseline wall time in seconds below which wall time is not compared
+    :param min_memory: baseline peak increase in bytes below which peak increase is not compared
+    :return: list of regression descriptions
+    """
+    baseline = {(row["spots"], row["stage"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        reference = baseline.get((row["spots"], row["stage"]))
+        if reference is None:
+            continue
+        for key, minimum in (("wall_time", min_time), ("peak_increase", min_memory)):
+            if reference[key] >= minimum and row[key] > reference[key] * (1.0 + tolerance):
+                regressions.append("%s %d spots %s %.4g -> %.4g (x%.2f)" % (
+                    row["stage"], row["spots"], key, reference[key], row[key], row[key] / reference[key]))
+    return regressions
+
+
+def plot_results(results, file):
+    """
+    throughput and peak memory curves of every stage against number of spots
+
+    :param results: list of result rows
+    :param file: figure file
+    :return: None
+    """
+    from utils.plotting import get_pyplot
+
+    plt = get_pyplot(batch=True)
+    figure, (throughput_plot, memory_plot) = plt.subplots(1, 2, figsize=(14, 6))
+    for name in STAGES:
+        rows = [row for row in results if row["stage"] == name]
+        spots = [row["spots"] for row in rows]
+        throughput_plot.loglog(spots, [row["throughput"] for row in rows], marker="o", label=name)
+        memory_plot.loglog(spots, [max(row["peak_increase"], 1) for row in rows], marker="o", label=name)
+    throughput_plot.set_xlabel("spots")
+    throughput_plot.set_ylabel("items / s")
+    memory_plot.set_xlabel("spots")
+    memory_plot.set_ylabel("peak memory increase (bytes)")
+    throughput_plot.legend(fontsize=8)
+    figure.tight_layout()
+    figure.savefig(file)
+    plt.close(figure)
+
+
+def main(sizes, epochs, repeat, max_fits, seed, output, baseline, tolerance, min_time, min_memory, plot, work_dir,
+         trace_memory):
+    work_dir = tempfile.mkdtemp(prefix="scaling_benchmark_", dir=work_dir)
+    results = []
+    print("%10s %-20s %10s %12s %14s %14s" % ("spots", "stage", "items", "time (s)", "items / s", "memory (MB)"))
+    try:
+        # imports and first call setup of scipy are not part of first size
+        benchmark_size(min(sizes), epochs, 1, 1, seed, work_dir, False)
+        for spots in sizes:
+            for row in benchmark_size(spots, epochs, repeat, max_fits, seed, work_dir, trace_memory):
+                results.append(row)
+                print("%10d %-20s %10d %12.4f %14.1f %14.2f" % (row["spots"], row["stage"], row["items"],
+                                                                row["wall_time"], row["throughput"],
+                                                                row["peak_increase"] / 2 ** 20))
+    finally:
+        shutil.rmtree(work_dir)
+
+    write_results(results, output)
+    if plot is not None:
+        plot_results(results, plot)
+    if baseline is None:
+        return True
+
+    regressions = compare(results, read_results(baseline), tolerance, min_time, min_memory)
+    for regression in regressions:
+        print("Regression", regression)
+    return len(regressions) == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='scaling benchmark of analysis stages on synthetic surveys')
+    parser.add_argument('--sizes', type=int, nargs='+', help='number of spots of all epochs of surveys',
+                        default=SIZES)
+    parser.add_argument('--epochs', type=int, help='number of epochs of surveys', default=5)
+    parser.add_argument('--repeat', type=int, help='number of timing repeats', default=3)
+    parser.add_argument('--max_fits', type=int, help='maximal number of fitted groups', default=200)
+    parser.add_argument('--seed', type=int, help='random seed of surveys', default=0)
+    parser.add_argument('--output', type=str, help='JSON or CSV (.csv) results file',
+                        default="scaling_benchmark.json")
+    parser.add_argument('--baseline', type=str, help='results file of earlier run, exit status is 1 on regression',
+                        default=None)
+    parser.add_argument('--tolerance', type=float, help='allowed relative increase of time and memory', default=0.5)
+    parser.add_argument('--min_time', type=float, help='shorter baseline times are not compared', default=0.05)
+    parser.add_argument('--min_memory', type=int, help='smaller baseline peak increases in bytes are not compared',
+                        default=2 ** 20)
+    parser.add_argument('--plot', type=str, help='figure file of throughput and memory curves', default=None)
+    parser.add_argument('--work_dir', type=str, help='directory of temporary surveys, default system temporary '
+                                                     'directory', default=None)
+    parser.add_argument('--no_tracemalloc', action='store_true',
+                        help='no traced run, peak increase is then increase of peak resident set size of process')
+    args = parser.parse_args()
+    if not main(args.sizes, args.epochs, args.repeat, args.max_fits, args.seed, args.output, args.baseline,
+                args.tolerance, args.min_time, args.min_memory, args.plot, args.work_dir, not args.no_tracemalloc):
+        sys.exit(1)
+    sys.exit(0)
@@ -1,34 +1,114 @@
+import os
 import sys
 import argparse
+from itertools import islice
+from multiprocessing import Pool
+
 import numpy as np
 
+CHUNK_SIZE = 100000
 
-def main(input_file, output_file, ref_vel):
-    ref_vel = float(ref_vel)
-    input_data = np.loadtxt(input_file, unpack=True)
-    data_length = input_data[0].shape[0]
-    chan = input_data[0]
-    vlsr = input_data[1]
-    intensity = input_data[2]
-    integral = input_data[3]
 
-    reference_index = (np.abs(vlsr - ref_vel)).argmin()
-    ra = (input_data[6] - input_data[6][reference_index]) * np.cos(np.radians(input_data[7][reference_index])) * 15000
-    dec = (input_data[9] - input_data[9][reference_index]) * 1000
+def read_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """
+    read text table in chunks of rows, whole file is never in memory
 
-    output_data = []
-    for i in range(0, data_length):
-        output_data.append([chan[i], vlsr[i], intensity[i], integral[i], ra[i], dec[i]])
+    :param input_file: input file
+    :param chunk_size: number of lines in chunk
+    :return: generator of 2d arrays
+    """
+    with open(input_file) as input_data:
+        while True:
+            lines = list(islice(input_data, chunk_size))
+            if len(lines) == 0:
+                break
+            chunk = np.loadtxt(lines, ndmin=2)
+            if chunk.size > 0:
+                yield chunk
 
-    np.savetxt(output_file, output_data)
 
-    sys.exit(0)
+def find_reference(input_file, ref_vel, chunk_size=CHUNK_SIZE):
+    """
+    first pass over file
+
+    :param input_file: input file
+    :param ref_vel: reference maser velocity
+    :param chunk_size: number of lines in chunk
+    :return: row with velocity closest to ref_vel, first one if there are several
+    """
+    reference = None
+    for chunk in read_chunks(input_file, chunk_size):
+        index = (np.abs(chunk[:, 1] - ref_vel)).argmin()
+        if reference is None or abs(chunk[index, 1] - ref_vel) < abs(reference[1] - ref_vel):
+            reference = chunk[index]
+    return reference
+
+
+def convert_chunk(chunk, reference):
+    """
+
+    :param chunk: rows of input file
+    :param reference: reference row
+    :return: array with columns channel, velocity, intensity, integral, ra and dec offsets in mas
+    """
+    ra = (chunk[:, 6] - reference[6]) * np.cos(np.radians(reference[7])) * 15000
+    dec = (chunk[:, 9] - reference[9]) * 1000
+    return np.column_stack((chunk[:, 0:4], ra, dec))
+
+
+def convert_file(input_file, output_file, ref_vel, chunk_size=CHUNK_SIZE):
+    """
+    convert one file in two streaming passes, first finds reference row, second writes offsets chunk by chunk,
+    output is written to temporary file that replaces output file at end, so output file may be input file
+
+    :param input_file: input file
+    :param output_file: output file
+    :param ref_vel: reference maser velocity
+    :param chunk_size: number of lines in chunk
+    :return: output file
+    """
+    reference = find_reference(input_file, ref_vel, chunk_size)
+    tmp_file = output_file + ".%d.tmp" % os.getpid()
+    try:
+        with open(tmp_file, "w") as output_data:
+            if reference is not None:
+                for chunk in read_chunks(input_file, chunk_size):
+                    np.savetxt(output_data, convert_chunk(chunk, reference))
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return output_file
+
+
+def main(input_files, output_files, ref_vel, processes=1, chunk_size=CHUNK_SIZE):
+    ref_vel = float(ref_vel)
+    tasks = [(input_files[i], output_files[i], ref_vel, chunk_size) for i in range(0, len(input_files))]
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            convert_file(*task)
+    else:
+        with Pool(processes) as p:
+            p.starmap(convert_file, tasks)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='convert')
-    parser.add_argument('input_file_name', type=str, help='Input file name')
-    parser.add_argument('output_file_name', type=str, help='Output file name')
+    parser.add_argument('files', type=str, nargs='+',
+                        help='Input file name and output file name, or input file names with --output_dir')
+    parser.add_argument('--output_dir', type=str, help='Output directory, output files keep input file names',
+                        default=None)
     parser.add_argument('--rev_vel', type=float, help='Reference maser velocity', default=-4944.5)
+    parser.add_argument('--processes', type=int, help='Number of worker processes, default cpu count', default=None)
+    parser.add_argument('--chunk_size', type=int, help='Number of rows converted at once', default=CHUNK_SIZE)
     args = parser.parse_args()
-    main(args.input_file_name, args.output_file_name, args.rev_vel)
+    if args.output_dir is None:
+        if len(args.files) != 2:
+            parser.error("without --output_dir give one input file name and one output file name")
+        input_file_names, output_file_names = [args.files[0]], [args.files[1]]
+    else:
+        os.makedirs(args.output_dir, exist_ok=True)
+        input_file_names = args.files
+        output_file_names = [os.path.join(args.output_dir, os.path.basename(file)) for file in args.files]
+    main(input_file_names, output_file_names, args.rev_vel, args.processes, args.chunk_size)
+    sys.exit(0)
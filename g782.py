@@ -1,13 +1,13 @@
 import sys
 import argparse
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm
 from matplotlib import rc
 from matplotlib.patches import Circle
 from matplotlib.ticker import MultipleLocator
 import numpy as np
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from utils.plotting import velocity_colors, draw_spots, draw_spectrum
 
 
 def get_configs(section, key):
@@ -28,7 +28,7 @@ def main(ispec_files_dir, input_files_dir):
     minorLocatory = MultipleLocator(20)
     minorLocatorvel = MultipleLocator(1)
 
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    file_order = get_file_order()
     ispec_files = []
     input_files = []
     file_pairs = []
@@ -37,7 +37,7 @@ def main(ispec_files_dir, input_files_dir):
         input_files.append(file)
         file_pairs.append((file.split(".")[0].upper() + "_FRING.ISPEC", file))
 
-    dates = {file.split("-")[0].strip():file.split("-")[1].strip() for file in get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
 
     fig, ax = plt.subplots(nrows=2, ncols=5, figsize=(16, 16), gridspec_kw={'height_ratios': [2, 2]})
 
@@ -48,7 +48,6 @@ def main(ispec_files_dir, input_files_dir):
     v_s =[]
     vms = []
     vxs = []
-    dvs = []
     ss = []
     ras = []
     decs = []
@@ -60,7 +59,6 @@ def main(ispec_files_dir, input_files_dir):
 
         ch, v10, i1, i2, ra, dec = np.loadtxt(input_file, unpack=True)
         v1 = v10 / 1000.
-        dv = (v1.max() - v1.min())
         vm = v1.min()
         vx = v1.max()
 
@@ -70,7 +68,6 @@ def main(ispec_files_dir, input_files_dir):
         v_s.append(v)
         vms.append(vm)
         vxs.append(vx)
-        dvs.append(dv)
         ss.append(s)
         ras.append(ra)
         decs.append(dec)
@@ -85,7 +82,6 @@ def main(ispec_files_dir, input_files_dir):
         v = v_s[index]
         vm = vms[index]
         vx = vxs[index]
-        dv = dvs[index]
         s = ss[index]
         ra = ras[index]
         dec = decs[index]
@@ -93,26 +89,14 @@ def main(ispec_files_dir, input_files_dir):
         i1 = i1s[index]
         title = file_pairs[index][0].split("_")[0].upper() + "-" + dates[file_pairs[index][1].split(".")[0]]
         ax[0][0].set_ylabel('Flux density (Jy)', fontsize=12)
-        for i in range(len(v) - 1):
-            if v[i] < vm or v[i] > vx:
-                c = (0, 0, 0)
-            else:
-                c = cm.jet((v[i] - vm) / dv, 1)
-
-            ax[0][index].plot((v[i], v[i + 1]), (s[i], s[i + 1]), c=c, lw=2)
-            ax[0][index].set_xlim(-12, -2)
-            ax[0][index].xaxis.set_minor_locator(minorLocatorvel)
-            ax[0][index].set_title(title, size=12)
-            ax[0][index].set_xlabel('$V_{\\rm LSR}$ (km s$^{-1}$)', fontsize=12)
-
-        rel = []
+        draw_spectrum(ax[0][index], v, s, velocity_colors(v, vm, vx))
+        ax[0][index].set_xlim(-12, -2)
+        ax[0][index].xaxis.set_minor_locator(minorLocatorvel)
+        ax[0][index].set_title(title, size=12)
+        ax[0][index].set_xlabel('$V_{\\rm LSR}$ (km s$^{-1}$)', fontsize=12)
+
         ax[1][0].set_ylabel('$\\Delta$ Dec (mas)', fontsize=12)
-        for i in range(len(ra)):
-            el = Circle((ra[i], dec[i]), radius=10 * np.sqrt(i1[i]), angle=0, lw=2)
-            ax[1][index].add_artist(el)
-            c = cm.jet((v1[i] - vm) / dv, 1)
-            el.set_facecolor(c)
-            rel.append([ra[i], dec[i], v1[i]])
+        draw_spots(ax[1][index], ra, dec, 10 * np.sqrt(i1), velocity_colors(v1, vm, vx))
         ax[1][index].add_artist(
             Circle((285, -200), radius=10, angle=0, edgecolor='black', facecolor='white', alpha=0.9))
         ax[1][index].annotate('1 Jy beam$^{-1}$', [275, -200], fontsize=12)
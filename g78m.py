@@ -1,25 +1,13 @@
 import sys
 import argparse
 
-from matplotlib import cm
-from matplotlib import rcParams
-from matplotlib.ticker import MultipleLocator
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.optimize import curve_fit
 
-from parsers.configparser_ import ConfigParser
-
-
-def gauss(x, *p):
-    a, b, c = p
-    return a*np.exp(-(x-b)**2*np.log(2)/(c**2))
-
-
-def gauss2(x, *p):
-    a1, b1, c1, a2, b2, c2 = p
-    return a1*np.exp(-(x-b1)**2*np.log(2)/c1**2) + \
-           a2*np.exp(-(x-b2)**2*np.log(2)/c2**2)
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates, get_gauss
+from parsers.epoch_parser import load_groups, load_group_index
+from utils.fitting import fit
+from utils.gauss import gauss, gauss2
+from utils.plotting import get_pyplot, add_batch_arguments, parse_group_numbers, show_or_save, velocity_colors
 
 
 def get_configs(section, key):
@@ -44,15 +32,13 @@ def get_configs_items():
 
 def check_if_group_is_in_file(file, group):
     input_file = "groups/" + "/" + file
-    group_nr = np.loadtxt(input_file, unpack=True, usecols=0)
-
-    if group not in group_nr:
-        return False
-    else:
-        return True
+    return group in load_group_index(input_file)
 
 
-def main(group_numbers):
+def main(group_numbers, batch=False, output_dir="plots"):
+    plt = get_pyplot(batch=batch)
+    from matplotlib import rcParams
+    from matplotlib.ticker import MultipleLocator
     configuration_items = get_configs_items()
     for key, value in configuration_items.items():
         rcParams[key] = value
@@ -61,13 +47,9 @@ def main(group_numbers):
     minor_locatory = MultipleLocator(20)
     minor_locatorvel = MultipleLocator(1)
 
-    gauss2_list = get_configs("parameters", "gauss").split(";")
-    gauss2_dict = dict()
+    gauss2_dict = get_gauss()
 
-    for epoch in gauss2_list:
-        gauss2_dict[epoch.split(":")[0]] = epoch.split(":")[1].split(",")
-
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    file_order = get_file_order()
     input_files = []
 
     for file in file_order:
@@ -77,14 +59,13 @@ def main(group_numbers):
     v_min = []
     for index in range(0, len(input_files)):
         input_file = "groups/" + "/" + input_files[index].split(".")[0] + ".groups"
-        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = np.loadtxt(
+        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = load_groups(
             input_file, unpack=True)
 
         v_max.append(max(velocity_tmp))
         v_min.append(min(velocity_tmp))
 
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
 
     bad_epoch_dict = {}
     for g in group_numbers:
@@ -112,13 +93,8 @@ def main(group_numbers):
     for index in range(0, len(input_files)):
         input_file = "groups/" + "/" + input_files[index].split(".")[0] + ".groups"
 
-        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = np.loadtxt(
-            input_file, unpack=True)
+        group_index = load_group_index(input_file)
         for j in group_numbers:
-            velocity = np.empty(0)
-            intensity = np.empty(0)
-            ra = np.empty(0)
-            dec = np.empty(0)
             if j not in data_dict.keys():
                 velocitys = []
                 intensitys = []
@@ -126,14 +102,14 @@ def main(group_numbers):
                 decs = []
                 data_dict[j] = [velocitys, intensitys, ras, decs]
 
-            for i in range(0, len(channel_tmp)):
-                if group_tmp[i] == int(j):
-                    velocity = np.append(velocity, velocity_tmp[i])
-                    intensity = np.append(intensity, intensity_tmp[i])
-                    intensitys_max.append(max(intensity))
-                    intensitys_min.append(min(intensity))
-                    ra = np.append(ra, ra_tmp[i])
-                    dec = np.append(dec, dec_tmp[i])
+            group_data = group_index.rows(int(j))
+            velocity = group_data["velocity"]
+            intensity = group_data["intensity"]
+            ra = group_data["ra"]
+            dec = group_data["dec"]
+            if len(intensity) != 0:
+                intensitys_max.append(max(intensity))
+                intensitys_min.append(min(intensity))
 
             data_dict[j][0].append(velocity)
             data_dict[j][1].append(intensity)
@@ -162,31 +138,25 @@ def main(group_numbers):
                 q = np.linspace(min(velocity), max(velocity), 1000)
 
                 gauss2_groups_for_epoch = gauss2_dict[input_files[index].split(".")[0].upper()]
-                if str(j) in gauss2_groups_for_epoch:
-                    try:
-                        coeff, var_matrix = curve_fit(gauss2, velocity, intensity, p0=p2, maxfev=100000)
+                if j in gauss2_groups_for_epoch:
+                    fit_result = fit(velocity, intensity, p2)
+                    if fit_result.success:
+                        coeff = fit_result.coeff
                         hist_fit = gauss2(q, *coeff)
                         ax[0][index].plot(q, hist_fit, 'k')
-                    except:
-                        pass
                 else:
-                    try:
-                        coeff, var_matrix = curve_fit(gauss, velocity, intensity, p0=p1, maxfev=100000)
+                    fit_result = fit(velocity, intensity, p1)
+                    if fit_result.success:
+                        coeff = fit_result.coeff
                         hist_fit = gauss(q, *coeff)
                         ax[0][index].plot(q, hist_fit, 'k')
-                    except:
-                        pass
-
-            for i in range(len(velocity) - 1):
-                if velocity[i] < min(v_min) or velocity[i] > max(v_max):
-                    c = (0, 0, 0)
-                else:
-                    c = cm.jet((velocity[i] - min(v_min)) / (max(v_max) - min(v_min)), 1)
 
-                ax[0][index].scatter((velocity[i], velocity[i + 1]), (intensity[i], intensity[i + 1]),
-                                     color=c, lw=2, marker=symbol)
-                ax[1][index].scatter(ra[i], dec[i], s=0.05 * coord_range * np.sqrt(intensity[i]),
-                                     color=c, lw=2, marker=symbol)
+            color = velocity_colors(velocity[:-1], min(v_min), max(v_max))
+            ax[0][index].scatter(np.column_stack((velocity[:-1], velocity[1:])).ravel(),
+                                 np.column_stack((intensity[:-1], intensity[1:])).ravel(),
+                                 color=np.repeat(color, 2, axis=0), lw=2, marker=symbol)
+            ax[1][index].scatter(ra[:-1], dec[:-1], s=0.05 * coord_range * np.sqrt(intensity[:-1]), color=color, lw=2,
+                                 marker=symbol)
 
         title = input_files[index].split(".")[0].upper() + "-" + dates[input_files[index].split(".")[0]]
         ax[0][index].xaxis.set_minor_locator(minor_locatorvel)
@@ -207,12 +177,14 @@ def main(group_numbers):
     ax[1][0].set_ylabel('$\\Delta$ Dec (mas)')
     plt.tight_layout()
     plt.subplots_adjust(top=0.97, bottom=0, wspace=0.15, hspace=0, left=0.04, right=0.99)
-    plt.show()
+    show_or_save(plt, batch, output_dir, "g78m_" + "_".join(str(g) for g in group_numbers))
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='plot group')
-    parser.add_argument('group_numbers', type=int, help='group numbers',  nargs='+',)
+    parser.add_argument('group_numbers', type=str, help='group numbers or ranges of group numbers, for example 1 4-7',
+                        nargs='+')
+    add_batch_arguments(parser)
     args = parser.parse_args()
-    main(args.group_numbers)
+    main(parse_group_numbers(args.group_numbers), args.batch, args.output_dir)
     sys.exit(0)
\ No newline at end of file
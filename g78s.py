@@ -1,26 +1,16 @@
 import sys
 import argparse
 
-from matplotlib import cm
 from matplotlib import rcParams
-from matplotlib.patches import Circle
 from matplotlib.ticker import MultipleLocator
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.optimize import curve_fit
 
-from parsers.configparser_ import ConfigParser
-
-
-def gauss(x, *p):
-    a, b, c = p
-    return a*np.exp(-(x-b)**2*np.log(2)/(c**2))
-
-
-def gauss2(x, *p):
-    a1, b1, c1, a2, b2, c2 = p
-    return a1*np.exp(-(x-b1)**2*np.log(2)/c1**2) + \
-           a2*np.exp(-(x-b2)**2*np.log(2)/c2**2)
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates, get_gauss
+from parsers.epoch_parser import load_groups, load_group_index
+from utils.fitting import fit
+from utils.gauss import gauss, gauss2
+from utils.plotting import velocity_colors, draw_spots
 
 
 def get_configs(section, key):
@@ -45,12 +35,7 @@ def get_configs_items():
 
 def check_if_group_is_in_file(file, group):
     input_file = "groups/" + "/" + file
-    group_nr = np.loadtxt(input_file, unpack=True, usecols=0)
-
-    if group not in group_nr:
-        return False
-    else:
-        return True
+    return group in load_group_index(input_file)
 
 
 def main(group_number):
@@ -62,26 +47,21 @@ def main(group_number):
     minorLocatory = MultipleLocator(20)
     minorLocatorvel = MultipleLocator(1)
 
-    gauss2_list = get_configs("parameters", "gauss").split(";")
-    gauss2_dict = dict()
-
-    for epoch in gauss2_list:
-        gauss2_dict[epoch.split(":")[0]] = epoch.split(":")[1].split(",")
+    gauss2_dict = get_gauss()
 
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    file_order = get_file_order()
     input_files = []
 
     for file in file_order:
         input_files.append(file)
 
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
 
     v_max = []
     v_min = []
     for index in range(0, len(input_files)):
         input_file = "groups/" + "/" + input_files[index].split(".")[0] + ".groups"
-        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = np.loadtxt(
+        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = load_groups(
             input_file, unpack=True)
 
         v_max.append(max(velocity_tmp))
@@ -108,18 +88,11 @@ def main(group_number):
     intensitys_min = []
     for index in range(0, len(input_files)):
         input_file = "groups/" + "/" + input_files[index].split(".")[0] + ".groups"
-        velocity = np.empty(0)
-        intensity = np.empty(0)
-        ra = np.empty(0)
-        dec = np.empty(0)
-        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, integral_intensity_tmp, ra_tmp, dec_tmp = np.loadtxt(
-            input_file, unpack=True)
-        for i in range(0, len(channel_tmp)):
-            if group_tmp[i] == int(group_number):
-                velocity = np.append(velocity, velocity_tmp[i])
-                intensity = np.append(intensity, intensity_tmp[i])
-                ra = np.append(ra, ra_tmp[i])
-                dec = np.append(dec, dec_tmp[i])
+        group_data = load_group_index(input_file).rows(int(group_number))
+        velocity = group_data["velocity"]
+        intensity = group_data["intensity"]
+        ra = group_data["ra"]
+        dec = group_data["dec"]
 
         if len(intensity) == 0:
             intensity = [0]
@@ -154,39 +127,29 @@ def main(group_number):
             q = np.linspace(min(velocity), max(velocity), 1000)
 
             gauss2_groups_for_epoch = gauss2_dict[input_files[index].split(".")[0].upper()]
-            if str(group_number) in gauss2_groups_for_epoch:
-                try:
-                    coeff, var_matrix = curve_fit(gauss2, velocity, intensity, p0=p2, maxfev=100000)
+            if group_number in gauss2_groups_for_epoch:
+                fit_result = fit(velocity, intensity, p2)
+                if fit_result.success:
+                    coeff = fit_result.coeff
                     hist_fit = gauss2(q, *coeff)
                     ax[0][index].plot(q, hist_fit, 'k')
-                except:
-                    pass
             else:
-                try:
-                    coeff, var_matrix = curve_fit(gauss, velocity, intensity, p0=p1, maxfev=100000)
+                fit_result = fit(velocity, intensity, p1)
+                if fit_result.success:
+                    coeff = fit_result.coeff
                     hist_fit = gauss(q, *coeff)
                     ax[0][index].plot(q, hist_fit, 'k')
-                except:
-                    pass
 
-        rel = []
-        for i in range(len(velocity) - 1):
-            if velocity[i] < min(v_min) or velocity[i] > max(v_max):
-                c = (0, 0, 0)
-            else:
-                c = cm.jet((velocity[i] - min(v_min)) / (max(v_max) - min(v_min)), 1)
-
-            ax[0][index].scatter((velocity[i], velocity[i + 1]), (intensity[i], intensity[i + 1]), color=c, lw=2)
-            ax[0][index].set_xlim(min(velocity) - 0.5, max(velocity) + 0.5)
-            ax[0][index].xaxis.set_minor_locator(minorLocatorvel)
-            ax[0][index].set_title(title)
-            ax[0][index].set_xlabel('$V_{\\rm LSR}$ (km s$^{-1}$)')
-
-            el = Circle((ra[i], dec[i]), radius=0.1 * np.sqrt(intensity[i]), angle=0, lw=2)
-            ax[1][index].add_artist(el)
-            c = cm.jet((velocity[i] - min(v_min)) / (max(v_max) - min(v_min)), 1)
-            el.set_facecolor(c)
-            rel.append([ra[i], dec[i], velocity[i]])
+        # neighbour channel pairs in one scatter, the last channel gets no spot as in the per channel loop
+        color = velocity_colors(velocity[:-1], min(v_min), max(v_max), "jet")
+        ax[0][index].scatter(np.column_stack((velocity[:-1], velocity[1:])).ravel(),
+                             np.column_stack((intensity[:-1], intensity[1:])).ravel(), color=np.repeat(color, 2, axis=0),
+                             lw=2)
+        ax[0][index].set_xlim(min(velocity) - 0.5, max(velocity) + 0.5)
+        ax[0][index].xaxis.set_minor_locator(minorLocatorvel)
+        ax[0][index].set_title(title)
+        ax[0][index].set_xlabel('$V_{\\rm LSR}$ (km s$^{-1}$)')
+        draw_spots(ax[1][index], ra[:-1], dec[:-1], 0.1 * np.sqrt(intensity[:-1]), color)
 
         ax[0][index].set_ylim((min(intensitys_min)) - 0.1, (max(intensitys_max) + 0.1))
         ax[1][index].set_aspect("equal", adjustable='box')
@@ -1,29 +1,16 @@
 import os
 import sys
+import argparse
 from random import random
 
 import numpy as np
-from matplotlib.ticker import MultipleLocator
-from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
 
-from parsers.configparser_ import ConfigParser
-
-
-def gauss(x, *p):
-    a, b, c = p
-    return a*np.exp(-(x-b)**2*np.log(2)/(c**2))
-
-
-def DGauss(x, a1, b1, c1, a2, b2, c2):
-    return a1*np.exp(-(x-b1)**2*np.log(2)/c1**2) + \
-           a2*np.exp(-(x-b2)**2*np.log(2)/c2**2)
-
-
-def TGauss(x, a1, b1, c1, a2, b2, c2, a3, b3, c3):
-    return a1*np.exp(-(x-b1)**2*np.log(2)/c1**2) + \
-          a2*np.exp(-(x-b2)**2*np.log(2)/c2**2) + \
-          a3*np.exp(-(x-b3)**2*np.log(2)/c3**2)
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from parsers.epoch_parser import load_groups, load_group_index
+from utils.fitting import fit_epochs
+from utils.gauss import gauss
+from utils.plotting import get_pyplot, add_batch_arguments, show_or_save
+from utils.separation import pairwise_distances
 
 
 def get_configs(section, key):
@@ -38,11 +25,12 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def main():
+def main(batch=False, output_dir="plots"):
+    plt = get_pyplot(batch=batch)
+    from matplotlib.ticker import MultipleLocator
     dpi = 150
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    dates = get_dates()
+    file_order = get_file_order()
     files = os.listdir("groups")
     files_in_order = []
 
@@ -62,65 +50,47 @@ def main():
     min_intet= []
     print("\hline")
     epoch_data = dict()
+
+    spots = {file.split(".")[0]: load_groups("groups/" + file) for file in files_in_order}
+    epochs = {epoch: (spots[epoch]["group_nr"], spots[epoch]["velocity"], spots[epoch]["intensity"].clip(2))
+              for epoch in spots}
+    fits = {(fit["epoch"], fit["group_nr"]): fit for fit in fit_epochs(epochs, processes=None)}
+
     for file in files_in_order:
         index = files_in_order.index(file)
-        title = dates[file.split(".")[0]]
-        group, channel, velocity, intensity, integral_intensity, ra, dec = np.loadtxt("groups/" + file, unpack=True)
-        groups = list(set(group))
-        max_vel.append(max(velocity))
-        min_vel.append(min(velocity))
-        max_intet.append(max(intensity))
-        min_intet.append(min(intensity))
-        epoch_data[file.split(".")[0].upper()] = dict()
-
-        data = dict()
+        epoch = file.split(".")[0]
+        title = dates[epoch]
+        group_data = load_group_index("groups/" + file)
+        groups = [int(g) for g in group_data.groups]
+        max_vel.append(max(spots[epoch]["velocity"]))
+        min_vel.append(min(spots[epoch]["velocity"]))
+        max_intet.append(max(spots[epoch]["intensity"]))
+        min_intet.append(min(spots[epoch]["intensity"]))
+        epoch_data[epoch.upper()] = dict()
+
         for g in groups:
-            if int(g) not in group_index:
-                group_index.append(int(g))
+            if g not in group_index:
+                group_index.append(g)
                 colors.append((random(), random(), random()))
 
-            data[g] = dict()
-            vel = []
-            inten = []
-            ra_ = []
-            dec_ = []
-            for ch in range(0, len(channel)):
-                if group[ch] == g:
-                    vel.append(velocity[ch])
-                    inten.append(intensity[ch])
-                    ra_.append(ra[ch])
-                    dec_.append(dec[ch])
-
-            data[g]["vel"] = vel
-            data[g]["inten"] = inten
-            data[g]["ra"] = ra_
-            data[g]["dec"] = dec_
-
         for g in groups:
+            rows = group_data.rows(g)
+            vel = rows["velocity"]
+            inten = rows["intensity"].clip(2)
+            ra_ = rows["ra"]
+            dec_ = rows["dec"]
 
-            vel = data[g]["vel"]
-            inten = np.array(data[g]["inten"]).clip(2)
-            ra_ = data[g]["ra"]
-            dec_ = data[g]["dec"]
-
-            group_len = len(inten)
-            p0 = [max(inten), min(vel) + 0.5 * (max(vel) - min(vel)), 0.2]
             color = colors[int(groups.index(g))]
 
-            size = []
-            for j in range(0, len(vel)):
-                for k in range(j + 1, len(vel)):
-                    dist = np.sqrt((ra_[j] - ra_[k]) ** 2 + (dec_[j] - dec_[k]) ** 2)
-                    size.append(dist)
+            size = pairwise_distances(ra_, dec_)
 
             line = np.array(inten).argmax()
-            if group_len >= 3:
+            fit = fits[(epoch, g)]
+
+            if fit["success"]:
+                coeff = [fit["amplitude"], fit["centre"], fit["fwhm"] / 2]
                 if g not in epoch_data[file.split(".")[0].upper()].keys():
                     epoch_data[file.split(".")[0].upper()][g] = []
-                try:
-                    coeff, var_matrix = curve_fit(gauss, vel, inten, p0=p0, maxfev=100000)
-                except:
-                    pass
 
                 print("{\\it %d} & %.3f & %.3f & %.1f & %.2f & %.2f & %.3f & %.3f & %.1f(%.1f) & %.3f(%.3f)\\\\" % \
                       (g, ra_[line], dec_[line], vel[line], coeff[1],
@@ -205,9 +175,12 @@ def main():
         plt.legend()
         plt.title(param)
 
-    plt.show()
+    show_or_save(plt, batch, output_dir, "gauss_g78")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='fit gauss to groups of all epochs')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    main(args.batch, args.output_dir)
     sys.exit(0)
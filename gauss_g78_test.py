@@ -1,27 +1,11 @@
 import sys
 import argparse
-import random
 from multiprocessing import Pool
 import numpy as np
 
-from parsers.configparser_ import ConfigParser
-
-def distance(ra1, ra2, dec1, dec2):
-    return np.sqrt((ra1-ra2)**2 + (dec1-dec2)**2)
-
-
-def get_all_channels_from_group(group):
-    channels = []
-    for ch in group:
-        channels.append(ch[0])
-    return channels
-
-
-def get_velocity_from_group(group):
-    velocities = []
-    for ch in group:
-        velocities.append(ch[1])
-    return velocities
+from parsers.configparser_ import ConfigParser, get_file_order
+from parsers.epoch_parser import load_out
+from utils.matching import leader_group_counts
 
 
 def get_configs(section, key):
@@ -36,68 +20,55 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def create_groups(test):
-    print(len(test))
-    channel, velocity, intensity, integral_intensity, ra, dec = test
-
-    groups = []
-    param1 = random.uniform(0.1, 1)
-    param2 = random.uniform(1, 100)
-
-    #print(param1, param2)
-
-    all_chans = []
-    for j in range(0, len(channel)):
-        chan = [channel[j], velocity[j], intensity[j], integral_intensity[j], ra[j], dec[j]]
-        group = []
-        for i in range(0, len(channel)):
-            if channel[i] not in get_all_channels_from_group(group):
-                if np.abs(velocity[i] - chan[1]) <= param1 and \
-                        np.abs(distance(ra[i], chan[4], dec[i], chan[5])) <= param2:
-                    if [channel[i], velocity[i], intensity[i], integral_intensity[i], ra[i], dec[i]] not in all_chans:
-                        all_chans.append([channel[i], velocity[i], intensity[i], integral_intensity[i], ra[i], dec[i]])
-                        group.append([channel[i], velocity[i], intensity[i], integral_intensity[i], ra[i], dec[i]])
-
-        if len(group) >= 1:
-            groups.append(group)
+def count_groups(task):
+    """
 
-    return groups
+    :param task: (epoch data, velocity tolerances, distance tolerances)
+    :return: group counts of epoch for grid of tolerances
+    """
+    test, velocity_tolerances, distance_tolerances = task
+    channel, velocity, intensity, integral_intensity, ra, dec = test
+    return leader_group_counts(velocity, ra, dec, channel, velocity_tolerances, distance_tolerances)
 
 
-def main(input_files_dir):
-    p = Pool(7)
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+def main(input_files_dir, velocity_tolerances, distance_tolerances, processes):
+    file_order = get_file_order()
 
     data = []
     for file in file_order:
         input_file = input_files_dir + "/" + file
-        channel, velocity, intensity, integral_intensity, ra, dec = np.loadtxt(input_file, unpack=True)
+        channel, velocity, intensity, integral_intensity, ra, dec = load_out(input_file, unpack=True)
         velocity = velocity / 1000
         data.append([channel, velocity, intensity, integral_intensity, ra, dec])
 
-    result = dict()
-    for i in range(0, 1):
-        print("i", i)
-        result[str(i)] = []
-        groups = p.map(create_groups, data)
-            #result[str(i)].append(len(groups))
+    # one task per epoch and distance tolerance, each task reuses neighbour lists for all velocity tolerances
+    tasks = [(test, velocity_tolerances, [distance_tolerance]) for test in data
+             for distance_tolerance in distance_tolerances]
+    with Pool(processes) as p:
+        counts = p.map(count_groups, tasks)
+
+    counts = np.array(counts).reshape((len(data), len(distance_tolerances), len(velocity_tolerances)))
+    total_results = np.sum(counts.transpose((0, 2, 1)), axis=0)
 
-    '''
-    total_results = dict()
-    keys = result.keys()
-    for key in keys:
-        total_results[key] = sum(result[key])
+    print("%12s %12s %12s" % ("velocity", "distance", "groups"))
+    for v in range(0, len(velocity_tolerances)):
+        for d in range(0, len(distance_tolerances)):
+            print("%12.3f %12.3f %12d" % (velocity_tolerances[v], distance_tolerances[d], total_results[v, d]))
 
-    print("Min numbers of groups", min(total_results.values()))
-    tmp = list(total_results.values()).index(min(total_results.values()))
-    print("params", list(total_results.keys())[tmp])
-    print(result)
-    '''
+    v, d = np.unravel_index(np.argmin(total_results), total_results.shape)
+    print("Min numbers of groups", total_results[v, d])
+    print("params", velocity_tolerances[v], distance_tolerances[d])
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='plot gauss')
     parser.add_argument('input_file_dir', type=str, help='Input files directory')
+    parser.add_argument('--velocity_range', type=float, nargs=3, help='min, max and number of velocity tolerances',
+                        default=[0.1, 1, 10])
+    parser.add_argument('--distance_range', type=float, nargs=3, help='min, max and number of distance tolerances',
+                        default=[1, 100, 10])
+    parser.add_argument('--processes', type=int, help='number of worker processes', default=7)
     args = parser.parse_args()
-    main(args.input_file_dir)
+    main(args.input_file_dir, np.linspace(args.velocity_range[0], args.velocity_range[1], int(args.velocity_range[2])),
+         np.linspace(args.distance_range[0], args.distance_range[1], int(args.distance_range[2])), args.processes)
     sys.exit(0)
@@ -0,0 +1,111 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from parsers.epoch_calendar import get_mjd
+from parsers.epoch_parser import CACHE_DIR, load_out
+from utils.tracks import Tracks, source_signature
+
+TRACKS_DIR = os.path.join(CACHE_DIR, "tracks")
+RADIUS = 10.0
+
+
+def get_configs(section, key):
+    """
+    :param section: configuration file secti
+    :param key: configuration file sections
+    :return: configuration file section key
+    """
+    config_file_path = "config/config.cfg"
+    config = ConfigParser(config_file_path)
+    return config.get_config(section, key)
+
+
+def create_output(tracks, output_file):
+    """
+    table of tracks found in all epochs, same as test.py create_output
+
+    :param tracks: Tracks
+    :param output_file: output file
+    :return: number of rows
+    """
+    header = ['vel']
+    for file in tracks.files:
+        header.append("ra" + "_" + file)
+        header.append("dec" + "_" + file)
+        header.append("flux1" + "_" + file)
+
+    full_groups = tracks.complete_tracks()
+    if len(full_groups) == 0:
+        np.savetxt(output_file, np.array([]), delimiter=",", header="vel")
+        return 0
+
+    data = np.empty((len(full_groups), 1 + 3 * len(tracks.files)))
+    data[:, 0] = tracks.spots["velocity"][full_groups[:, -1]]
+    data[:, 1::3] = tracks.spots["ra"][full_groups]
+    data[:, 2::3] = tracks.spots["dec"][full_groups]
+    data[:, 3::3] = tracks.spots["flux1"][full_groups]
+    np.savetxt(output_file, data, delimiter=",", header=",".join(header))
+    return len(data)
+
+
+def create_motions(tracks, motions_file):
+    """
+    straight line motion fit of every track found in at least two epochs
+
+    :param tracks: Tracks
+    :param motions_file: output file
+    :return: number of rows
+    """
+    roots, ra_fit, dec_fit = tracks.motions()
+    first_spot = tracks.first_spot[roots]
+    last_epoch = len(tracks.files) - 1 - np.argmax(first_spot[:, ::-1] >= 0, axis=1)
+    header = ["vel", "epochs", "ra_slope", "ra_intercept", "ra_slope_err", "ra_intercept_err", "dec_slope",
+              "dec_intercept", "dec_slope_err", "dec_intercept_err"]
+    data = np.column_stack((tracks.spots["velocity"][first_spot[np.arange(len(roots)), last_epoch]], ra_fit.points,
+                            ra_fit.slope, ra_fit.intercept, ra_fit.slope_err, ra_fit.intercept_err, dec_fit.slope,
+                            dec_fit.intercept, dec_fit.slope_err, dec_fit.intercept_err))
+    np.savetxt(motions_file, data, delimiter=",", header=",".join(header))
+    return len(data)
+
+
+def main(rebuild, output_file, motions_file):
+    file_order = get_file_order()
+    data_file_path = get_configs("paths", "dataFiles")
+    mjd = dict(zip(get_dates().keys(), get_mjd()))
+    parameters = {"radius": RADIUS, "velocity_window": 20.0, "rel_tol": 100.0}
+
+    tracks = None if rebuild else Tracks.load(TRACKS_DIR)
+    file_mjd = [mjd[file.split(".")[0]] for file in file_order]
+    if tracks is not None and not tracks.is_prefix_of(file_order, data_file_path, parameters, file_mjd):
+        print("ingested epochs", tracks.files, "or their dates changed, matching state is rebuilt")
+        tracks = None
+    if tracks is None:
+        tracks = Tracks(**parameters)
+
+    new_files = file_order[len(tracks.files):]
+    for file, file_day in zip(new_files, file_mjd[len(tracks.files):]):
+        path = os.path.join(data_file_path, file)
+        matches = tracks.ingest(file, load_out(path), file_day, source_signature(path))
+        print("ingested", file, "spots", tracks.offsets[-1] - tracks.offsets[-2], "matches", matches)
+    if len(new_files) == 0:
+        print("no new epochs")
+        return
+    tracks.save(TRACKS_DIR)
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    print("groups found in all epochs", create_output(tracks, output_file))
+    print("tracks with motion fits", create_motions(tracks, motions_file))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='add new epochs of fileOrder to saved cross epoch matching state')
+    parser.add_argument('--rebuild', action='store_true', help='match all epochs again')
+    parser.add_argument('--output', type=str, help='table of groups found in all epochs', default="output3/output.dat")
+    parser.add_argument('--motions', type=str, help='motion fits of groups', default="output3/output_motions.dat")
+    args = parser.parse_args()
+    main(args.rebuild, args.output, args.motions)
+    sys.exit(0)
@@ -0,0 +1,44 @@
+import os
+import sys
+import runpy
+import argparse
+
+from utils.metrics import instrument
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_script(script, arguments):
+    """
+    run script as __main__, exit of script ends run but not the caller
+
+    :param script: python script
+    :param arguments: command line arguments of script
+    :return: exit code of script
+    """
+    sys.argv = [script] + list(arguments)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as exit_:
+        return exit_.code if isinstance(exit_.code, int) else (0 if exit_.code is None else 1)
+    return 0
+
+
+def main(script, arguments, report_file, profile_file, trace_memory):
+    if not os.path.isfile(script) and os.path.isfile(os.path.join(SCRIPT_DIR, script)):
+        script = os.path.join(SCRIPT_DIR, script)
+    exit_code = instrument(run_script, report_file, profile_file, trace_memory)(script, arguments)
+    print("run report", report_file)
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='run script with stage metrics report, optional cProfile and '
+                                                 'tracemalloc, for example instrument.py relgs.py 2 --batch')
+    parser.add_argument('--report', type=str, help='run report, .csv for CSV, else JSON', default="run_report.json")
+    parser.add_argument('--profile', type=str, help='cProfile statistics file', default=None)
+    parser.add_argument('--tracemalloc', action='store_true', help='per stage peak memory of python allocations')
+    parser.add_argument('script', type=str, help='script, relative to working directory or repository')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help='arguments of script')
+    args = parser.parse_args()
+    sys.exit(main(args.script, args.arguments, args.report, args.profile, args.tracemalloc))
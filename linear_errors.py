@@ -1,11 +1,10 @@
 import sys
-from datetime import datetime
-from astropy.io import ascii
-from astropy.time import Time
 import numpy as np
-from scipy.optimize import curve_fit
-import matplotlib.pyplot as plt
 from parsers.configparser_ import ConfigParser
+from parsers.epoch_calendar import get_epoch_offsets
+from parsers.table_parser import load_table
+from utils.plotting import get_pyplot
+from utils.proper_motion import fit_linear_motions
 
 
 def get_configs(section, key):
@@ -20,25 +19,12 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def convert_datetime_object_to_mjd(time):
-    """
-
-    :param time: datetime object
-    :return: MJD
-    """
-    time = time.isoformat()
-    tt_ = Time(time, format='isot')
-    return tt_.mjd
-
-
 def main():
     output_file = "output2/positionanglemotion_linearity.dat"
-    output_data = ascii.read(output_file)
-    output_data_headers = output_data.keys()
+    output_data = load_table(output_file)
+    output_data_headers = list(output_data.keys())
     velocity = output_data["vel"]
-    mjd = np.array([convert_datetime_object_to_mjd(datetime.strptime(date.split("-")[1].strip(), '%d.%m.%Y')) for date
-                    in get_configs("parameters", "dates").split(",")])
-    mjd = mjd - mjd[0]
+    mjd = get_epoch_offsets()
     x = np.array([output_data[header] for header in output_data_headers if "x" in header]).T
     y = np.array([output_data[header] for header in output_data_headers if "y" in header]).T
     i = np.array([output_data[header] for header in output_data_headers if "i" in header]).T
@@ -47,8 +33,8 @@ def main():
 
     print('PM relative to centres:')
     for epoch in range(0, x.shape[1]):
-        x_mean = x[:, epoch].mean()
-        y_mean = y[:, epoch].mean()
+        x_mean = np.nanmean(x[:, epoch])
+        y_mean = np.nanmean(y[:, epoch])
         print("ra dec epoch " + str(epoch + 1) + " mean", x_mean, y_mean)
         x[:, epoch] = x[:, epoch] - x_mean
         y[:, epoch] = y[:, epoch] - y_mean
@@ -56,50 +42,54 @@ def main():
     def fun(x, a, b):
         return a * x + b
 
+    plt = get_pyplot()
     f1, a1 = plt.subplots(len(x), 2, sharex="all", squeeze=False)
     f1.subplots_adjust(hspace=0.0, top=0.95, bottom=0.05, left=0.05, right=0.95)
     f1.set_figheight(25, forward=True)
     f1.set_figwidth(30, forward=True)
     f1.set_dpi(80)
 
-    lsvel = []
-    ls = []
-    lstex = []
+    # all features share times, so ra and dec lines of every feature are fitted at once
+    ra_fit = fit_linear_motions(mjd, x)
+    dec_fit = fit_linear_motions(mjd, y)
+    years = 3886.0 / 365.0
+    x_last = mjd[-1] * ra_fit.slope + ra_fit.intercept
+    y_last = mjd[-1] * dec_fit.slope + dec_fit.intercept
+    x_last_max = mjd[-1] * (ra_fit.slope + ra_fit.slope_err) + ra_fit.intercept
+    y_last_max = mjd[-1] * (dec_fit.slope + dec_fit.slope_err) + dec_fit.intercept
+    x_last_min = mjd[-1] * (ra_fit.slope - ra_fit.slope_err) + ra_fit.intercept
+    y_last_min = mjd[-1] * (dec_fit.slope - dec_fit.slope_err) + dec_fit.intercept
+
+    lsvel = np.sqrt(((x_last[:, None] - x) / years) ** 2 + ((y_last[:, None] - y) / years) ** 2)
+
+    ls = np.column_stack((velocity, i[:, 0], x[:, 0], y[:, 0], x_last, y_last, x_last_max, y_last_max, x_last_min,
+                          y_last_min, 20 * mjd[-1] * ra_fit.slope + ra_fit.intercept,
+                          20 * mjd[-1] * dec_fit.slope + dec_fit.intercept,
+                          20 * mjd[-1] * (ra_fit.slope + ra_fit.slope_err) + ra_fit.intercept,
+                          20 * mjd[-1] * (dec_fit.slope + dec_fit.slope_err) + dec_fit.intercept,
+                          20 * mjd[-1] * (ra_fit.slope - ra_fit.slope_err) + ra_fit.intercept,
+                          20 * mjd[-1] * (dec_fit.slope - dec_fit.slope_err) + dec_fit.intercept))
+
+    lstex = np.column_stack((velocity, x[:, 0], y[:, 0], (x_last - x[:, 0]) / years,
+                             (x_last_max - x[:, 0] - (x_last - x[:, 0])) / years, (y_last - y[:, 0]) / years,
+                             (y_last_max - y[:, 0] - (y_last - y[:, 0])) / years, i[:, 0:3]))
 
     for r in range(0, len(x)):
+        c = [ra_fit.slope[r], ra_fit.intercept[r]]
+        cdec = [dec_fit.slope[r], dec_fit.intercept[r]]
         a1[r][0].plot(mjd, x[r], ls="", marker="o")
         a1[r][1].plot(mjd, y[r], ls="", marker="o")
-        c, m = curve_fit(fun, mjd, x[r])
         a1[r][0].plot(mjd, fun(mjd, c[0], c[1]), lw=1, c="g")
-        cdec, mdec = curve_fit(fun, mjd, y[r])
-        a1[r][0].plot(mjd[-1], mjd[-1] * c[0] + c[1], ls="", marker="x")
-        a1[r][1].plot(mjd[-1], mjd[-1] * cdec[0] + cdec[1], ls="", marker="x")
-        a1[r][0].plot(mjd[-1], mjd[-1] * (c[0] + np.sqrt(np.diag(m)[0])) + c[1], ls="", marker="x", color="grey")
-        a1[r][1].plot(mjd[-1], mjd[-1] * (cdec[0] + np.sqrt(np.diag(mdec)[0])) + cdec[1], ls="", marker="x", color="grey")
-        a1[r][0].plot(mjd[-1], mjd[-1] * (c[0] - np.sqrt(np.diag(m)[0])) + c[1], ls="", marker="x", color="grey")
-        a1[r][1].plot(mjd[-1], mjd[-1] * (cdec[0] - np.sqrt(np.diag(mdec)[0])) + cdec[1], ls="", marker="x", color="grey")
+        a1[r][0].plot(mjd[-1], x_last[r], ls="", marker="x")
+        a1[r][1].plot(mjd[-1], y_last[r], ls="", marker="x")
+        a1[r][0].plot(mjd[-1], x_last_max[r], ls="", marker="x", color="grey")
+        a1[r][1].plot(mjd[-1], y_last_max[r], ls="", marker="x", color="grey")
+        a1[r][0].plot(mjd[-1], x_last_min[r], ls="", marker="x", color="grey")
+        a1[r][1].plot(mjd[-1], y_last_min[r], ls="", marker="x", color="grey")
         a1[r][1].plot(mjd, fun(mjd, cdec[0], cdec[1]), lw=1, c="g")
-        a1[r][0].text(100, np.max(x[r]), "Vlsr %.3f   a_RA %.6f   err_a_RA: %.6f: " % (velocity[r], c[0], np.sqrt(np.diag(m)[0])))
-        a1[r][1].text(100, np.min(y[r]), "Vlsr %.3f   a_Dec %.6f  err_a_Dec: %.6f: " % (velocity[r], cdec[0], np.sqrt(np.diag(mdec)[0])))
-        a1[r][0].text(3000, np.max(x[r]), "Feature %i" % (r + 1))
-
-        lsvel.append([np.sqrt(((mjd[-1] * c[0] + c[1] - x[r]) / (3886.0 / 365.0)) ** 2 +
-                              ((mjd[-1] * cdec[0] + cdec[1] - y[r]) / (3886.0 / 365.0)) ** 2)])
-
-        ls.append([velocity[r], i[r][0], x[r][0], y[r][0], mjd[-1] * c[0] + c[1], mjd[-1] * cdec[0] + cdec[1], mjd[-1] *
-                   (c[0] + np.sqrt(np.diag(m)[0])) + c[1], mjd[-1] * (cdec[0] + np.sqrt(np.diag(mdec)[0])) + cdec[1],
-                   mjd[-1] * (c[0] - np.sqrt(np.diag(m)[0])) + c[1], mjd[-1] * (cdec[0] - np.sqrt(np.diag(mdec)[0])) +
-                   cdec[1], 20 * mjd[-1] * c[0] + c[1], 20 * mjd[-1] * cdec[0] + cdec[1], 20 * mjd[-1] *
-                   (c[0] + np.sqrt(np.diag(m)[0])) + c[1], 20 * mjd[-1] * (cdec[0] + np.sqrt(np.diag(mdec)[0])) +
-                   cdec[1], 20 * mjd[-1] * (c[0] - np.sqrt(np.diag(m)[0])) + c[1], 20 * mjd[-1] *
-                   (cdec[0] - np.sqrt(np.diag(mdec)[0])) + cdec[1]])
-
-        lstex.append([velocity[r], x[r][0], y[r][0], (mjd[-1] * c[0] + c[1] - x[r][0]) / (3886.0 / 365.0),
-                      (mjd[-1] * (c[0] + np.sqrt(np.diag(m)[0])) + c[1] - x[r][0] - (mjd[-1] * c[0] + c[1] - x[r][0])) /
-                      (3886.0 / 365.0), (mjd[-1] * cdec[0] + cdec[1] - y[r][0]) / (3886.0 / 365.0),
-                      (mjd[-1] * (cdec[0] + np.sqrt(np.diag(mdec)[0])) + cdec[1] - y[r][0] -
-                       (mjd[-1] * cdec[0] + cdec[1] - y[r][0])) /
-                      (3886.0 / 365.0), i[r][0], i[r][1], i[r][2]])
+        a1[r][0].text(100, np.nanmax(x[r]), "Vlsr %.3f   a_RA %.6f   err_a_RA: %.6f: " % (velocity[r], c[0], ra_fit.slope_err[r]))
+        a1[r][1].text(100, np.nanmin(y[r]), "Vlsr %.3f   a_Dec %.6f  err_a_Dec: %.6f: " % (velocity[r], cdec[0], dec_fit.slope_err[r]))
+        a1[r][0].text(3000, np.nanmax(x[r]), "Feature %i" % (r + 1))
 
     plt.xlabel("Days")
     a1[3][0].set_ylabel("Shifts in RA [mas]")
@@ -107,16 +97,16 @@ def main():
     a1[0][0].set_title("G78 fit y=a*x+b to RA and Dec shifts")
     a1[0][1].set_title("shifts relative to brightest feature")
 
-    als = np.array(lsvel)
-    print("max vel", als.max(), "mas/yr", (als.max() * 1.64 * 150e6) / (365 * 24 * 3600), "km/s")
-    print("max vel", als.min(), "mas/yr", (als.min() * 1.64 * 150e6) / (365 * 24 * 3600), "km/s")
+    als = lsvel
+    print("max vel", np.nanmax(als), "mas/yr", (np.nanmax(als) * 1.64 * 150e6) / (365 * 24 * 3600), "km/s")
+    print("max vel", np.nanmin(als), "mas/yr", (np.nanmin(als) * 1.64 * 150e6) / (365 * 24 * 3600), "km/s")
 
-    lstexsort = sorted(lstex, key=lambda lstex: lstex[0])
+    lstexsort = lstex[np.argsort(lstex[:, 0], kind="stable")]
     header1 = ["vel", "f", "x1", "y1", "x2", "y2", "errxmin", "errymin", "errxmax", "errymax", "xlong2", "ylong2",
                "errxminlong", "erryminlong", "errxmaxlong", "errymaxlong"]
-    np.savetxt("output2/linearity_errors_fitted_cm.dat", np.array(ls), delimiter=",", fmt="%s", header=",".join(header1))
-    np.savetxt("output2/linearity_errors_fitted_tex_cm.dat", np.array(lstex))
-    np.savetxt("output2/linearity_errors_fitted_tex_sort.dat", np.array(lstexsort))
+    np.savetxt("output2/linearity_errors_fitted_cm.dat", ls, delimiter=",", fmt="%s", header=",".join(header1))
+    np.savetxt("output2/linearity_errors_fitted_tex_cm.dat", lstex)
+    np.savetxt("output2/linearity_errors_fitted_tex_sort.dat", lstexsort)
 
     plt.show()
     sys.exit(0)
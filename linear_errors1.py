@@ -1,5 +1,5 @@
-from pylab import *
-from scipy import stats
+from matplotlib.pyplot import savefig, show, subplots, xlabel
+from numpy import array, diag, loadtxt, savetxt, sqrt
 from scipy.optimize import curve_fit
 
 q, t1, x1, y1, t2, x2, y2, t3, x3, y3, i1, i2, i3 = loadtxt("positionanglemotion_three_linearity.dat", unpack=True)
@@ -1,12 +1,14 @@
 import sys
-from datetime import datetime
-from astropy.io import ascii
-from astropy.time import Time
-from scipy.stats import linregress
-import matplotlib.pyplot as plt
+import argparse
 import numpy as np
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_file_order
+from parsers.epoch_calendar import get_epoch_offsets
+from parsers.table_parser import load_table
+from utils.matching import close_runs
+from utils.plotting import get_pyplot
+from utils.proper_motion import fit_linear_motions
+from utils.regions import aggregate_runs
 
 
 def get_configs(section, key):
@@ -21,30 +23,16 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def convert_datetime_object_to_mjd(time):
-    """
-
-    :param time: datetime object
-    :return: MJD
-    """
-    time = time.isoformat()
-    tt_ = Time(time, format='isot')
-    return tt_.mjd
-
-
-def main():
-    mjd = np.array(
-        [convert_datetime_object_to_mjd(datetime.strptime(date.split("-")[1].strip(), '%d.%m.%Y')) for date
-         in get_configs("parameters", "dates").split(",")] )
-    mjd = mjd - mjd[0]
+def main(plot=True):
+    mjd = get_epoch_offsets()
     ras = []
     decs = []
     fluxes = []
     output_file = "output2/output.dat"
-    output_data = ascii.read(output_file)
-    output_data_headers = output_data.keys()
+    output_data = load_table(output_file)
+    output_data_headers = list(output_data.keys())
     velocity = output_data["vel"]
-    number_of_points = len(get_configs("parameters", "fileOrder").split(","))
+    number_of_points = len(get_file_order())
     tmp = 1
     for index in range(1, number_of_points * 3 + 1):
         tmp_data = output_data[output_data_headers[index]]
@@ -59,53 +47,34 @@ def main():
             fluxes.append(tmp_data)
             tmp = 1
 
-    reference_ras = ras[0]
-    reference_decs = decs[0]
-    groups_indexies = []
-    group_tmp = []
-
-    for group_index in range(0, len(reference_ras) - 1):
-        ra_diff = reference_ras[group_index] - reference_ras[group_index + 1]
-        dec_diff = reference_decs[group_index] - reference_decs[group_index + 1]
-
-        if abs(ra_diff) <= 1.27 and abs(dec_diff) <= 1.27:
-            group_tmp.append(group_index)
-            group_tmp.append(group_index + 1)
-
-        else:
-            if sorted(group_tmp) not in groups_indexies:
-                groups_indexies.append(sorted(group_tmp))
-            group_tmp = []
-
-    for group_index in range(len(reference_ras)-1, 0, -1):
-        ra_diff = reference_ras[group_index] - reference_ras[group_index - 1]
-        dec_diff = reference_decs[group_index] - reference_decs[group_index - 1]
-
-        if abs(ra_diff) <= 1.27 and abs(dec_diff) <= 1.27:
-            group_tmp.append(group_index)
-            group_tmp.append(group_index - 1)
-
-        else:
-            if sorted(group_tmp) not in groups_indexies:
-                groups_indexies.append(sorted(group_tmp))
-            group_tmp = []
-
-    ra_avg = {}
-    dec_avg = {}
-    for group in groups_indexies:
-        key = str(group)
-        for index in range(0, len(ras)):
-            ra_tmp = sum([ras[index][gi] for gi in group])/len(group)
-            dec_tmp = sum([decs[index][gi] for gi in group]) / len(group)
-            if key not in ra_avg.keys():
-                ra_avg[key] = []
-                ra_avg[key].append(ra_tmp)
-                dec_avg[key] = []
-                dec_avg[key].append(dec_tmp)
-            else:
-                ra_avg[key].append(ra_tmp)
-                dec_avg[key].append(dec_tmp)
-
+    ras = np.array(ras, dtype=float)
+    decs = np.array(decs, dtype=float)
+
+    # mean position of every group in every epoch, groups are runs of rows as in mean_motion.py
+    starts, ends = close_runs(ras[0], decs[0], 1.27)
+    runs = aggregate_runs(starts, ends, velocity, ras, decs, fluxes)
+    ra_avg = (runs["x"] / runs["count"]).T
+    dec_avg = (runs["y"] / runs["count"]).T
+
+    coefficients_ra = fit_linear_motions(mjd, ra_avg)
+    coefficients_dec = fit_linear_motions(mjd, dec_avg)
+    fitted = range(0, min(number_of_points, len(ra_avg)))
+    for epoch in fitted:
+        print("coefficients ra for epoch " + str(epoch + 1), "slope", coefficients_ra.slope[epoch], "intercept",
+              coefficients_ra.intercept[epoch], "stderr", coefficients_ra.slope_err[epoch], "intercept_stderr",
+              coefficients_ra.intercept_err[epoch])
+        print("coefficients dec for epoch " + str(epoch + 1), "slope", coefficients_dec.slope[epoch], "intercept",
+              coefficients_dec.intercept[epoch], "stderr", coefficients_dec.slope_err[epoch], "intercept_stderr",
+              coefficients_dec.intercept_err[epoch])
+
+    print("\n\n average alfa ra, average beta ra, average alfa dec, average beta dec",
+          np.average(coefficients_ra.slope[fitted]), np.average(coefficients_ra.intercept[fitted]),
+          np.average(coefficients_dec.slope[fitted]), np.average(coefficients_dec.intercept[fitted]))
+
+    if not plot:
+        return
+
+    plt = get_pyplot()
     plt.figure(figsize=(14, 10), dpi=100)
     sub_plots = [plt.subplot(i, aspect='auto') for i in [121, 122]]
     sub_plots[0].set_title("ra fit")
@@ -114,29 +83,18 @@ def main():
     sub_plots[1].set_xlabel("mjd")
     sub_plots[0].set_ylabel("ra")
     sub_plots[1].set_ylabel("dec")
-    keys = list(ra_avg.keys())
-    alfas_ra = []
-    betas_ra = []
-    alfas_dec = []
-    betas_dec = []
-    for epoch in range(0, number_of_points):
-        coefficients_ra = linregress(mjd, ra_avg[keys[epoch]])
-        coefficients_dec = linregress(mjd, dec_avg[keys[epoch]])
-        sub_plots[0].plot(mjd, mjd * coefficients_ra.slope + coefficients_ra.intercept, '--k')
-        sub_plots[1].plot(mjd, mjd * coefficients_dec.slope + coefficients_dec.intercept, '--k')
-        sub_plots[0].scatter(mjd, ra_avg[keys[epoch]])
-        sub_plots[1].scatter(mjd, dec_avg[keys[epoch]])
-        alfas_ra.append(coefficients_ra.slope)
-        betas_ra.append(coefficients_ra.intercept)
-        alfas_dec.append(coefficients_dec.slope)
-        betas_dec.append(coefficients_dec.intercept)
-        print("coefficients ra for epoch " + str(epoch + 1), coefficients_ra)
-        print("coefficients dec for epoch " + str(epoch + 1), coefficients_dec)
-
-    print("\n\n average alfa ra, average beta ra, average alfa dec, average beta dec", np.average(alfas_ra), np.average(betas_ra), np.average(alfas_dec), np.average(betas_dec))
+    for epoch in fitted:
+        sub_plots[0].plot(mjd, mjd * coefficients_ra.slope[epoch] + coefficients_ra.intercept[epoch], '--k')
+        sub_plots[1].plot(mjd, mjd * coefficients_dec.slope[epoch] + coefficients_dec.intercept[epoch], '--k')
+        sub_plots[0].scatter(mjd, ra_avg[epoch])
+        sub_plots[1].scatter(mjd, dec_avg[epoch])
+
     plt.show()
-    sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='linear fit of group positions')
+    parser.add_argument('--no_plot', action='store_true', help='only print fitted coefficients')
+    args = parser.parse_args()
+    main(not args.no_plot)
+    sys.exit(0)
@@ -1,12 +1,12 @@
 import sys
-from astropy.io import ascii
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
-import matplotlib.cm as cm
-from matplotlib.collections import PatchCollection
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from parsers.table_parser import load_table
+from utils.matching import close_runs
+from utils.plotting import get_pyplot, velocity_colors, draw_spots, draw_vectors
+from utils.regions import aggregate_runs
 
 
 def get_configs(section, key):
@@ -42,14 +42,12 @@ def create_mean_motion_data(spots_parameters, epoch_count, ra_differences, dec_d
     return np.array(data, dtype=object)
 
 
-def main():
-    plt.rc('font', family='serif', style='normal', variant='normal', weight='normal', stretch='normal', size=12)
+def main(plot=True):
     output_file = "output2/output.dat"
-    output_data = ascii.read(output_file)
-    output_data_headers = output_data.keys()
+    output_data = load_table(output_file)
+    output_data_headers = list(output_data.keys())
     velocity = output_data["vel"]
-    number_of_points = len(get_configs("parameters", "fileOrder").split(","))
-    velocity_range = max(velocity) - min(velocity)
+    number_of_points = len(get_file_order())
     ras = []
     decs = []
     fluxs = []
@@ -68,120 +66,46 @@ def main():
             fluxs.append(tmp_data)
             tmp = 1
 
-    reference_ras = ras[0]
-    reference_decs = decs[0]
-
-    groups_indexies = []
-    group_tmp = []
-
-    for group_index in range(0, len(reference_ras) - 1):
-        ra_diff = reference_ras[group_index] - reference_ras[group_index + 1]
-        dec_diff = reference_decs[group_index] - reference_decs[group_index + 1]
-
-        if abs(ra_diff) <= 1.27 and abs(dec_diff) <= 1.27:
-            group_tmp.append(group_index)
-            group_tmp.append(group_index + 1)
-
-        else:
-            if sorted(group_tmp) not in groups_indexies:
-                groups_indexies.append(sorted(group_tmp))
-            group_tmp = []
-
-    for group_index in range(len(reference_ras)-1, 0, -1):
-        ra_diff = reference_ras[group_index] - reference_ras[group_index - 1]
-        dec_diff = reference_decs[group_index] - reference_decs[group_index - 1]
-
-        if abs(ra_diff) <= 1.27 and abs(dec_diff) <= 1.27:
-            group_tmp.append(group_index)
-            group_tmp.append(group_index - 1)
-
-        else:
-            if sorted(group_tmp) not in groups_indexies:
-                groups_indexies.append(sorted(group_tmp))
-            group_tmp = []
+    ras = np.array(ras, dtype=float)
+    decs = np.array(decs, dtype=float)
+    fluxs = np.array(fluxs, dtype=float)
 
-    groups_indexies = [set(g) for g in groups_indexies if len(g) > 0]
+    starts, ends = close_runs(ras[0], decs[0], 1.27)
+    groups_indexies = [set(range(start, end + 1)) for start, end in zip(starts, ends)]
     print("Groups ", groups_indexies)
 
-    plt.figure(figsize=(14, 10), dpi=100)
-    sub_plots = [plt.subplot(i, aspect='equal') for i in [221, 222, 223, 224]]
-
-    spots_parameters = []
-    vectors_parameters = []
-
-    lengths = {}
-    average_lengths = {}
-    mean_ra_differences = {}
-    mean_dec_differences = {}
-    ra_differences = {}
-    dec_differences = {}
-    fluxes = []
-    linearity = []
-    for group in groups_indexies:
-        number_of_elements_in_group = len(group)
-        sum_of_ra_diffs = []
-        sum_of_dec_diffs = []
-        sum_of_ras = []
-        sum_of_decs = []
-        vel_for_group = [velocity[gi] for gi in group]
-        sum_of_vel = sum(vel_for_group)
-        linearity_for_group = [sum_of_vel/number_of_elements_in_group]
-        flux_for_group = []
-
-        for index in range(0, len(ras)):
-            if index != 0:
-                ra_diff = [ras[index][gi] - ras[0][gi] for gi in group]
-                dec_diff = [decs[index][gi] - decs[0][gi] for gi in group]
-                sum_ra_diff = sum(ra_diff)
-                sum_dec_diff = sum(dec_diff)
-                sum_of_ra_diffs.append(sum_ra_diff/number_of_elements_in_group)
-                sum_of_dec_diffs.append(sum_dec_diff/number_of_elements_in_group)
-                length = np.sqrt(sum_ra_diff ** 2 + sum_dec_diff ** 2)
-                if str(index + 1) + "-" + "1" in lengths.keys():
-                    lengths[str(index + 1) + "-" + "1"].append(length)
-                    average_lengths[str(index + 1) + "-" + "1"].append(length/number_of_elements_in_group)
-                    mean_ra_differences[str(index + 1) + "-" + "1"].append(sum_ra_diff/number_of_elements_in_group)
-                    mean_dec_differences[str(index + 1) + "-" + "1"].append(sum_dec_diff/number_of_elements_in_group)
-                    ra_differences[str(index + 1) + "-" + "1"].append(sum_ra_diff)
-                    dec_differences[str(index + 1) + "-" + "1"].append(sum_dec_diff)
-                else:
-                    lengths[str(index + 1) + "-" + "1"] = []
-                    lengths[str(index + 1) + "-" + "1"].append(length)
-                    average_lengths[str(index + 1) + "-" + "1"] = []
-                    average_lengths[str(index + 1) + "-" + "1"].append(length/number_of_elements_in_group)
-                    mean_ra_differences[str(index + 1) + "-" + "1"] = []
-                    mean_ra_differences[str(index + 1) + "-" + "1"].append(sum_ra_diff/number_of_elements_in_group)
-                    mean_dec_differences[str(index + 1) + "-" + "1"] = []
-                    mean_dec_differences[str(index + 1) + "-" + "1"].append(sum_dec_diff/number_of_elements_in_group)
-                    ra_differences[str(index + 1) + "-" + "1"] = []
-                    ra_differences[str(index + 1) + "-" + "1"].append(sum_ra_diff)
-                    dec_differences[str(index + 1) + "-" + "1"] = []
-                    dec_differences[str(index + 1) + "-" + "1"].append(sum_dec_diff)
-
-            ra_for_group = [ras[index][gi] for gi in group]
-            sum_of_ra = sum(ra_for_group)
-            sum_of_ras.append(sum_of_ra)
-
-            dec_for_group = [decs[index][gi] for gi in group]
-            sum_of_dec = sum(dec_for_group)
-            sum_of_decs.append(sum_of_dec)
-
-            flux_for_group_tmp = [fluxs[index][gi] for gi in group]
-            flux_for_group.append(max(flux_for_group_tmp))
-
-        linearity_for_group.extend(np.array(sum_of_ras) / number_of_elements_in_group)
-        linearity_for_group.extend(np.array(sum_of_decs) / number_of_elements_in_group)
-        linearity_for_group.extend(np.array(flux_for_group))
-        linearity.append(linearity_for_group)
-        fluxes.append(max(flux_for_group))
-        coords = (sum_of_ras[0]/number_of_elements_in_group, sum_of_decs[0]/number_of_elements_in_group)
-        spot_parameters = {"coords": coords, "vel": sum_of_vel / number_of_elements_in_group,
-                           "radius": 3 * np.log10(max(flux_for_group) * 1000.)}
-        spots_parameters.append(spot_parameters)
-
-        vector_parameters = {"sum_of_ra_diffs": sum_of_ra_diffs, "sum_of_dec_diffs": sum_of_dec_diffs,
-                             "sum_of_ras": np.array(sum_of_ras) / number_of_elements_in_group, "sum_of_decs": np.array(sum_of_decs)/ number_of_elements_in_group}
-        vectors_parameters.append(vector_parameters)
+    runs = aggregate_runs(starts, ends, velocity, ras, decs, fluxs)
+    number_of_elements_in_group = runs["count"]
+    sum_of_vel = runs["velocity"]
+    sum_of_ras = runs["x"]
+    sum_of_decs = runs["y"]
+    flux_for_group = runs["max_flux"]
+    sum_ra_diff = runs["dx"]
+    sum_dec_diff = runs["dy"]
+    length = np.sqrt(sum_ra_diff ** 2 + sum_dec_diff ** 2)
+
+    epoch_names = [str(index + 1) + "-" + "1" for index in range(1, len(ras))]
+    lengths = {epoch_names[e]: length[e] for e in range(0, len(epoch_names))}
+    average_lengths = {epoch_names[e]: length[e] / number_of_elements_in_group for e in range(0, len(epoch_names))}
+    mean_ra_differences = {epoch_names[e]: sum_ra_diff[e] / number_of_elements_in_group
+                           for e in range(0, len(epoch_names))}
+    mean_dec_differences = {epoch_names[e]: sum_dec_diff[e] / number_of_elements_in_group
+                            for e in range(0, len(epoch_names))}
+    ra_differences = {epoch_names[e]: sum_ra_diff[e] for e in range(0, len(epoch_names))}
+    dec_differences = {epoch_names[e]: sum_dec_diff[e] for e in range(0, len(epoch_names))}
+    fluxes = np.max(flux_for_group, axis=0)
+    linearity = np.vstack((sum_of_vel / number_of_elements_in_group, sum_of_ras / number_of_elements_in_group,
+                           sum_of_decs / number_of_elements_in_group, flux_for_group)).T
+
+    spots_parameters = [{"coords": (sum_of_ras[0][g] / number_of_elements_in_group[g],
+                                    sum_of_decs[0][g] / number_of_elements_in_group[g]),
+                         "vel": sum_of_vel[g] / number_of_elements_in_group[g],
+                         "radius": 3 * np.log10(fluxes[g] * 1000.)} for g in range(0, len(groups_indexies))]
+    vectors_parameters = [{"sum_of_ra_diffs": sum_ra_diff[:, g] / number_of_elements_in_group[g],
+                           "sum_of_dec_diffs": sum_dec_diff[:, g] / number_of_elements_in_group[g],
+                           "sum_of_ras": sum_of_ras[:, g] / number_of_elements_in_group[g],
+                           "sum_of_decs": sum_of_decs[:, g] / number_of_elements_in_group[g]}
+                          for g in range(0, len(groups_indexies))]
 
     epoch_count = len(mean_ra_differences.keys())
     mean_motion_data = create_mean_motion_data(spots_parameters, epoch_count,
@@ -195,10 +119,9 @@ def main():
     header2.extend(["x" + str(i) for i in range(0, len(sum_of_ras))])
     header2.extend(["y" + str(i) for i in range(0, len(sum_of_decs))])
     header2.extend(["i" + str(i) for i in range(0, len(sum_of_decs))])
-    np.savetxt("output2/positionanglemotion_linearity.dat", np.array(linearity), delimiter=",", header=",".join(header2))
+    np.savetxt("output2/positionanglemotion_linearity.dat", linearity, delimiter=",", header=",".join(header2))
 
     vector_colors = ["black", "grey", "blue", "yellow"]
-    vector_color_index = 0
     vector_count = len(vectors_parameters[0]["sum_of_ra_diffs"])
     vector_names = [str(n) + "-1" for n in range(2, vector_count +2, +1)]
 
@@ -208,47 +131,38 @@ def main():
         print("mean value of ave RA shift epoch" + vector_names[epoch_index] + ": " + str(np.mean(mean_ra_differences[vector_names[epoch_index]])))
         print("mean value of ave DEC shift epoch" + vector_names[epoch_index] + ": " + str(np.mean(mean_dec_differences[vector_names[epoch_index]])))
 
-    for spt_index in range(0, len(spots_parameters)):
-        spt = spots_parameters[spt_index]
-        spot_color = cm.jet((spt["vel"] - min(velocity)) / velocity_range, 1)
-        for ax in sub_plots:
-            ax.add_patch(Circle(spt["coords"], angle=0, lw=0.5, radius=spt["radius"], facecolor=spot_color))
-
-        vect = vectors_parameters[spt_index]
-        vect_ra = vect["sum_of_ra_diffs"]
-        vect_dec = vect["sum_of_dec_diffs"]
-
-        for vec in range(vector_count):
-            avera = np.mean(mean_ra_differences[vector_names[vector_color_index]])
-            avedec = np.mean(mean_dec_differences[vector_names[vector_color_index]])
-
-            sub_plots[0].annotate(vector_names[vector_color_index], xy=spt["coords"], xycoords='data',
-                                  xytext=(spt["coords"][0] + (20 * vect_ra[vec]), spt["coords"][1] + (20 * vect_dec[vec])),
-                                  textcoords='data',
-                                  arrowprops=dict(arrowstyle="<-", color=vector_colors[vector_color_index], connectionstyle="arc3"))
-
-            sub_plots[1].annotate(vector_names[vector_color_index], xy=spt["coords"], xycoords='data',
-                                  xytext=((spt["coords"][0] + (20 * vect_ra[vec]) - 20 * avera), (spt["coords"][1] + (20 * vect_dec[vec]) - 20 * avedec)),
-                                  textcoords='data',
-                                  arrowprops=dict(arrowstyle="<-", color=vector_colors[vector_color_index], connectionstyle="arc3"))
-
-            sub_plots[2].annotate(vector_names[vector_color_index], xy=spt["coords"], xycoords='data',
-                                  xytext=(spt["coords"][0] + (20 * vect_ra[vec]), spt["coords"][1] + (20 * vect_dec[vec])),
-                                  textcoords='data',
-                                  arrowprops=dict(arrowstyle="<-", color=vector_colors[vector_color_index], connectionstyle="arc3"))
+    if not plot:
+        return
 
-            sub_plots[3].annotate(vector_names[vector_color_index], xy=spt["coords"], xycoords='data',
-                                  xytext=(spt["coords"][0] + (20 * vect_ra[vec] - 20 * avera), spt["coords"][1] + (20 * vect_dec[vec]) - 20 * avedec),
-                                  textcoords='data', arrowprops=dict(arrowstyle="<-", color=vector_colors[vector_color_index], connectionstyle="arc3"))
+    plt = get_pyplot()
+    import matplotlib.cm as cm
+    from matplotlib.collections import PatchCollection
 
-            vector_color_index += 1
+    plt.rc('font', family='serif', style='normal', variant='normal', weight='normal', stretch='normal', size=12)
+    plt.figure(figsize=(14, 10), dpi=100)
+    sub_plots = [plt.subplot(i, aspect='equal') for i in [221, 222, 223, 224]]
 
-            if vector_color_index == vector_count:
-                vector_color_index = 0
+    spot_coords = np.array([spot["coords"] for spot in spots_parameters]).reshape((-1, 2))
+    spot_colors = velocity_colors([spot["vel"] for spot in spots_parameters], min(velocity), max(velocity))
+    for ax in sub_plots:
+        draw_spots(ax, spot_coords[:, 0], spot_coords[:, 1], [spot["radius"] for spot in spots_parameters], spot_colors,
+                   linewidth=0.5, autolim=True)
+
+    # one quiver per subplot and epoch pair, vectors of subplots 2 and 4 have the mean motion subtracted
+    ra_vectors = 20 * np.array([vect["sum_of_ra_diffs"] for vect in vectors_parameters]).reshape((-1, vector_count))
+    dec_vectors = 20 * np.array([vect["sum_of_dec_diffs"] for vect in vectors_parameters]).reshape((-1, vector_count))
+    for vec in range(vector_count):
+        avera = np.mean(mean_ra_differences[vector_names[vec]])
+        avedec = np.mean(mean_dec_differences[vector_names[vec]])
+        for ax_index in range(0, len(sub_plots)):
+            shift = ax_index % 2 == 1
+            draw_vectors(sub_plots[ax_index], spot_coords[:, 0], spot_coords[:, 1],
+                         ra_vectors[:, vec] - 20 * avera * shift, dec_vectors[:, vec] - 20 * avedec * shift,
+                         color=vector_colors[vec], label=vector_names[vec])
 
     # vector legend
     #plot 1
-    dates = [date.split("-")[1].strip() for date in get_configs("parameters", "dates").split(",")]
+    dates = list(get_dates().values())
     sub_plots[0].annotate("", xy=(50, -150), xycoords='data', xytext=(50 + (20 * 3), -150), textcoords='data',
                           arrowprops=dict( arrowstyle="<-", connectionstyle="arc3"))
     sub_plots[0].text(105, -135, "3 mas", size=8, rotation=0.0, ha="left", va="center", color='k')
@@ -289,6 +203,7 @@ def main():
         ax.add_collection(PatchCollection([], cmap=cm.jet))
         ax.set_xlabel('$\\Delta$ RA [mas]', fontsize=12)
         ax.set_ylabel('$\\Delta$ Dec [mas]', fontsize=12)
+        ax.legend(loc="lower left", fontsize=8)
 
         date_x = 100
         data_y = 220
@@ -299,8 +214,11 @@ def main():
     plt.colorbar(p)
     plt.tight_layout()
     plt.show()
-    sys.exit(0)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='mean motion of spot groups')
+    parser.add_argument('--no_plot', action='store_true', help='only write output tables')
+    args = parser.parse_args()
+    main(not args.no_plot)
+    sys.exit(0)
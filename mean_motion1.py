@@ -1,11 +1,19 @@
 #!/usr/bin/env python
 # -*- coding:utf8 -*-
-from pylab import *
-from matplotlib.patches import Ellipse
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.pyplot import annotate, figure, savefig, show
+from numpy import array, column_stack, full, log10, nan, savetxt
 from matplotlib import rc
 import matplotlib.cm as cm
 from matplotlib.collections import PatchCollection
-from astropy.io import ascii
+
+from parsers.configparser_ import get_dates
+from parsers.epoch_calendar import get_mjd
+from parsers.table_parser import load_table
+from utils.plotting import draw_spots, draw_vectors
+from utils.regions import box_membership, aggregate_regions, motion_table
 
 # FONTS
 rc('font', family='serif', style='normal', variant='normal', weight='normal', stretch='normal', size=12)
@@ -15,19 +23,24 @@ figure(figsize=(14, 10), dpi=100)
 # LOAD DATA
 # spots from all three epochs, systemic motions excluding SW spots
 output_file = "output/output.dat"
-output_data = ascii.read(output_file)
-output_data_headers = output_data.keys()
+output_data = load_table(output_file)
+output_data_headers = list(output_data.keys())
 
+# columns are velocity and ra, dec, flux of every epoch
 v1 = output_data[output_data_headers[0]]
-x1 = output_data[output_data_headers[1]]
-y1 = output_data[output_data_headers[2]]
-i1 = output_data[output_data_headers[3]]
-x2 = output_data[output_data_headers[4]]
-y2 = output_data[output_data_headers[5]]
-i2 = output_data[output_data_headers[6]]
-x3 = output_data[output_data_headers[7]]
-y3 = output_data[output_data_headers[8]]
-i3 = output_data[output_data_headers[9]]
+number_of_epochs = (len(output_data_headers) - 1) // 3
+xs = array([output_data[output_data_headers[1 + 3 * e]] for e in range(number_of_epochs)], dtype=float)
+ys = array([output_data[output_data_headers[2 + 3 * e]] for e in range(number_of_epochs)], dtype=float)
+fs = array([output_data[output_data_headers[3 + 3 * e]] for e in range(number_of_epochs)], dtype=float)
+
+# days from first epoch of table written to linearity file, epochs are named by ra columns of table header and
+# their dates are taken from configuration file, epochs without date get nan
+mjd = dict(zip(get_dates().keys(), get_mjd()))
+epoch_names = [output_data_headers[1 + 3 * e].split("_", 1)[-1].split(".")[0] for e in range(number_of_epochs)]
+for epoch_name in epoch_names:
+    if epoch_name not in mjd:
+        print("no date of epoch", epoch_name, "in configuration file")
+epoch_days = array([mjd.get(epoch_name, nan) for epoch_name in epoch_names]) - mjd.get(epoch_names[0], nan)
 
 dv = (v1.max() - v1.min())
 v1mi = v1.min()
@@ -61,96 +74,23 @@ lm = [
     [125, 123.7, 113, 112.5]
 ]
 
-for j in range(len(lm)):
-    xx13 = 0
-    yy13 = 0
-    wek_x13 = 0
-    wek_y13 = 0
-
-    wek_xf13 = 0
-    wek_yf13 = 0
-    suma_vel13 = 0
-    length13 = 0
-    k13 = 0
-    xx12 = 0
-    yy12 = 0
-    wek_x12 = 0
-    wek_y12 = 0
-    wek_xf12 = 0
-    wek_yf12 = 0
-    suma_vel12 = 0
-    length12 = 0
-    k12 = 0
-    flux = []
-
-    for i in range(len(x1)):
-
-        if x1[i] < lm[j][0] and x1[i] > lm[j][1]:
-            if y1[i] < lm[j][2] and y1[i] > lm[j][3]:
-                dx13 = x3[i] - x1[i]
-                dy13 = y3[i] - y1[i]
-                xx13 += dx13
-                yy13 += dy13
-                wek_x13 += x1[i]
-                wek_y13 += y1[i]
-
-                wek_xf13 += x3[i]
-                wek_yf13 += y3[i]
-                suma_vel13 += v1[i]
-                #print(suma_vel13)
-                #         i1max = max(i1)
-                k13 += 1
-                #          print xx13, yy13, x1[i]
-                length13 = sqrt( xx13 ** 2 + yy13 ** 2 )
-                dx12 = x2[i] - x1[i]
-                dy12 = y2[i] - y1[i]
-                xx12 += dx12
-                yy12 += dy12
-                wek_x12 += x1[i]
-                wek_y12 += y1[i]
-                wek_xf12 += x2[i]
-                wek_yf12 += y2[i]
-                suma_vel12 += v1[i]
-                #print(suma_vel12)
-                k12 += 1
-                #          print xx13, yy13, x1[i]
-                length12 = sqrt( xx12 ** 2 + yy12 ** 2 )
-                flux.append( [i1[i], i2[i], i3[i]] )
-
-    #          print flux
-    #          print length
-
-
-    #print(wek_x13)
-
-    #print( k12, k13 )
-    if k13 != 0:
-        fluxa = array( flux )
-        ls13.append(
-            [suma_vel13 / k13, wek_x13 / k13, wek_y13 / k13, xx13, yy13, xx13 / k13, yy13 / k13, length13, length13 / k13,
-             wek_xf13 / k13, wek_yf13 / k13, fluxa.max()] )
-        ls12.append(
-            [suma_vel12 / k12, wek_x12 / k12, wek_y12 / k12, xx12, yy12, xx12 / k12, yy12 / k12, length12, length12 / k12,
-             wek_xf12 / k12, wek_yf12 / k12, fluxa.max()] )
-        linearity.append(
-            [suma_vel12 / k12, 0, wek_x12 / k12, wek_y12 / k12, 865, (wek_x12 + xx12) / k12, (wek_y12 + yy12) / k12, 1585,
-             (wek_x13 + xx13) / k13, (wek_y13 + yy13) / k13, fluxa[:, 0].max(), fluxa[:, 1].max(), fluxa[:, 2].max()] )
-        #
-        #   lstex.append([suma_vel12/k12, wek_x12/k12, wek_y12/k12, xx12/(3033.0/365.0), yy12/(3033.0/365.0), xx13/(3776.0/365.0), yy13/(3776.0/365.0)] )
-        annotate( "", xy=(wek_x12 / k12, wek_y12 / k12), xycoords='data',
-                  xytext=(wek_x12 / k12 + (20 * xx12 / k12), wek_y12 / k12 + (20 * yy12 / k12)),
-                  textcoords='data', arrowprops=dict( arrowstyle="<-", color="grey", connectionstyle="arc3" ) )
-        annotate( "", xy=(wek_x13 / k13, wek_y13 / k13), xycoords='data',
-                  xytext=(wek_x13 / k13 + (20 * xx13 / k13), wek_y13 / k13 + (20 * yy13 / k13)),
-                  textcoords='data', arrowprops=dict( arrowstyle="<-", connectionstyle="arc3" ) )
-
-    el = Ellipse((ls13[j][1], ls13[j][2]), width=3 * log10( ls13[j][11] * 1000.),
-                  height=3 * log10(ls13[j][11] * 1000.), angle=0, lw=0.5)
-    ax1.add_artist( el )
-    c = cm.jet( (ls13[j][0] - v1mi) / dv, 1 )
-    #   print c
-    el.set_facecolor( c )
+# regions are boxes in first epoch positions, "13" is motion from first to last epoch, "12" to second epoch
+regions = aggregate_regions(box_membership(xs[0], ys[0], lm), v1, xs, ys, fs)
+ls13 = motion_table(regions, number_of_epochs - 1)
+ls12 = motion_table(regions, 1)
+
+linearity = [regions["velocity"]]
+for e in range(number_of_epochs):
+    linearity.extend([full(len(lm), epoch_days[e]), regions["x"][:, e],
+                      regions["y"][:, e]])
+linearity.extend(regions["max_flux"].T)
+linearity = column_stack(linearity)[regions["count"] > 0]
+
+draw_vectors(ax1, ls12[:, 1], ls12[:, 2], 20 * ls12[:, 5], 20 * ls12[:, 6], color="grey")
+draw_vectors(ax1, ls13[:, 1], ls13[:, 2], 20 * ls13[:, 5], 20 * ls13[:, 6])
 
+draw_spots(ax1, ls13[:, 1], ls13[:, 2], 1.5 * log10(ls13[:, 11] * 1000.), cm.jet((ls13[:, 0] - v1mi) / dv, 1),
+           linewidth=0.5)
 
 #print(ls13)
 patches = []
@@ -201,14 +141,14 @@ avera12 = selra12.mean()
 #print( "mean value of ave DEC shift epoch 12:", seldec12.mean() )
 avedec12 = seldec12.mean()
 
-print(ls12)
+print(ls12.tolist())
 
 savetxt( "positionanglemotion_three_13_averaged.dat", ls13,
          fmt="%.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f" )
 savetxt( "positionanglemotion_three_12_averaged.dat", ls12,
          fmt="%.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f" )
 savetxt( "positionanglemotion_three_linearity.dat", linearity,
-        fmt="%.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f %+.3f" )
+        fmt=" ".join(["%.3f"] + ["%+.3f"] * (linearity.shape[1] - 1)) )
 
 # vector legend
 annotate( "", xy=(50, -150), xycoords='data', xytext=(50 + (20 * 3), -150), textcoords='data',
@@ -235,21 +175,12 @@ plt.title( "G78: SW excluded", size=12 )
 # PLOT 2 - subtracted avera, avedec
 ax2 = plt.subplot(222, aspect='equal' )
 
-for j in range( len( lm ) ):
-    annotate( "", xy=(ls12[j][1], ls12[j][2]), xycoords='data', xytext=(
-    (ls12[j][1] + (20 * ls12[j][5]) - 20 * avera12), (ls12[j][2] + (20 * ls12[j][6]) - 20 * avedec12)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", color="grey", connectionstyle="arc3" ) )
+draw_vectors(ax2, ls12[:, 1], ls12[:, 2], 20 * ls12[:, 5] - 20 * avera12, 20 * ls12[:, 6] - 20 * avedec12,
+             color="grey")
+draw_vectors(ax2, ls13[:, 1], ls13[:, 2], 20 * ls13[:, 5] - 20 * avera13, 20 * ls13[:, 6] - 20 * avedec13)
 
-    annotate( "", xy=(ls13[j][1], ls13[j][2]), xycoords='data', xytext=(
-    (ls13[j][1] + (20 * ls13[j][5]) - 20 * avera13), (ls13[j][2] + (20 * ls13[j][6]) - 20 * avedec13)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", connectionstyle="arc3" ) )
-
-    el = Ellipse( (ls13[j][1], ls13[j][2]), width=3 * log10( ls13[j][11] * 1000. ),
-                  height=3 * log10( ls13[j][11] * 1000. ), angle=0, lw=0.5 )
-    ax2.add_artist( el )
-    c = cm.jet( (ls13[j][0] - v1mi) / dv, 1 )
-    #   print c
-    el.set_facecolor( c )
+draw_spots(ax2, ls13[:, 1], ls13[:, 2], 1.5 * log10(ls13[:, 11] * 1000.), cm.jet((ls13[:, 0] - v1mi) / dv, 1),
+           linewidth=0.5)
 
 patches = []
 colors = v1
@@ -293,87 +224,15 @@ ax3 = plt.subplot(223, aspect='equal' )
 #  annotate("", xy=(x1[i], y1[i]), xycoords='data', xytext=(x2[i], y2[i]), textcoords='data',
 #         arrowprops=dict(arrowstyle="<-", connectionstyle="arc3"))
 
-ls13 = []
-ls12 = []
-lstex = []
+# max flux only from first epoch
+ls13 = motion_table(regions, number_of_epochs - 1, flux_epochs=[0])
+ls12 = motion_table(regions, 1, flux_epochs=[0])
 
-for j in range( len( lm ) ):
-    xx13 = 0
-    yy13 = 0
-    wek_x13 = 0
-    wek_y13 = 0
-    wek_xf13 = 0
-    wek_yf13 = 0
-    suma_vel13 = 0
-    length13 = 0
-    k13 = 0
-    xx12 = 0
-    yy12 = 0
-    wek_x12 = 0
-    wek_y12 = 0
-    wek_xf12 = 0
-    wek_yf12 = 0
-    suma_vel12 = 0
-    length12 = 0
-    k12 = 0
-    flux = []
-
-    for i in range( len( x1 ) ):
-
-        if x1[i] < lm[j][0] and x1[i] > lm[j][1]:
-            if y1[i] < lm[j][2] and y1[i] > lm[j][3]:
-                dx13 = x3[i] - x1[i]
-                dy13 = y3[i] - y1[i]
-                xx13 += dx13
-                yy13 += dy13
-                wek_x13 += x1[i]
-                wek_y13 += y1[i]
-                wek_xf13 += x3[i]
-                wek_yf13 += y3[i]
-                suma_vel13 += v1[i]
-                #         i1max = max(i1)
-                k13 += 1
-                #          print xx13, yy13, x1[i]
-                length13 = sqrt( xx13 ** 2 + yy13 ** 2 )
-                dx12 = x2[i] - x1[i]
-                dy12 = y2[i] - y1[i]
-                xx12 += dx12
-                yy12 += dy12
-                wek_x12 += x1[i]
-                wek_y12 += y1[i]
-                wek_xf12 += x2[i]
-                wek_yf12 += y2[i]
-                suma_vel12 += v1[i]
-                k12 += 1
-                #          print xx13, yy13, x1[i]
-                length12 = sqrt( xx12 ** 2 + yy12 ** 2 )
-                flux.append( [i1[i]] )
-    #          print flux
-    #          print length
-
-    #print( k12, k13 )
-
-    fluxa = array( flux )
-    ls13.append(
-        [suma_vel13 / k13, wek_x13 / k13, wek_y13 / k13, xx13, yy13, xx13 / k13, yy13 / k13, length13, length13 / k13,
-         wek_xf13 / k13, wek_yf13 / k13, fluxa.max()] )
-    ls12.append(
-        [suma_vel12 / k12, wek_x12 / k12, wek_y12 / k12, xx12, yy12, xx12 / k12, yy12 / k12, length12, length12 / k12,
-         wek_xf12 / k12, wek_yf12 / k12, fluxa.max()] )
-    #   lstex.append([suma_vel12/k12, wek_x12/k12, wek_y12/k12, xx12/(3033.0/365.0), yy12/(3033.0/365.0), xx13/(3776.0/365.0), yy13/(3776.0/365.0)] )
-    annotate( "", xy=(wek_x12 / k12, wek_y12 / k12), xycoords='data',
-              xytext=(wek_x12 / k12 + (20 * xx12 / k12), wek_y12 / k12 + (20 * yy12 / k12)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", color="grey", connectionstyle="arc3" ) )
-    annotate( "", xy=(wek_x13 / k13, wek_y13 / k13), xycoords='data',
-              xytext=(wek_x13 / k13 + (20 * xx13 / k13), wek_y13 / k13 + (20 * yy13 / k13)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", connectionstyle="arc3" ) )
-
-    el = Ellipse( (ls13[j][1], ls13[j][2]), width=3 * log10( ls13[j][11] * 1000. ),
-                  height=3 * log10( ls13[j][11] * 1000. ), angle=0, lw=0.5 )
-    ax3.add_artist( el )
-    c = cm.jet( (ls13[j][0] - v1mi) / dv, 1 )
-    #   print c
-    el.set_facecolor( c )
+draw_vectors(ax3, ls12[:, 1], ls12[:, 2], 20 * ls12[:, 5], 20 * ls12[:, 6], color="grey")
+draw_vectors(ax3, ls13[:, 1], ls13[:, 2], 20 * ls13[:, 5], 20 * ls13[:, 6])
+
+draw_spots(ax3, ls13[:, 1], ls13[:, 2], 1.5 * log10(ls13[:, 11] * 1000.), cm.jet((ls13[:, 0] - v1mi) / dv, 1),
+           linewidth=0.5)
 
 patches = []
 colors = v1
@@ -395,7 +254,7 @@ selectedra13 = []
 selecteddec12 = []
 selecteddec13 = []
 
-for j in range( len( lm ) ):
+for j in range( len( ls13 ) ):
     if ls13[j][1] > -200.0:
         selectedra13.append( ls13[j][5] )
         selecteddec13.append( ls13[j][6] )
@@ -447,20 +306,12 @@ plt.title( "G78: SW and 2 largest exc.", size=12 )
 # PLOT 4 - subtracted avera, avedec from PLOT 3
 ax4 = plt.subplot(224, aspect='equal' )
 
-for j in range( len( lm ) ):
-    annotate( "", xy=(ls12[j][1], ls12[j][2]), xycoords='data', xytext=(
-    (ls12[j][1] + (20 * ls12[j][5]) - 20 * avera12), (ls12[j][2] + (20 * ls12[j][6]) - 20 * avedec12)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", color="grey", connectionstyle="arc3" ) )
-    annotate( "", xy=(ls13[j][1], ls13[j][2]), xycoords='data', xytext=(
-    (ls13[j][1] + (20 * ls13[j][5]) - 20 * avera13), (ls13[j][2] + (20 * ls13[j][6]) - 20 * avedec13)),
-              textcoords='data', arrowprops=dict( arrowstyle="<-", connectionstyle="arc3" ) )
-
-    el = Ellipse( (ls13[j][1], ls13[j][2]), width=3 * log10( ls13[j][11] * 1000. ),
-                  height=3 * log10( ls13[j][11] * 1000. ), angle=0, lw=0.5 )
-    ax4.add_artist( el )
-    c = cm.jet( (ls13[j][0] - v1mi) / dv, 1 )
-    #   print c
-    el.set_facecolor( c )
+draw_vectors(ax4, ls12[:, 1], ls12[:, 2], 20 * ls12[:, 5] - 20 * avera12, 20 * ls12[:, 6] - 20 * avedec12,
+             color="grey")
+draw_vectors(ax4, ls13[:, 1], ls13[:, 2], 20 * ls13[:, 5] - 20 * avera13, 20 * ls13[:, 6] - 20 * avedec13)
+
+draw_spots(ax4, ls13[:, 1], ls13[:, 2], 1.5 * log10(ls13[:, 11] * 1000.), cm.jet((ls13[:, 0] - v1mi) / dv, 1),
+           linewidth=0.5)
 
 patches = []
 colors = v1
@@ -0,0 +1,148 @@
+"""
+results catalog of cloudlet statistics, one SQLite table instead of cloudlet_sub__<epoch>_<group>._sats.csv files
+"""
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+from utils.cloudlets import HEADER
+
+CATALOG_FILE = "cloudlets.sqlite"
+
+_VALUE_COLUMNS = HEADER[1:]
+
+_CREATE_TABLE = "CREATE TABLE IF NOT EXISTS cloudlet_sub (epoch TEXT NOT NULL, group_nr INTEGER NOT NULL, " \
+                "row_nr INTEGER NOT NULL, sub_group_nr INTEGER NOT NULL, " + \
+                ", ".join(column + " REAL" for column in _VALUE_COLUMNS) + \
+                ", PRIMARY KEY (epoch, group_nr, row_nr))"
+
+_CREATE_INDEXES = ["CREATE INDEX IF NOT EXISTS cloudlet_sub_epoch ON cloudlet_sub (epoch, group_nr, sub_group_nr)",
+                   "CREATE INDEX IF NOT EXISTS cloudlet_sub_group ON cloudlet_sub (group_nr, epoch, sub_group_nr)"]
+
+_NUMPY_REPR = re.compile(r"^np\.\w+\((.*)\)$")
+
+_INSERT = "INSERT INTO cloudlet_sub (epoch, group_nr, row_nr, " + ", ".join(HEADER) + ") VALUES (" + \
+          ", ".join(["?"] * (len(HEADER) + 3)) + ")"
+
+
+def connect(catalog_file=CATALOG_FILE):
+    """
+
+    :param catalog_file: catalog file, created if it does not exist
+    :return: sqlite3 connection with cloudlet_sub table and its indexes
+    """
+    connection = sqlite3.connect(catalog_file, timeout=60)
+    with connection:
+        connection.execute(_CREATE_TABLE)
+        for create_index in _CREATE_INDEXES:
+            connection.execute(create_index)
+    return connection
+
+
+def _catalog_row(epoch, group_nr, row_nr, row):
+    """
+
+    :param epoch: epoch name
+    :param group_nr: group number
+    :param row_nr: row number in cloudlet_sub table of epoch and group
+    :param row: row of cloudlet_sub table, "-" for missing values
+    :return: tuple of catalog values, None for missing values
+    """
+    values = [None if value == "-" else float(value) for value in row]
+    if len(values) < len(HEADER):
+        # rows without any fit have no gradient_au, position angles are always last
+        values = values[:-2] + [None] * (len(HEADER) - len(values)) + values[-2:]
+    return (epoch, int(group_nr), row_nr, int(values[0])) + tuple(values[1:])
+
+
+def write_cloudlets(tables, catalog_file=CATALOG_FILE):
+    """
+    replace cloudlet_sub rows of every epoch and group in tables in one transaction
+
+    :param tables: iterable of (epoch, group number, rows of cloudlet_sub table)
+    :param catalog_file: catalog file
+    :return: number of written rows
+    """
+    connection = connect(catalog_file)
+    count = 0
+    try:
+        with connection:
+            for epoch, group_nr, rows in tables:
+                connection.execute("DELETE FROM cloudlet_sub WHERE epoch = ? AND group_nr = ?", (epoch, int(group_nr)))
+                connection.executemany(_INSERT, [_catalog_row(epoch, group_nr, row_nr, rows[row_nr])
+                                                 for row_nr in range(0, len(rows))])
+                count += len(rows)
+    finally:
+        connection.close()
+    return count
+
+
+def read_cloudlets(group_nr=None, epoch=None, catalog_file=CATALOG_FILE):
+    """
+    query cloudlet_sub rows, both filters use an index
+
+    :param group_nr: only rows of this group, default all groups
+    :param epoch: only rows of this epoch, default all epochs
+    :param catalog_file: catalog file
+    :return: dict column name: column array ordered by group, epoch and row, missing values are nan
+    """
+    conditions = []
+    parameters = []
+    if group_nr is not None:
+        conditions.append("group_nr = ?")
+        parameters.append(int(group_nr))
+    if epoch is not None:
+        conditions.append("epoch = ?")
+        parameters.append(epoch)
+    query = "SELECT epoch, group_nr, " + ", ".join(HEADER) + " FROM cloudlet_sub"
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY group_nr, epoch, row_nr"
+
+    connection = connect(catalog_file)
+    try:
+        rows = connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+
+    columns = list(zip(*rows)) if len(rows) > 0 else [()] * (len(HEADER) + 2)
+    result = {"epoch": np.array(columns[0], dtype=str), "group_nr": np.array(columns[1], dtype=int),
+              "sub_group_nr": np.array(columns[2], dtype=int)}
+    for index in range(0, len(_VALUE_COLUMNS)):
+        result[_VALUE_COLUMNS[index]] = np.array(columns[index + 3], dtype=float)
+    return result
+
+
+def _parse_sats_line(line):
+    """
+
+    :param line: line of cloudlet_sub file, ragged tables were written as python list representations
+    :return: list of values as strings
+    """
+    line = line.strip()
+    if line.startswith("["):
+        line = line.strip("[]")
+    values = [value.strip().strip("'") for value in line.split(",")]
+    return [_NUMPY_REPR.sub(r"\1", value) for value in values]
+
+
+def import_sats_files(directory="./", catalog_file=CATALOG_FILE):
+    """
+    import cloudlet_sub__<epoch>_<group>._sats.csv files written by earlier versions of relgs.py and relgs2.py
+
+    :param directory: directory of cloudlet_sub files
+    :param catalog_file: catalog file
+    :return: number of imported files
+    """
+    tables = []
+    for file in sorted(os.listdir(directory)):
+        if not (file.startswith("cloudlet_sub__") and file.endswith("._sats.csv")):
+            continue
+        epoch, group_nr = file[len("cloudlet_sub__"):-len("._sats.csv")].rsplit("_", 1)
+        with open(os.path.join(directory, file)) as sats_file:
+            rows = [_parse_sats_line(line) for line in sats_file if line.strip() != "" and not line.startswith("#")]
+        tables.append((epoch, int(group_nr), rows))
+    write_cloudlets(tables, catalog_file)
+    return len(tables)
@@ -1,33 +1,56 @@
 """
 parse configure files
 """
+import os
+import copy
 import configparser
 
+CONFIG_FILE_PATH = "config/config.cfg"
+
 
 class Singleton(type):
     """
-    singleton base class
+    singleton base class, one instance per configuration file
     """
     __instances = {}
 
     def __call__(cls, *args, **kwargs):
-        if cls not in cls.__instances:
-            cls.__instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        else:
-            cls.__instances[cls].__init__(*args, **kwargs)
-        return cls.__instances[cls]
+        key = (cls, args, tuple(sorted(kwargs.items())))
+        if key not in cls.__instances:
+            cls.__instances[key] = super(Singleton, cls).__call__(*args, **kwargs)
+        return cls.__instances[key]
 
 
 class ConfigParser(metaclass=Singleton):
     """
-    singleton config parser
+    singleton config parser, file is parsed once and reloaded only when its mtime changes
     """
 
     def __init__(self, config_file_path):
+        self._config_file_path = config_file_path
+        self._mtime = None
+        self._config = configparser.RawConfigParser()
+        self._parsed = dict()
         if config_file_path is not None:
-            self._config_file_path = config_file_path
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self._config_file_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime != self._mtime:
             self._config = configparser.RawConfigParser()
             self._config.read(self._config_file_path)
+            self._parsed = dict()
+            self._mtime = mtime
+
+    def _get_parsed(self, name, parse):
+        self._reload_if_changed()
+        if name not in self._parsed:
+            self._parsed[name] = parse()
+        return copy.deepcopy(self._parsed[name])
 
     def get_config(self, section, key):
         """
@@ -36,6 +59,7 @@ class ConfigParser(metaclass=Singleton):
         :param key: key of section
         :return: configuration file value from section with key param key
         """
+        self._reload_if_changed()
         return self._config.get(section, key)
 
     def get_items(self, section):
@@ -44,4 +68,82 @@ class ConfigParser(metaclass=Singleton):
         :param section: section of configuration file
         :return: all items from section of configuration file
         """
+        self._reload_if_changed()
         return dict(self._config.items(section))
+
+    def get_file_order(self):
+        """
+
+        :return: list of epoch files from parameters fileOrder
+        """
+        return self._get_parsed("fileOrder", lambda: [file.strip() for file in
+                                                      self._config.get("parameters", "fileOrder").split(",")])
+
+    def get_dates(self):
+        """
+
+        :return: dict epoch: date from parameters dates, in configuration file order
+        """
+        return self._get_parsed("dates", lambda: {date.split("-")[0].strip(): date.split("-")[1].strip() for date
+                                                  in self._config.get("parameters", "dates").split(",")})
+
+    def get_gauss(self):
+        """
+
+        :return: dict EPOCH: list of group numbers fitted with two gaussian from parameters gauss
+        """
+        def parse():
+            gauss = dict()
+            for epoch in self._config.get("parameters", "gauss").split(";"):
+                gauss[epoch.split(":")[0].strip()] = [int(group) for group in epoch.split(":")[1].split(",")
+                                                      if group.strip() != ""]
+            return gauss
+
+        return self._get_parsed("gauss", parse)
+
+    def get_groups(self, epoch):
+        """
+
+        :param epoch: epoch name
+        :return: list of [first index, last index] of sub groups for epoch from grouops section
+        """
+        return self._get_parsed("grouops_" + epoch,
+                                lambda: [[int(g.split(",")[0]), int(g.split(",")[1])] for g in
+                                         self._config.get("grouops", epoch).split(";")])
+
+
+def get_file_order(config_file_path=CONFIG_FILE_PATH):
+    """
+
+    :param config_file_path: configuration file
+    :return: list of epoch files
+    """
+    return ConfigParser(config_file_path).get_file_order()
+
+
+def get_dates(config_file_path=CONFIG_FILE_PATH):
+    """
+
+    :param config_file_path: configuration file
+    :return: dict epoch: date
+    """
+    return ConfigParser(config_file_path).get_dates()
+
+
+def get_gauss(config_file_path=CONFIG_FILE_PATH):
+    """
+
+    :param config_file_path: configuration file
+    :return: dict EPOCH: list of group numbers fitted with two gaussian
+    """
+    return ConfigParser(config_file_path).get_gauss()
+
+
+def get_groups(epoch, config_file_path=CONFIG_FILE_PATH):
+    """
+
+    :param epoch: epoch name
+    :param config_file_path: configuration file
+    :return: list of [first index, last index] of sub groups for epoch
+    """
+    return ConfigParser(config_file_path).get_groups(epoch)
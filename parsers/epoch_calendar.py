@@ -0,0 +1,99 @@
+"""
+observation dates of epochs as MJD, cached next to configuration file
+"""
+import os
+
+import numpy as np
+
+from parsers.configparser_ import CONFIG_FILE_PATH, get_dates
+from parsers.epoch_parser import CACHE_DIR
+
+MJD_EPOCH = np.datetime64("1858-11-17", "D")
+
+_calendars = dict()
+
+
+def dates_to_mjd(dates):
+    """
+    MJD of midnight UTC of dates with plain numpy date arithmetic
+
+    :param dates: list of dates in format day.month.year
+    :return: array of MJD
+    """
+    days = []
+    for date in dates:
+        day, month, year = date.strip().split(".")
+        days.append("%04d-%02d-%02d" % (int(year), int(month), int(day)))
+    return (np.array(days, dtype="datetime64[D]") - MJD_EPOCH).astype(float)
+
+
+def dates_to_mjd_astropy(dates, scale):
+    """
+    MJD of midnight UTC of dates in other time scale with astropy
+
+    :param dates: list of dates in format day.month.year
+    :param scale: astropy time scale, for example "tt" or "tdb"
+    :return: array of MJD
+    """
+    from astropy.time import Time
+
+    isot = [str(np.datetime64(day, "s")) for day in MJD_EPOCH + dates_to_mjd(dates).astype("timedelta64[D]")]
+    return np.asarray(getattr(Time(isot, format="isot", scale="utc"), scale).mjd, dtype=float)
+
+
+def _cache_file(config_file_path, scale):
+    directory, name = os.path.split(os.path.abspath(config_file_path))
+    return os.path.join(directory, CACHE_DIR, name + "." + scale + ".mjd.npz")
+
+
+def _load_cache(cache_file, dates):
+    try:
+        with np.load(cache_file) as cache:
+            if cache["dates"].tolist() == dates:
+                return cache["mjd"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _write_cache(cache_file, dates, mjd):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = cache_file + ".%d.tmp.npz" % os.getpid()
+    np.savez(tmp_file, dates=np.array(dates), mjd=mjd)
+    os.replace(tmp_file, cache_file)
+
+
+def get_mjd(config_file_path=CONFIG_FILE_PATH, scale="utc"):
+    """
+
+    :param config_file_path: configuration file
+    :param scale: time scale, astropy is imported only for scales other than utc
+    :return: array of MJD of dates from configuration file in configuration file order
+    """
+    dates = list(get_dates(config_file_path).values())
+    key = (os.path.abspath(config_file_path), scale)
+    if key in _calendars and _calendars[key][0] == dates:
+        return _calendars[key][1].copy()
+
+    cache_file = _cache_file(config_file_path, scale)
+    mjd = _load_cache(cache_file, dates)
+    if mjd is None:
+        mjd = dates_to_mjd(dates) if scale == "utc" else dates_to_mjd_astropy(dates, scale)
+        try:
+            _write_cache(cache_file, dates, mjd)
+        except OSError:
+            pass
+
+    _calendars[key] = (dates, mjd)
+    return mjd.copy()
+
+
+def get_epoch_offsets(config_file_path=CONFIG_FILE_PATH, scale="utc"):
+    """
+
+    :param config_file_path: configuration file
+    :param scale: time scale
+    :return: array of days from first epoch
+    """
+    mjd = get_mjd(config_file_path, scale)
+    return mjd - mjd[0]
@@ -0,0 +1,247 @@
+"""
+parse epoch files (.groups and .out) into cached binary columnar arrays
+"""
+import os
+import hashlib
+import zipfile
+
+import numpy as np
+
+from utils.metrics import timed, count
+
+GROUPS_DTYPE = np.dtype([("group_nr", int), ("channel", float), ("velocity", float), ("intensity", float),
+                         ("integral", float), ("ra", float), ("dec", float)])
+
+OUT_DTYPE = np.dtype([("channel", float), ("velocity", float), ("intensity", float), ("integral", float),
+                      ("ra", float), ("dec", float)])
+
+CACHE_DIR = ".cache"
+
+_group_indexes = dict()
+
+
+def _cache_paths(file):
+    """
+
+    :param file: source text file
+    :return: path of binary cache file and path of its checksum sidecar
+    """
+    directory, name = os.path.split(os.path.abspath(file))
+    cache_file = os.path.join(directory, CACHE_DIR, name + ".npy")
+    return cache_file, cache_file + ".sha1"
+
+
+def file_checksum(file):
+    """
+
+    :param file: file path
+    :return: sha1 hex digest of file content
+    """
+    sha1 = hashlib.sha1()
+    with open(file, "rb") as input_file:
+        for block in iter(lambda: input_file.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _read_sidecar(sidecar_file):
+    """
+
+    :param sidecar_file: checksum sidecar path
+    :return: (checksum, size, mtime_ns) or None if there is no usable sidecar
+    """
+    try:
+        with open(sidecar_file) as sidecar:
+            checksum, size, mtime_ns = sidecar.read().split()
+        return checksum, int(size), int(mtime_ns)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_sidecar(sidecar_file, checksum, stat):
+    with open(sidecar_file, "w") as sidecar:
+        sidecar.write("%s %d %d\n" % (checksum, stat.st_size, stat.st_mtime_ns))
+
+
+def _parse_text(file, dtype):
+    """
+
+    :param file: text epoch file
+    :param dtype: structured dtype of the file columns
+    :return: structured array with one row per spot
+    """
+    columns = np.loadtxt(file, unpack=True, usecols=range(0, len(dtype.names)), ndmin=2)
+    data = np.empty(columns.shape[1], dtype=dtype)
+    for name, column in zip(dtype.names, columns):
+        data[name] = column
+    return data
+
+
+def _is_cache_valid(file, cache_file, sidecar_file):
+    if not os.path.isfile(cache_file):
+        return False
+
+    stamp = _read_sidecar(sidecar_file)
+    if stamp is None:
+        return False
+
+    checksum, size, mtime_ns = stamp
+    stat = os.stat(file)
+    if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+        return True
+
+    # file was touched, content decides
+    if stat.st_size == size and file_checksum(file) == checksum:
+        _write_sidecar(sidecar_file, checksum, stat)
+        return True
+
+    return False
+
+
+def _build_cache(file, dtype, cache_file, sidecar_file):
+    count("load_cache_builds")
+    stat = os.stat(file)
+    checksum = file_checksum(file)
+    data = _parse_text(file, dtype)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_file = cache_file + ".%d.tmp" % os.getpid()
+    with open(tmp_file, "wb") as output_file:
+        np.save(output_file, data)
+    os.replace(tmp_file, cache_file)
+    _write_sidecar(sidecar_file, checksum, stat)
+
+
+@timed("load")
+def load_epoch_file(file, dtype):
+    """
+
+    :param file: text epoch file
+    :param dtype: structured dtype of the file columns
+    :return: read only memory mapped structured array, rebuilt when source text changes
+    """
+    cache_file, sidecar_file = _cache_paths(file)
+    if not _is_cache_valid(file, cache_file, sidecar_file):
+        _build_cache(file, dtype, cache_file, sidecar_file)
+
+    data = np.load(cache_file, mmap_mode="r")
+    if data.dtype != dtype:
+        _build_cache(file, dtype, cache_file, sidecar_file)
+        data = np.load(cache_file, mmap_mode="r")
+    return data
+
+
+def unpack_columns(data):
+    """
+
+    :param data: structured array
+    :return: tuple of column views in file order, like np.loadtxt(..., unpack=True)
+    """
+    return tuple(data[name] for name in data.dtype.names)
+
+
+def load_groups(file, unpack=False):
+    """
+
+    :param file: .groups file
+    :param unpack: return tuple of columns instead of structured array
+    :return: structured array with columns group_nr, channel, velocity, intensity, integral, ra, dec
+    """
+    data = load_epoch_file(file, GROUPS_DTYPE)
+    if unpack:
+        return unpack_columns(data)
+    return data
+
+
+def load_out(file, unpack=False):
+    """
+
+    :param file: .out file
+    :param unpack: return tuple of columns instead of structured array
+    :return: structured array with columns channel, velocity, intensity, integral, ra, dec
+    """
+    data = load_epoch_file(file, OUT_DTYPE)
+    if unpack:
+        return unpack_columns(data)
+    return data
+
+
+class GroupIndex:
+    """
+    per epoch index of group_nr over rows of a .groups file
+    """
+
+    def __init__(self, data, group_nr, offsets, order):
+        self._data = data
+        self._group_nr = group_nr
+        self._offsets = offsets
+        self._order = order
+
+    @property
+    def groups(self):
+        """
+
+        :return: sorted unique group numbers in epoch
+        """
+        return self._group_nr
+
+    def _position(self, group):
+        position = np.searchsorted(self._group_nr, group)
+        if position < len(self._group_nr) and self._group_nr[position] == group:
+            return position
+        return -1
+
+    def __contains__(self, group):
+        return self._position(group) != -1
+
+    def rows(self, group):
+        """
+
+        :param group: group number
+        :return: rows of group in file order, empty array if group is not in epoch
+        """
+        position = self._position(group)
+        if position == -1:
+            return self._data[0:0].copy()
+        return self._data[self._order[self._offsets[position]:self._offsets[position + 1]]]
+
+
+def _build_group_index(data, checksum, index_file):
+    order = np.argsort(data["group_nr"], kind="stable")
+    group_nr, offsets = np.unique(data["group_nr"][order], return_index=True)
+    offsets = np.append(offsets, len(order))
+    # workers may build same index at once, so index is written to own file and renamed like the binary cache
+    tmp_file = index_file + ".%d.tmp" % os.getpid()
+    with open(tmp_file, "wb") as output_file:
+        np.savez(output_file, checksum=checksum, group_nr=group_nr, offsets=offsets, order=order)
+    os.replace(tmp_file, index_file)
+    return group_nr, offsets, order
+
+
+@timed("load_index")
+def load_group_index(file):
+    """
+
+    :param file: .groups file
+    :return: GroupIndex for file, index is persisted next to the binary cache
+    """
+    data = load_groups(file)
+    cache_file, sidecar_file = _cache_paths(file)
+    index_file = cache_file[:-len(".npy")] + ".index.npz"
+    checksum = _read_sidecar(sidecar_file)[0]
+
+    if index_file in _group_indexes and _group_indexes[index_file][0] == checksum:
+        return _group_indexes[index_file][1]
+
+    group_index = None
+    try:
+        with np.load(index_file) as index:
+            if str(index["checksum"]) == checksum:
+                group_index = GroupIndex(data, index["group_nr"], index["offsets"], index["order"])
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    if group_index is None:
+        group_index = GroupIndex(data, *_build_group_index(data, checksum, index_file))
+
+    _group_indexes[index_file] = (checksum, group_index)
+    return group_index
@@ -0,0 +1,34 @@
+"""
+parse numeric output tables written by np.savetxt with a header line of column names
+"""
+import numpy as np
+
+from utils.metrics import timed
+
+
+@timed("load_table")
+def load_table(file):
+    """
+    read table with header line of column names, header line may start with #, columns are separated by commas
+    or whitespace, same columns as astropy.io.ascii.read for these files
+
+    :param file: table file
+    :return: dict column name: column array in file column order
+    """
+    with open(file) as table_file:
+        header_line = 0
+        for line in table_file:
+            if line.strip() != "":
+                header = line.strip()
+                break
+            header_line += 1
+        else:
+            return dict()
+
+    delimiter = "," if "," in header else None
+    names = [name.strip() for name in header.lstrip("#").split(delimiter)]
+    skip_rows = header_line if header.startswith("#") else header_line + 1
+    data = np.loadtxt(file, delimiter=delimiter, comments="#", skiprows=skip_rows, ndmin=2)
+    if data.shape[0] == 0:
+        data = data.reshape((0, len(names)))
+    return {names[column]: data[:, column] for column in range(0, len(names))}
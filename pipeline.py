@@ -0,0 +1,88 @@
+import os
+import sys
+import argparse
+
+from parsers.configparser_ import ConfigParser
+from utils.pipeline import Stage, run_pipeline, stage_dependencies
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_configs(section, key):
+    """
+    :param section: configuration file secti
+    :param key: configuration file sections
+    :return: configuration file section key
+    """
+    config_file_path = "config/config.cfg"
+    config = ConfigParser(config_file_path)
+    return config.get_config(section, key)
+
+
+def get_stages():
+    """
+    analysis chain, test.py writes output3/output.dat, later stages read output2/output.dat that is copied by hand,
+    linear_fit only prints fitted coefficients, they are kept in its log in utils.pipeline.LOG_DIR
+
+    :return: list of stages
+    """
+    return [
+        Stage("match", os.path.join(SCRIPT_DIR, "test.py"),
+              inputs=[os.path.join(get_configs("paths", "dataFiles"), "*")],
+              outputs=["output3/output.dat"],
+              config_keys=[("parameters", "fileOrder"), ("paths", "dataFiles")]),
+        Stage("cloudlets", os.path.join(SCRIPT_DIR, "relgs_all.py"),
+              inputs=["groups/*.groups"],
+              outputs=["cloudlet_sub_all._sats.csv", "cloudlets.sqlite"],
+              config_keys=[("parameters", "fileOrder"), ("grouops", None)]),
+        Stage("mean_motion", os.path.join(SCRIPT_DIR, "mean_motion.py"), ["--no_plot"],
+              inputs=["output2/output.dat"],
+              outputs=["output2/output_mean_motion.dat", "output2/positionanglemotion_linearity.dat"],
+              config_keys=[("parameters", "fileOrder")]),
+        Stage("linear_fit", os.path.join(SCRIPT_DIR, "linear_fit.py"), ["--no_plot"],
+              inputs=["output2/output.dat"],
+              config_keys=[("parameters", "fileOrder"), ("parameters", "dates")]),
+        Stage("linear_errors", os.path.join(SCRIPT_DIR, "linear_errors.py"),
+              inputs=["output2/positionanglemotion_linearity.dat"],
+              outputs=["output2/linearity_errors_fitted_cm.dat", "output2/linearity_errors_fitted_tex_cm.dat",
+                       "output2/linearity_errors_fitted_tex_sort.dat"],
+              config_keys=[("parameters", "dates")]),
+        Stage("position_angle", os.path.join(SCRIPT_DIR, "position_angle.py"), ["--batch", "--output_dir", "plots"],
+              inputs=["output2/linearity_errors_fitted_cm.dat"],
+              outputs=["plots/position_angle.png"]),
+    ]
+
+
+def main(stage_names, processes, force, dry_run):
+    stages = get_stages()
+    if len(stage_names) > 0:
+        # selected stages and every stage producing their inputs
+        dependencies = stage_dependencies(stages)
+        selected = set()
+        names = list(stage_names)
+        while len(names) > 0:
+            name = names.pop()
+            if name not in dependencies:
+                raise ValueError("unknown stage " + name)
+            if name not in selected:
+                selected.add(name)
+                names.extend(dependencies[name])
+        stages = [stage for stage in stages if stage.name in selected]
+
+    status = run_pipeline(stages, processes, force, dry_run)
+    for stage in stages:
+        print(stage.name, status[stage.name])
+    return all(stage_status != "failed" for stage_status in status.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='run analysis chain, only stages with changed inputs run again')
+    parser.add_argument('stages', type=str, nargs='*', help='stages to bring up to date, default all stages')
+    parser.add_argument('--processes', type=int, help='number of concurrently running stages, default cpu count',
+                        default=None)
+    parser.add_argument('--force', action='store_true', help='run all selected stages')
+    parser.add_argument('--dry_run', action='store_true', help='only print which stages would run')
+    args = parser.parse_args()
+    if not main(args.stages, args.processes, args.force, args.dry_run):
+        sys.exit(1)
+    sys.exit(0)
@@ -1,16 +1,20 @@
 import sys
-from astropy.io import ascii
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
+import argparse
+
 from matplotlib import rc
 import matplotlib.cm as cm
 from matplotlib.collections import PatchCollection
 import numpy as np
 
+from parsers.table_parser import load_table
+from utils.plotting import get_pyplot, add_batch_arguments, show_or_save, velocity_colors, draw_spots, draw_vectors, \
+    draw_segments
+
 
-def main():
+def main(batch=False, output_dir="plots"):
+    plt = get_pyplot(batch=batch)
     output_file = "output2/linearity_errors_fitted_cm.dat"
-    output_data = ascii.read(output_file)
+    output_data = load_table(output_file)
     v1 = output_data["vel"]
     f = output_data["f"]
     x1 = output_data["x1"]
@@ -28,7 +32,6 @@ def main():
     errxmaxlong = output_data["errxmaxlong"]
     errymaxlong = output_data["errymaxlong"]
 
-    dv = (v1.max() - v1.min())
     v1mi = v1.min()
     v1mx = v1.max()
 
@@ -38,25 +41,16 @@ def main():
     plt.figure(figsize=(7, 5), dpi=100)
     ax1 = plt.subplot( 111, aspect='equal' )
 
-    ls = []
-    lsreal = []
-    for i in range(len(x1)):
-        leng = np.sqrt((x1[i] - xlong2[i]) ** 2 + (y1[i] - ylong2[i]) ** 2)
-        lengreal = np.sqrt((x1[i] - x2[i]) ** 2 + (y1[i] - y2[i]) ** 2)
-        lsreal.append([lengreal])
-        ls.append([leng])
-        ax1.annotate("", xy=(x1[i], y1[i]), xycoords='data', xytext=(errxmaxlong[i], errymaxlong[i]), textcoords='data',
-                     arrowprops=dict( arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-        ax1.annotate("", xy=(x1[i], y1[i]), xycoords='data', xytext=(errxminlong[i], erryminlong[i]), textcoords='data',
-                     arrowprops=dict( arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-        ax1.annotate("", xy=(errxminlong[i], erryminlong[i]), xycoords='data', xytext=(errxmaxlong[i], errymaxlong[i]),
-                     textcoords='data', arrowprops=dict(arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-        ax1.annotate("", xy=(x1[i], y1[i]), xycoords='data', xytext=(xlong2[i], ylong2[i]), textcoords='data', size=7,
-                     arrowprops=dict(arrowstyle="<-", color="black", connectionstyle="arc3"))
-        el = Circle((x1[i], y1[i]), radius=3 * np.log10(f[i] * 1000.), angle=0, lw=0.5)
-        ax1.add_artist(el)
-        c = cm.jet((v1[i] - v1mi) / dv, 1)
-        el.set_facecolor(c)
+    ls = np.sqrt((x1 - xlong2) ** 2 + (y1 - ylong2) ** 2)
+    lsreal = np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+
+    # error wedge of every vector is two sides from spot and the far edge, all in one LineCollection
+    draw_segments(ax1, np.concatenate((x1, x1, errxminlong)), np.concatenate((y1, y1, erryminlong)),
+                  np.concatenate((errxmaxlong, errxminlong, errxmaxlong)),
+                  np.concatenate((errymaxlong, erryminlong, errymaxlong)), color="grey", alpha=0.5)
+    draw_vectors(ax1, x1, y1, xlong2 - x1, ylong2 - y1, color="black")
+
+    draw_spots(ax1, x1, y1, 3 * np.log10(f * 1000.), velocity_colors(v1, v1mi, v1mx), linewidth=0.5)
 
     patches = []
     colors = v1
@@ -87,9 +81,12 @@ def main():
     alsreal = np.array(lsreal)
     print("max lenght is ", als.max())
     print("max lenght is ", alsreal.max())
-    plt.show()
-    sys.exit(0)
+    show_or_save(plt, batch, output_dir, "position_angle")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='position angles and motions of features')
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    main(args.batch, args.output_dir)
+    sys.exit(0)
@@ -1,13 +1,18 @@
 #!/usr/bin/env python
 # -*- coding:utf8 -*-
 
-from pylab import *
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.pyplot import annotate, figure, plot, savefig, show
+from numpy import array, concatenate, loadtxt, log10, sqrt
 #from matplotlib import rc
-from matplotlib.patches import Ellipse
 from matplotlib import rc
 import matplotlib.cm as cm
 from matplotlib.collections import PatchCollection
 
+from utils.plotting import draw_spots, draw_segments, draw_vectors
+
 #FONTS
 rc('font', family='serif', style='normal', variant='normal', weight='normal', stretch='normal', size=12)
 
@@ -27,29 +32,16 @@ print(v1mi, v1mx)
 ax1 = plt.subplot(111, aspect='equal')
 #plot (x1,y1)
 
-#leng = 0
-ls = []
-lsreal = []
-
-for i in range(len(x1)):
-#   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(x2[i],y2[i]),textcoords='data', arrowprops=dict(arrowstyle="<-", color="black", connectionstyle="arc3"))
-   leng = sqrt((x1[i]-xlong2[i])**2 + (y1[i]-ylong2[i])**2)
-   lengreal = sqrt((x1[i]-x2[i])**2 + (y1[i]-y2[i])**2)
-#   print leng
-   ls.append([leng])
-   lsreal.append([lengreal])
-#   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(x2[i],y2[i]),textcoords='data', arrowprops=dict(arrowstyle="<-", color="black", connectionstyle="arc3"))
-#   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(errxmax[i],errymax[i]),textcoords='data', arrowprops=dict(arrowstyle="<-", color="grey", connectionstyle="arc3"))
-#   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(errxmin[i],errymin[i]),textcoords='data', arrowprops=dict(arrowstyle="<-", color="grey", connectionstyle="arc3"))
-   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(errxmaxlong[i],errymaxlong[i]),textcoords='data', arrowprops=dict(arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(errxminlong[i],erryminlong[i]),textcoords='data', arrowprops=dict(arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-   annotate("", xy=(errxminlong[i],erryminlong[i]), xycoords='data', xytext=(errxmaxlong[i],errymaxlong[i]),textcoords='data', arrowprops=dict(arrowstyle="-", color="grey", connectionstyle="arc3", alpha=0.5))
-   annotate("", xy=(x1[i],y1[i]), xycoords='data', xytext=(xlong2[i],ylong2[i]),textcoords='data', size = 7, arrowprops=dict(arrowstyle="<-", color="black", connectionstyle="arc3"))
-   el = Ellipse([x1[i],y1[i]], width=3*log10(f[i]*1000.), height=3*log10(f[i]*1000.), angle=0, lw=0.5)
-   ax1.add_artist(el)
-   c = cm.jet((v1[i]-v1mi)/dv,1)   
-#   print c
-   el.set_facecolor(c)
+ls = sqrt((x1-xlong2)**2 + (y1-ylong2)**2)
+lsreal = sqrt((x1-x2)**2 + (y1-y2)**2)
+
+# error wedges and vectors of all features in one call per layer
+draw_segments(ax1, concatenate((x1, x1, errxminlong)), concatenate((y1, y1, erryminlong)),
+              concatenate((errxmaxlong, errxminlong, errxmaxlong)), concatenate((errymaxlong, erryminlong, errymaxlong)),
+              color="grey", alpha=0.5)
+draw_vectors(ax1, x1, y1, xlong2-x1, ylong2-y1, color="black")
+
+draw_spots(ax1, x1, y1, 1.5 * log10(f * 1000.), cm.jet((v1 - v1mi) / dv, 1), linewidth=0.5)
 
 patches = []
 colors = v1
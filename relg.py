@@ -2,16 +2,14 @@ import sys
 import argparse
 
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib import cm, rcParams
-from matplotlib.patches import Circle
-from matplotlib.ticker import MultipleLocator
-from scipy.optimize import curve_fit
-from astropy import units as u
-from astropy.coordinates import SkyCoord
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from parsers.epoch_parser import load_group_index
+from utils.fitting import multi_start_fit, initial_guesses
+from utils.gauss import gauss, gauss2
+from utils.plotting import get_pyplot, add_batch_arguments, parse_group_numbers, show_or_save, velocity_colors, \
+    draw_spots
+from utils.separation import find_max_separation, pairwise_distances
 
 
 def str2bool(v):
@@ -27,12 +25,7 @@ def str2bool(v):
 
 def check_if_group_is_in_file(file, group):
     input_file = "groups/" + "/" + file
-    group_nr = np.loadtxt(input_file, unpack=True, usecols=0)
-
-    if group not in group_nr:
-        return False
-    else:
-        return True
+    return group in load_group_index(input_file)
 
 
 def get_configs(section, key):
@@ -55,16 +48,6 @@ def get_configs_items():
     return config.get_items("main")
 
 
-def gauss(x, *p):
-    a, b, c = p
-    return a * np.exp(-(x - b) ** 2 * np.log(2) / (c ** 2))
-
-
-def gauss2(x, *p):
-    a1, b1, c1, a2, b2, c2 = p
-    return a1 * np.exp(-(x - b1) ** 2 * np.log(2) / c1 ** 2) + a2 * np.exp(-(x - b2) ** 2 * np.log(2) / c2 ** 2)
-
-
 def firs_exceeds(array, value):
     index = -1
     for i in range(0, len(array)):
@@ -74,8 +57,10 @@ def firs_exceeds(array, value):
     return index
 
 
-def main(group_number, ddddd):
-    matplotlib.use('TkAgg')
+def main(group_number, ddddd, batch=False, output_dir="plots"):
+    plt = get_pyplot('TkAgg', batch)
+    from matplotlib import rcParams
+    from matplotlib.ticker import MultipleLocator
     configuration_items = get_configs_items()
     for key, value in configuration_items.items():
         rcParams[key] = value
@@ -84,14 +69,13 @@ def main(group_number, ddddd):
     minor_locatory = MultipleLocator(20)
     minor_locator_level = MultipleLocator(1)
 
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    file_order = get_file_order()
     input_files = []
 
     for file in file_order:
         input_files.append(file)
 
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
 
     bad_files = []
     for file in input_files:
@@ -106,20 +90,12 @@ def main(group_number, ddddd):
         epoch = input_files[index].split(".")[0]
         data[epoch] = dict()
         input_file = "groups/" + "/" + input_files[index].split(".")[0] + ".groups"
-        intensity = np.empty(0)
-        channels = np.empty(0)
-        ra = np.empty(0)
-        dec = np.empty(0)
-        velocity = np.empty(0)
-        group_tmp, channel_tmp, velocity_tmp, intensity_tmp, ra_tmp, dec_tmp = \
-            np.loadtxt(input_file, unpack=True, usecols=(0, 1, 2, 3, 5, 6))
-        for i in range(0, len(channel_tmp)):
-            if group_tmp[i] == int(group_number):
-                intensity = np.append(intensity, intensity_tmp[i])
-                channels = np.append(channels, channel_tmp[i])
-                ra = np.append(ra, ra_tmp[i])
-                dec = np.append(dec, dec_tmp[i])
-                velocity = np.append(velocity, velocity_tmp[i])
+        group_data = load_group_index(input_file).rows(int(group_number))
+        intensity = group_data["intensity"]
+        channels = group_data["channel"]
+        ra = group_data["ra"]
+        dec = group_data["dec"]
+        velocity = group_data["velocity"]
 
         max_intensity.append(max(intensity))
         data[epoch]["index_for_max_intensity"] = np.where(intensity == max(intensity))[0][0]
@@ -182,16 +158,7 @@ def main(group_number, ddddd):
         dec = data[epoch]["dec"]
         title = dates[epoch]
 
-        max_separation = {"r": 0, "d": -1, "separation": 0}
-        sky_coords = [SkyCoord(ra[coord], dec[coord], unit=u.arcsec) for coord in range(0, len(ra))]
-        for r in range(0, len(ra)):
-            for d in range(0, len(dec)):
-                if r != d:
-                    separation = sky_coords[r].separation(sky_coords[d])
-                    if separation > max_separation["separation"]:
-                        max_separation["r"] = r
-                        max_separation["d"] = d
-                        max_separation["separation"] = separation
+        max_separation = find_max_separation(ra, dec)
 
         m, b = np.polyfit([ra[max_separation["r"]], ra[max_separation["d"]]],
                           [dec[max_separation["r"]], dec[max_separation["d"]]], 1)
@@ -230,12 +197,8 @@ def main(group_number, ddddd):
 
             print("number of gauss", len(velocity_tmp))
             for gauss_nr in range(0, len(velocity_tmp)):
-                size = []
                 max_intensity_index = np.array(intensity_tmp[gauss_nr]).argmax()
-                for j in range(0, len(velocity_tmp[gauss_nr])):
-                    for k in range(j + 1, len(velocity_tmp[gauss_nr])):
-                        dist = np.sqrt((ra[j] - ra[k]) ** 2 + (dec[j] - dec[k]) ** 2)
-                        size.append(dist)
+                size = pairwise_distances(ra[0:len(velocity_tmp[gauss_nr])], dec[0:len(velocity_tmp[gauss_nr])])
 
                 if len(velocity_tmp[gauss_nr]) >= 3:
 
@@ -254,29 +217,11 @@ def main(group_number, ddddd):
                           [0.035, -7.75, 0.001]]
 
                     q = np.linspace(min(velocity_tmp[gauss_nr]), max(velocity_tmp[gauss_nr]), 10000)
-                    perrs = []
-                    coeffs = []
-                    for p in ps:
-                        #if epoch == "ea063":
-                        #    p = [0.035, -7.75, 0.001]
-                        try:
-                            if len(p) == 3:
-                                coeff, var_matrix = curve_fit(gauss, velocity_tmp[gauss_nr], intensity_tmp[gauss_nr],
-                                                              p0=p, method="lm")
-                            else:
-                                coeff, var_matrix = curve_fit(gauss2, velocity_tmp[gauss_nr], intensity_tmp[gauss_nr],
-                                                              p0=p, method="lm")
-
-                            perr = np.sqrt(np.diag(var_matrix))
-                            perr = perr[~np.isnan(perr)]
-                            perrs.append(np.mean(perr) / len(perr))
-                            coeffs.append(coeff)
-                        except:
-                            pass
-
-                    if len(perrs) > 0:
-                        coeff_index = perrs.index(min(perrs))
-                        coeff = coeffs[coeff_index]
+                    starts = ps + initial_guesses(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr])
+                    best_fit = multi_start_fit(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr], starts)[0]
+
+                    if best_fit is not None:
+                        coeff = best_fit.coeff
 
                         if len(coeff) == 6:
                             hist_fit = gauss2(q, *coeff)
@@ -348,17 +293,9 @@ def main(group_number, ddddd):
         for o in range(0, len(velocity)):
             output.append([epoch, velocity[o], intensity[o], ra[o], dec[o], position_angle])
 
-        for i in range(len(velocity)):
-            if velocity[i] < min(velocity_min) or velocity[i] > max(velocity_max):
-                c = (0, 0, 0)
-            else:
-                c = cm.turbo((velocity[i] - min(velocity_min)) / (max(velocity_max) - min(velocity_min)), 1)
-
-            ax[0][index].scatter((velocity[i]), (intensity[i],), color=c, lw=2)
-
-            el = Circle((ra[i], dec[i]), radius=0.05 * np.log(intensity[i] * 1000), angle=0, lw=2)
-            el.set_facecolor(c)
-            ax[1][index].add_artist(el)
+        color = velocity_colors(velocity, min(velocity_min), max(velocity_max), "turbo")
+        ax[0][index].scatter(velocity, intensity, color=color, lw=2)
+        draw_spots(ax[1][index], ra, dec, 0.05 * np.log(intensity * 1000), color)
 
         ax[0][index].set_xlim(min(velocity_min) - 0.2, max(velocity_max) + 0.5)
         ax[0][index].set_ylim((min(intensity_min)) - 0.5, (max(intensity_max) + 0.5))
@@ -389,13 +326,16 @@ def main(group_number, ddddd):
     ax[1][0].set_ylabel('$\\Delta$ Dec (mas)')
     plt.tight_layout()
     plt.subplots_adjust(top=0.947, bottom=0.085, left=0.044, right=0.987, hspace=0.229, wspace=0.182)
-    plt.show()
+    show_or_save(plt, batch, output_dir, "relg_" + str(group_number))
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='plot group')
-    parser.add_argument('group_number', type=int, help='group number')
+    parser.add_argument('group_numbers', type=str, help='group numbers or ranges of group numbers, for example 1 4-7',
+                        nargs='+')
     parser.add_argument('--d', type=str2bool, help='plot line', default=True)
+    add_batch_arguments(parser)
     args = parser.parse_args()
-    main(args.group_number, args.d)
+    for group_number in parse_group_numbers(args.group_numbers):
+        main(group_number, args.d, args.batch, args.output_dir)
     sys.exit(0)
@@ -2,17 +2,15 @@ import sys
 import argparse
 
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib import cm, rcParams
-from matplotlib.patches import Circle
-from matplotlib.ticker import MultipleLocator
-from scipy.optimize import curve_fit
-from astropy import units as u
-from astropy.coordinates import SkyCoord
-from scipy.stats import stats, pearsonr
 
-from parsers.configparser_ import ConfigParser
+from parsers.cloudlet_catalog import CATALOG_FILE, write_cloudlets
+from parsers.configparser_ import ConfigParser, get_dates, get_groups
+from parsers.epoch_parser import load_group_index
+from utils.fitting import multi_start_fit, initial_guesses
+from utils.gauss import gauss, gauss2
+from utils.plotting import get_pyplot, add_batch_arguments, parse_group_numbers, show_or_save, velocity_colors, \
+    draw_spots
+from utils.separation import find_max_separation, pairwise_distances
 
 
 def str2bool(v):
@@ -28,12 +26,7 @@ def str2bool(v):
 
 def check_if_group_is_in_file(file, group):
     input_file = file
-    group_nr = np.loadtxt(input_file, unpack=True, usecols=0)
-
-    if group not in group_nr:
-        return False
-    else:
-        return True
+    return group in load_group_index(input_file)
 
 
 def get_configs(section, key):
@@ -56,16 +49,6 @@ def get_configs_items():
     return config.get_items("main")
 
 
-def gauss(x, *p):
-    a, b, c = p
-    return a * np.exp(-(x - b) ** 2 * np.log(2) / (c ** 2))
-
-
-def gauss2(x, *p):
-    a1, b1, c1, a2, b2, c2 = p
-    return a1 * np.exp(-(x - b1) ** 2 * np.log(2) / c1 ** 2) + a2 * np.exp(-(x - b2) ** 2 * np.log(2) / c2 ** 2)
-
-
 def firs_exceeds(array, value):
     index = -1
     for i in range(0, len(array)):
@@ -75,11 +58,14 @@ def firs_exceeds(array, value):
     return index
 
 
-def main(group_number, epoch, ddddd):
-    groups = [[int(g.split(",")[0]), int(g.split(",")[1])] for g in get_configs("grouops", epoch).split(";")]
+def main(group_number, epoch, ddddd, batch=False, output_dir="plots", catalog_file=CATALOG_FILE):
+    groups = get_groups(epoch)
     output = []
 
-    matplotlib.use('TkAgg')
+    plt = get_pyplot('TkAgg', batch)
+    from matplotlib import rcParams
+    from matplotlib.ticker import MultipleLocator
+    from scipy.stats import linregress
     configuration_items = get_configs_items()
     for key, value in configuration_items.items():
         rcParams[key] = value
@@ -89,19 +75,10 @@ def main(group_number, epoch, ddddd):
     minor_locator_level = MultipleLocator(1)
 
     input_file = "groups/" + epoch + ".groups"
-    date = {date.split("-")[0].strip():
-            date.split("-")[1].strip() for date in get_configs("parameters", "dates").split(",")}[epoch]
+    date = get_dates()[epoch]
 
     if check_if_group_is_in_file(input_file, group_number):
-        group_tmp, velocity_tmp, intensity_tmp, ra_tmp, dec_tmp = \
-            np.loadtxt(input_file, unpack=True, usecols=(0, 2, 3, 5, 6))
-
-        dtype = [('group_nr', int), ('velocity', float), ('intensity', float), ("ra", float), ("dec", float)]
-        values = [(group_tmp[ch], velocity_tmp[ch], intensity_tmp[ch], ra_tmp[ch], dec_tmp[ch])
-                  for ch in range(0, len(group_tmp))]
-        data = np.array(values, dtype=dtype)
-        data = np.sort(data, order=['group_nr', 'velocity'])
-        data = data[data["group_nr"] == group_number]
+        data = np.sort(load_group_index(input_file).rows(group_number), order=['group_nr', 'velocity'])
 
         max_intensity = max(data["intensity"])
         reference_index = np.where(data["intensity"] == max_intensity)[0][0]
@@ -124,22 +101,12 @@ def main(group_number, epoch, ddddd):
         fig2, ax2 = plt.subplots(nrows=1, ncols=1, figsize=(16, 16), dpi=90)
         coord_range = max(max(ra) - min(ra), max(dec) - min(dec))
 
-        color = []
-        for v in range(0, len(velocity)):
-            if velocity[v] < min(velocity) or velocity[v] > max(velocity):
-                c = (0, 0, 0)
-            else:
-                c = cm.turbo((velocity[v] - min(velocity)) / (max(velocity) - min(velocity)), 1)
-
-            color.append(c)
-
-            el = Circle((ra[v], dec[v]), radius=0.05 * np.log(intensity[v] * 1000), angle=0, lw=2)
-            el.set_facecolor(c)
-            ax[1].add_artist(el)
+        color = velocity_colors(velocity, min(velocity), max(velocity), "turbo")
+        draw_spots(ax[1], ra, dec, 0.05 * np.log(intensity * 1000), color)
 
         ax[0].scatter(velocity, intensity, color=color, lw=2)
 
-        slope, intercept, r_value, p_value, std_err = stats.linregress(ra, dec)
+        slope, intercept, r_value, p_value, std_err = linregress(ra, dec)
         line = slope * ra + intercept
         ax[1].plot(ra, line, 'm', linewidth=10)
 
@@ -148,16 +115,7 @@ def main(group_number, epoch, ddddd):
         #print("Distance between fit and points", line-dec)
         #print("Pearsonr correlation", pearsonr(ra, line))
 
-        max_separation = {"r": 0, "d": -1, "separation": 0}
-        sky_coords = [SkyCoord(ra[coord], dec[coord], unit=u.arcsec) for coord in range(0, len(ra))]
-        for r in range(0, len(ra)):
-            for d in range(0, len(dec)):
-                if r != d:
-                    separation = sky_coords[r].separation(sky_coords[d])
-                    if separation > max_separation["separation"]:
-                        max_separation["r"] = r
-                        max_separation["d"] = d
-                        max_separation["separation"] = separation
+        max_separation = find_max_separation(ra, dec)
 
         m, b = np.polyfit([ra[max_separation["r"]], ra[max_separation["d"]]],
                           [dec[max_separation["r"]], dec[max_separation["d"]]], 1)
@@ -193,12 +151,8 @@ def main(group_number, epoch, ddddd):
                 dec_tmp = [dec]
 
             for gauss_nr in range(0, len(velocity_tmp)):
-                size = []
                 max_intensity_index = np.array(intensity_tmp[gauss_nr]).argmax()
-                for j in range(0, len(velocity_tmp[gauss_nr])):
-                    for k in range(j + 1, len(velocity_tmp[gauss_nr])):
-                        dist = np.sqrt((ra[j] - ra[k]) ** 2 + (dec[j] - dec[k]) ** 2)
-                        size.append(dist)
+                size = pairwise_distances(ra[0:len(velocity_tmp[gauss_nr])], dec[0:len(velocity_tmp[gauss_nr])])
 
                 if len(velocity_tmp[gauss_nr]) >= 3:
 
@@ -217,29 +171,11 @@ def main(group_number, epoch, ddddd):
                           [0.035, -7.75, 0.001]]
 
                     q = np.linspace(min(velocity_tmp[gauss_nr]), max(velocity_tmp[gauss_nr]), 10000)
-                    perrs = []
-                    coeffs = []
-                    for p in ps:
-                        #if epoch == "ea063":
-                            #p = [0.035, -7.75, 0.001]
-                        try:
-                            if len(p) == 3:
-                                coeff, var_matrix = curve_fit(gauss, velocity_tmp[gauss_nr], intensity_tmp[gauss_nr],
-                                                              p0=p, method="lm")
-                            else:
-                                coeff, var_matrix = curve_fit(gauss2, velocity_tmp[gauss_nr], intensity_tmp[gauss_nr],
-                                                              p0=p, method="lm")
-
-                            perr = np.sqrt(np.diag(var_matrix))
-                            perr = perr[~np.isnan(perr)]
-                            perrs.append(np.mean(perr) / len(perr))
-                            coeffs.append(coeff)
-                        except:
-                            pass
-
-                    if len(perrs) > 0:
-                        coeff_index = perrs.index(min(perrs))
-                        coeff = coeffs[coeff_index]
+                    starts = ps + initial_guesses(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr])
+                    best_fit = multi_start_fit(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr], starts)[0]
+
+                    if best_fit is not None:
+                        coeff = best_fit.coeff
 
                         if len(coeff) == 6:
                             hist_fit = gauss2(q, *coeff)
@@ -336,7 +272,10 @@ def main(group_number, epoch, ddddd):
                     hist_fit = gauss(q, *coeff)
                 '''
 
-                coeff, var_matrix = curve_fit(gauss, x, y, p0=p, method="lm", maxfev=100000)
+                best_fit = multi_start_fit(x, y, [p] + initial_guesses(x, y, max_components=1))[0]
+                if best_fit is None:
+                    continue
+                coeff = best_fit.coeff
                 hist_fit = gauss(q, *coeff)
                 hist_fit2 = gauss(velocity, *coeff)
                 hist_fits.append(hist_fit)
@@ -347,28 +286,14 @@ def main(group_number, epoch, ddddd):
 
                 ra_tmp = ra[index1:index2]
                 dec_tmp = dec[index1:index2]
-                slope, intercept, r_value, p_value, std_err = stats.linregress(ra_tmp, dec_tmp)
+                slope, intercept, r_value, p_value, std_err = linregress(ra_tmp, dec_tmp)
                 line = slope * ra_tmp + intercept
                 ax[1].plot(ra_tmp, line, c=color, linewidth=10)
 
-                max_separation = {"r": 0, "d": -1, "separation": 0}
-                sky_coords = [SkyCoord(ra_tmp[coord], dec_tmp[coord], unit=u.arcsec)
-                              for coord in range(0, len(ra_tmp))]
-                size = []
                 max_intensity_index = np.array(y).argmax()
-                for j in range(0, len(x)):
-                    for k in range(j + 1, len(x)):
-                        dist = np.sqrt((ra_tmp[j] - ra_tmp[k]) ** 2 + (dec_tmp[j] - dec_tmp[k]) ** 2)
-                        size.append(dist)
-
-                for r in range(0, len(ra_tmp)):
-                    for d in range(0, len(dec_tmp)):
-                        if r != d:
-                            separation = sky_coords[r].separation(sky_coords[d])
-                            if separation > max_separation["separation"]:
-                                max_separation["r"] = r
-                                max_separation["d"] = d
-                                max_separation["separation"] = separation
+                size = pairwise_distances(ra_tmp, dec_tmp)
+
+                max_separation = find_max_separation(ra_tmp, dec_tmp)
 
                 m, b = np.polyfit([ra_tmp[max_separation["r"]], ra_tmp[max_separation["d"]]],
                                   [dec_tmp[max_separation["r"]], dec_tmp[max_separation["d"]]], 1)
@@ -409,23 +334,22 @@ def main(group_number, epoch, ddddd):
         ax2.set_title("Residuals for spectre")
         plt.tight_layout()
         plt.subplots_adjust(top=0.947, bottom=0.085, left=0.044, right=0.987, hspace=0.229, wspace=0.182)
-        plt.show()
+        show_or_save(plt, batch, output_dir, "relgs2_" + epoch + "_" + str(group_number))
 
-        header2 = ["sub_group_nr", "ra", "dec", "velocity", "vel_fit", "sigma", "max_intensity", "fit_amp", "vel_fit2",
-                   "sigma2", "fit_amp2", "max_distance", "max_distance_au", "gradient", "gradient_au",
-                   "position_angle", "position_angle2"]
-        np.savetxt("cloudlet_sub_" + "_" + epoch + "_" + str(group_number) + "._sats.csv",
-                   np.array(output, dtype=object), delimiter=", ", fmt='%s', header=",".join(header2))
+        write_cloudlets([(epoch, group_number, output)], catalog_file)
     else:
-        print("group is not in epoch")
-        sys.exit()
+        print("group " + str(group_number) + " is not in epoch")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='plot group')
-    parser.add_argument('group_number', type=int, help='group number')
+    parser.add_argument('group_numbers', type=str, help='group numbers or ranges of group numbers, for example 1 4-7',
+                        nargs='+')
     parser.add_argument('epoch', type=str, help='epoch name', choices=["el032", "em064c", "em064d", "es066e", "ea063"])
     parser.add_argument('--d', type=str2bool, help='plot line', default=True)
+    parser.add_argument('--catalog', type=str, help='results catalog of cloudlet statistics', default=CATALOG_FILE)
+    add_batch_arguments(parser)
     args = parser.parse_args()
-    main(args.group_number, args.epoch, args.d)
+    for group_number in parse_group_numbers(args.group_numbers):
+        main(group_number, args.epoch, args.d, args.batch, args.output_dir, args.catalog)
     sys.exit(0)
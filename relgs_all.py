@@ -0,0 +1,104 @@
+import os
+import sys
+import argparse
+import warnings
+from multiprocessing import Pool
+
+import numpy as np
+
+from parsers.cloudlet_catalog import CATALOG_FILE, write_cloudlets
+from parsers.configparser_ import get_file_order, get_groups
+from parsers.epoch_parser import load_group_index
+from utils.cloudlets import HEADER, epoch_statistics
+from utils.plotting import parse_group_numbers
+
+# epoch -> (GroupIndex, sub groups), filled before the pool is started so forked workers share the arrays read only
+_epochs = dict()
+
+
+def load_epochs():
+    """
+
+    :return: dict epoch -> (GroupIndex of epoch, sub groups of epoch) in configuration file order
+    """
+    if len(_epochs) == 0:
+        for file in get_file_order():
+            epoch = file.split(".")[0]
+            _epochs[epoch] = (load_group_index("groups/" + epoch + ".groups"), get_groups(epoch))
+    return _epochs
+
+
+def analyse_group(group_number):
+    """
+    cloudlet statistics of relgs.py for group in every epoch, errors are returned instead of raised
+
+    :param group_number: group number
+    :return: group number, list of (epoch, rows of cloudlet_sub table), error message or None
+    """
+    warnings.filterwarnings("ignore")
+    tables = []
+    try:
+        for epoch, (group_index, groups) in load_epochs().items():
+            if group_number not in group_index:
+                continue
+            data = np.sort(group_index.rows(group_number), order=['group_nr', 'velocity'])
+            reference_index = data["intensity"].argmax()
+            reference_ra = data["ra"][reference_index]
+            reference_dec = data["dec"][reference_index]
+            data["ra"] -= reference_ra
+            data["dec"] -= reference_dec
+            tables.append((epoch, epoch_statistics(data, groups, reference_ra, reference_dec)["rows"]))
+    except Exception as error:
+        return group_number, [], type(error).__name__ + ": " + str(error)
+    return group_number, tables, None
+
+
+def main(group_numbers, processes, output_file, catalog_file):
+    epochs = load_epochs()
+    if len(group_numbers) == 0:
+        group_numbers = np.unique(np.concatenate([group_index.groups for group_index, groups in epochs.values()]))
+        group_numbers = [int(group_number) for group_number in group_numbers]
+
+    if processes is None:
+        processes = os.cpu_count()
+    if processes == 1:
+        results = [analyse_group(group_number) for group_number in group_numbers]
+    else:
+        with Pool(processes, initializer=load_epochs) as p:
+            results = p.map(analyse_group, group_numbers, chunksize=max(1, len(group_numbers) // (4 * processes)))
+
+    output = []
+    failed = []
+    catalog_tables = []
+    for group_number, tables, error in results:
+        if error is not None:
+            print("group " + str(group_number) + " failed: " + error)
+            failed.append([group_number, error])
+            continue
+        for epoch, rows in tables:
+            output.extend([[group_number, epoch] + row for row in rows])
+            if len(epochs[epoch][1]) > 0:
+                catalog_tables.append((epoch, group_number, rows))
+    write_cloudlets(catalog_tables, catalog_file)
+
+    # rows of relgs.py do not all have the same length, so the table is written line by line
+    with open(output_file, "w") as output_data:
+        output_data.write("# " + ",".join(["group_nr", "epoch"] + HEADER) + "\n")
+        for row in output:
+            output_data.write(", ".join("%s" % value for value in row) + "\n")
+    if len(failed) > 0:
+        np.savetxt(output_file.replace("._sats.csv", "") + "._failed.csv", np.array(failed, dtype=object),
+                   delimiter=", ", fmt='%s', header=",".join(["group_nr", "error"]))
+    print("groups", len(group_numbers), "failed", len(failed), "rows", len(output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='cloudlet statistics of relgs.py for many groups in parallel')
+    parser.add_argument('group_numbers', type=str, nargs='*',
+                        help='group numbers or ranges of group numbers, for example 1 4-7, default all groups')
+    parser.add_argument('--processes', type=int, help='number of worker processes, default cpu count', default=None)
+    parser.add_argument('--output', type=str, help='combined table', default="cloudlet_sub_all._sats.csv")
+    parser.add_argument('--catalog', type=str, help='results catalog of cloudlet statistics', default=CATALOG_FILE)
+    args = parser.parse_args()
+    main(parse_group_numbers(args.group_numbers), args.processes, args.output, args.catalog)
+    sys.exit(0)
@@ -1,13 +1,13 @@
 import sys
 from random import random
 
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import rc
 from matplotlib.ticker import MultipleLocator
 import mplcursors
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_dates
+from parsers.epoch_parser import load_out
 
 
 def get_configs(section, key):
@@ -28,10 +28,9 @@ def main():
     minorLocatory = MultipleLocator(20)
     minorLocatorvel = MultipleLocator(1)
     file = "data_files3/ea063.out"
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
     title = file.split("/")[1].split(".")[0].upper() + "-" + dates[file.split("/")[1].split(".")[0]]
-    channel, velocity, intensity, integral_intensity, ra, dec = np.loadtxt(file, unpack=True)
+    channel, velocity, intensity, integral_intensity, ra, dec = load_out(file, unpack=True)
     velocity = velocity/1000
 
     fig, ax = plt.subplots(nrows=2, ncols=1, figsize=(16, 16))
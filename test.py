@@ -1,11 +1,12 @@
 import sys
 import os
-import math
 import networkx as nx
 import matplotlib.pyplot as plt
 import numpy as np
 
-from parsers.configparser_ import ConfigParser
+from parsers.configparser_ import ConfigParser, get_file_order
+from parsers.epoch_parser import load_out
+from utils.matching import match_epochs, connected_groups
 
 
 def get_configs(section, key):
@@ -19,155 +20,86 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def compute_weight_of_edge(node1, node2, data):
-    ra1 = data[node1]["ra"]
-    ra2 = data[node2]["ra"]
-    dec1 = data[node1]["dec"]
-    dec2 = data[node2]["dec"]
-    return np.sqrt((ra1 - ra2) ** 2 + (dec1 - dec2) ** 2)
-
-
-def compere_velocities(node1, node2, data):
-    vel1 = data[node1]["velocity"]
-    vel2 = data[node2]["velocity"]
-    a1 = vel1 - 20
-    b1 = vel1 + 20
-    a2 = vel2 - 20
-    b2 = vel2 + 20
-
-    if vel1 == vel2:
-        return True
-    else:
-        if math.isclose(vel1, vel2, rel_tol=100):
-            return True
-
-        if a1 <= vel2 <= b1:
-            return True
-
-        if a2 <= vel1 <= b2:
-            return True
-
-    return False
-
-
 def get_data():
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    """
+
+    :return: dict of spot columns ch, velocity, flux1, flux2, ra, dec and epoch (index of file in file order),
+    list of files in file order
+    """
+    file_order = get_file_order()
     data_file_path = get_configs("paths", "dataFiles")
     data_files = os.listdir(data_file_path)
     order = [data_files.index(ind) for ind in file_order]
-    data_file_tmp = []
+    data_files = [data_files[ind] for ind in order]
 
-    for ind in order:
-        data_file_tmp.append(data_files[ind])
-    data_files = data_file_tmp
-    data = []
+    epochs = [load_out(data_file_path + file) for file in data_files]
+    spots = {"ch": np.concatenate([epoch["channel"] for epoch in epochs]),
+             "velocity": np.concatenate([epoch["velocity"] for epoch in epochs]),
+             "flux1": np.concatenate([epoch["intensity"] for epoch in epochs]),
+             "flux2": np.concatenate([epoch["integral"] for epoch in epochs]),
+             "ra": np.concatenate([epoch["ra"] for epoch in epochs]),
+             "dec": np.concatenate([epoch["dec"] for epoch in epochs]),
+             "epoch": np.concatenate([np.full(len(epochs[index]), index) for index in range(0, len(epochs))])}
 
-    for file in data_files:
-        data_tmp = np.loadtxt(data_file_path + file, usecols=(0, 1, 2, 3, 4, 5), unpack=True, dtype=np.float)
-        rows = data_tmp.shape[1]
-        for r in range(rows):
-            row = data_tmp[:, r]
-            data.append({"ch": row[0], "velocity": row[1], "flux1": row[2], "flux2": row[3], "ra": row[4], "dec": row[5], "file": file})
+    return spots, data_files
 
-    return data, len(data_files)
 
+def order_group_by_epoch(group, spots, file_count):
+    """
 
-def print_group(group, graph):
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
-    velocities = [nx.get_node_attributes(graph,'velocity')[g] for g in group]
-    files = [nx.get_node_attributes(graph,'file')[g] for g in group]
-
-    if len(set(files)) == len(file_order):
-        order = [files.index(ind) for ind in file_order]
+    :param group: spot indexes of group
+    :param spots: spot columns
+    :param file_count: number of files
+    :return: indexes of first spot of every epoch in file order or None if group is not in all files
+    """
+    epochs, first = np.unique(spots["epoch"][group], return_index=True)
+    if len(epochs) != file_count:
+        return None
+    return group[first]
 
-        velocities_tmp = []
-        files_tmp = []
 
-        for ind in order:
-            velocities_tmp.append(velocities[ind])
-            files_tmp.append(files[ind])
+def print_group(group, spots, files):
+    ordered = order_group_by_epoch(group, spots, len(files))
+    if ordered is not None:
+        print(spots["velocity"][ordered].tolist(), [files[epoch] for epoch in spots["epoch"][ordered]])
 
-        velocities = velocities_tmp
-        files = files_tmp
 
-        print(velocities, files)
+def create_output(groups, spots, files):
+    header = ['vel']
+    for file in files:
+        header.append("ra" + "_" + file)
+        header.append("dec" + "_" + file)
+        header.append("flux1" + "_" + file)
 
+    full_groups = [ordered for ordered in [order_group_by_epoch(group, spots, len(files)) for group in groups]
+                   if ordered is not None]
+    if len(full_groups) == 0:
+        np.savetxt('output3/output.dat', np.array([]), delimiter=",", header="vel")
+        return
 
-def create_output(groups, graph):
-    index = 0
-    header = ['vel']
-    data = []
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
+    full_groups = np.array(full_groups)
+    data = np.empty((len(full_groups), 1 + 3 * len(files)))
+    data[:, 0] = spots["velocity"][full_groups[:, -1]]
+    data[:, 1::3] = spots["ra"][full_groups]
+    data[:, 2::3] = spots["dec"][full_groups]
+    data[:, 3::3] = spots["flux1"][full_groups]
 
-    for group in groups:
-        files = [nx.get_node_attributes(graph, 'file')[g] for g in group]
-        ras = [nx.get_node_attributes(graph, 'ra')[g] for g in group]
-        decs = [nx.get_node_attributes(graph, 'dec')[g] for g in group]
-        flux1s = [nx.get_node_attributes(graph, 'flux1')[g] for g in group]
-        velocities = [nx.get_node_attributes( graph, 'velocity' )[g] for g in group]
-
-        if len(set(files)) == len(file_order):
-            order = [files.index(ind) for ind in file_order]
-
-            ras_tmp = []
-            dec_tmp = []
-            files_tmp = []
-            flux1s_tmp = []
-            velocities_tmp = []
-
-            for ind in order:
-                files_tmp.append(files[ind])
-                ras_tmp.append(ras[ind])
-                dec_tmp.append(decs[ind])
-                flux1s_tmp.append(flux1s[ind])
-                velocities_tmp.append( velocities[ind] )
-
-            index += 1
-            velocities = velocities_tmp
-            files = files_tmp
-            ras = ras_tmp
-            decs = dec_tmp
-            flux1s = flux1s_tmp
-
-            if index == 1:
-                for file in files:
-                    header.append("ra" + "_" + file)
-                    header.append("dec" + "_" + file)
-                    header.append("flux1" + "_" + file)
-
-            data_tmp = [velocities[-1]]
-            for file_index in range(0, len(files)):
-                data_tmp.extend([ras[file_index], decs[file_index], flux1s[file_index]])
-
-            data.append(data_tmp)
-
-    np.savetxt('output3/output.dat', np.array(data), delimiter=",", header=",".join(header))
+    np.savetxt('output3/output.dat', data, delimiter=",", header=",".join(header))
 
 
 def main():
-    data, file_count, = get_data()
-    graph = nx.Graph()
-    number_of_poins = len(data)
+    spots, files = get_data()
+    file_count = len(files)
+    number_of_poins = len(spots["velocity"])
     nodes = [node for node in range(number_of_poins)]
-    pos = {node: (data[node]["ra"], data[node]["dec"]) for node in nodes}
-    labels = {node: str(data[node]["velocity"]) + "_" + data[node]["file"] for node in nodes}
-    radiuss = [data[node]["flux1"] * 25 for node in nodes]
-
-    for node in nodes:
-        graph.add_node(node, velocity=data[node]["velocity"], label=data[node]["velocity"],
-                       file=data[node]["file"], ra=data[node]["ra"],
-                       dec=data[node]["dec"], flux1=data[node]["flux1"])
-
-    edges = []
-    for i in range(0, len(nodes)):
-        for j in range(0, len(nodes)):
-            if i != j and compute_weight_of_edge(nodes[i], nodes[j], data) < 10.0 and compere_velocities(nodes[i], nodes[j], data) and data[nodes[i]]["file"] != data[nodes[j]]["file"]:
-                edges.append((nodes[i], nodes[j], compute_weight_of_edge(nodes[i], nodes[j], data)))
+    pos = {node: (spots["ra"][node], spots["dec"][node]) for node in nodes}
+    labels = {node: str(spots["velocity"][node]) + "_" + files[spots["epoch"][node]] for node in nodes}
+    radiuss = spots["flux1"] * 25
 
-    graph.add_weighted_edges_from(edges)
+    nodes1, nodes2, weights = match_epochs(spots["ra"], spots["dec"], spots["velocity"], spots["epoch"], radius=10.0)
 
-    groups = list(nx.connected_components(graph))
-    number_of_conected_components = nx.number_connected_components(graph)
+    groups = connected_groups(number_of_poins, nodes1, nodes2)
+    number_of_conected_components = len(groups)
     total_group_count = 0
     group_count_that_have_all_files = 0
     full_groups = []
@@ -177,21 +109,25 @@ def main():
         if len(group) == file_count:
             group_count_that_have_all_files += 1
             full_groups.append(group)
-            print_group(group, graph)
+            print_group(group, spots, files)
 
-    create_output(groups, graph)
+    create_output(groups, spots, files)
 
     print("Total Group count is ", total_group_count)
     print("Group count that have all files is ", group_count_that_have_all_files)
     print("Single maser count ", number_of_conected_components - total_group_count)
 
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_weighted_edges_from(zip(nodes1.tolist(), nodes2.tolist(), weights.tolist()))
+
     fig, ax = plt.subplots()
-    nx.draw(graph, with_labels=False, pos=pos, cmap="jet", node_color=[vel["velocity"] for vel in data], ax=ax, node_size=radiuss)
+    nx.draw(graph, with_labels=False, pos=pos, cmap="jet", node_color=spots["velocity"], ax=ax, node_size=radiuss)
     nx.draw_networkx_labels(graph, pos, labels=labels, font_size=6, ax=ax)
     plt.axis('on')
     ax.tick_params(left=True, bottom=True, labelleft=True, labelbottom=True)
-    vmax = min([vel["velocity"] for vel in data])
-    vmin = max([vel["velocity"] for vel in data])
+    vmax = min(spots["velocity"])
+    vmin = max(spots["velocity"])
     sm = plt.cm.ScalarMappable(cmap="jet", norm=plt.Normalize(vmin=vmin, vmax=vmax))
     ax.grid(True)
     plt.colorbar(sm, shrink=0.5, ax=ax)
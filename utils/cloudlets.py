@@ -0,0 +1,189 @@
+"""
+cloudlet statistics of one group in one epoch, analysis part of relgs.py without plotting
+"""
+import numpy as np
+
+from utils.fitting import multi_start_fit, initial_guesses
+from utils.metrics import timed
+from utils.separation import find_max_separation, pairwise_distances
+
+HEADER = ["sub_group_nr", "ra", "dec", "velocity", "vel_fit", "sigma", "max_intensity", "fit_amp", "vel_fit2",
+          "sigma2", "fit_amp2", "max_distance", "max_distance_au", "gradient", "gradient_au", "position_angle",
+          "position_angle2"]
+
+SPECTRUM_STARTS = [[0.9, -6.45, 0.2], [0.9, -6.45, 0.2, 0.32, -5.43, 0.1], [0.361, -6.98, 0.2, 0.149, -6.489, 0.2],
+                   [2.2, -6.9, 0.2, 23.6, -6.22, 0.2], [1.99, -6.977, 0.05, 0.6, -7.3, 0.05], [0.035, -7.75, 0.001]]
+
+SUB_GROUP_STARTS = [[0.79, -6.7006000000000006, 0.43855130828672717], [8.292, -6.086, 2.8962589178124705]]
+
+
+def firs_exceeds(array, value):
+    index = -1
+    for i in range(0, len(array)):
+        if abs(array[i]) > value:
+            index = i
+            break
+    return index
+
+
+def _split_spectrum(velocity, intensity, ra, dec):
+    split_index = firs_exceeds(np.diff(velocity), 0.5) + 1
+    if split_index == 0:
+        return [velocity], [intensity], [ra], [dec]
+    return [velocity[0:split_index], velocity[split_index:]], [intensity[0:split_index], intensity[split_index:]], \
+        [ra[0:split_index], ra[split_index:]], [dec[0:split_index], dec[split_index:]]
+
+
+@timed("cloudlet_statistics")
+def epoch_statistics(data, groups, reference_ra, reference_dec):
+    """
+    fits and statistics of relgs.py for one group in one epoch
+
+    :param data: rows of group sorted by velocity, ra and dec relative to reference spot
+    :param groups: list of [first index, last index] of sub groups of epoch
+    :param reference_ra: ra of reference spot
+    :param reference_dec: dec of reference spot
+    :return: dict with "rows" of cloudlet_sub table, "latex" table lines, "slope" and "intercept" of linear fit of
+    all spots, "separation" indexes of most separated spots with "m" and "b" of line through them and "sub_groups"
+    list of dicts with "sub_group_nr", "first", "last", "coeff", "slope" and "intercept" of fitted sub groups
+    """
+    from scipy.stats import linregress
+
+    velocity = data["velocity"]
+    intensity = data["intensity"]
+    ra = data["ra"]
+    dec = data["dec"]
+    output = []
+    latex = []
+
+    slope, intercept, r_value, p_value, std_err = linregress(ra, dec)
+    position_angle2 = 90 + np.degrees(np.arctan(slope))
+    max_separation = find_max_separation(ra, dec)
+    m, b = np.polyfit([ra[max_separation["r"]], ra[max_separation["d"]]],
+                      [dec[max_separation["r"]], dec[max_separation["d"]]], 1)
+    position_angle = 90 + np.degrees(np.arctan(m))
+    result = {"slope": slope, "intercept": intercept, "separation": max_separation, "m": m, "b": b,
+              "sub_groups": [], "rows": output, "latex": latex}
+
+    if len(velocity) >= 3:
+        velocity_tmp, intensity_tmp, ra_tmp, dec_tmp = _split_spectrum(velocity, intensity, ra, dec)
+
+        for gauss_nr in range(0, len(velocity_tmp)):
+            max_intensity_index = np.array(intensity_tmp[gauss_nr]).argmax()
+            size = pairwise_distances(ra[0:len(velocity_tmp[gauss_nr])], dec[0:len(velocity_tmp[gauss_nr])])
+            if len(size) > 0:
+                gradient = (velocity[0] - velocity[len(velocity) - 1]) / max(size)
+                gradient_au = (velocity[0] - velocity[len(velocity) - 1]) / (max(size) * 1.64)
+
+            if len(velocity_tmp[gauss_nr]) >= 3:
+                amplitude = max(intensity_tmp[gauss_nr])
+                centre_of_peak = velocity_tmp[gauss_nr][list(intensity_tmp[gauss_nr]).index(amplitude)]
+                second_largest_amplitude_index = (-intensity_tmp[gauss_nr]).argsort()[1]
+                second_largest_amplitude = intensity_tmp[gauss_nr][second_largest_amplitude_index]
+                second_largest_centre_of_peak = velocity_tmp[gauss_nr][second_largest_amplitude_index]
+                standard_deviation = np.std(intensity_tmp[gauss_nr])
+                ps = [[amplitude, centre_of_peak, standard_deviation],
+                      [amplitude, centre_of_peak, standard_deviation, second_largest_amplitude,
+                       second_largest_centre_of_peak, standard_deviation]] + SPECTRUM_STARTS
+
+                starts = ps + initial_guesses(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr])
+                best_fit = multi_start_fit(velocity_tmp[gauss_nr], intensity_tmp[gauss_nr], starts)[0]
+                if best_fit is None:
+                    continue
+                coeff = best_fit.coeff
+
+                if len(coeff) == 6:
+                    latex.append("{\\it %d} & %.3f & %.3f & %.1f & %.2f & %.2f & %.3f & %.3f & %.2f & %.2f & %.3f & "
+                                 "%.1f(%.1f) & %.3f(""%.3f)\\\\" %
+                                 (gauss_nr, ra_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                                  dec_tmp[gauss_nr][max_intensity_index] + reference_dec,
+                                  velocity[max_intensity_index], coeff[1], coeff[2] * 2,
+                                  intensity[max_intensity_index], coeff[0], coeff[4], coeff[5] * 2, coeff[3],
+                                  max(size), max(size) * 1.64, gradient, gradient_au))
+
+                    output.append([-1, ra_tmp[gauss_nr][max_intensity_index], dec_tmp[gauss_nr][max_intensity_index],
+                                   velocity[max_intensity_index], coeff[1], coeff[2] * 2,
+                                   intensity[max_intensity_index], coeff[0], coeff[4], coeff[5] * 2, coeff[3],
+                                   max(size), max(size) * 1.64, gradient, gradient_au, position_angle,
+                                   position_angle2])
+
+                elif len(coeff) == 3:
+                    latex.append("{\\it %d} & %.3f & %.3f & %.1f & %.2f & %.2f & %.3f & %.3f & %.1f(%.1f) & %.3f("
+                                 "%.3f)\\\\" %
+                                 (gauss_nr, ra_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                                  dec_tmp[gauss_nr][max_intensity_index] + reference_dec,
+                                  velocity[max_intensity_index], coeff[1], coeff[2] * 2,
+                                  intensity[max_intensity_index], coeff[0], max(size), max(size) * 1.64,
+                                  gradient, gradient_au))
+
+                    output.append([-1, ra_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                                   dec_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                                   velocity[max_intensity_index], coeff[1], coeff[2] * 2,
+                                   intensity[max_intensity_index], coeff[0], "-", "-", "-", max(size),
+                                   max(size) * 1.64, gradient, gradient_au, position_angle, position_angle2])
+
+            elif len(size) > 0:
+                latex.append("{\\it %d} & %.3f & %.3f & %.1f & %s & %s & %.3f & %s & %.1f(%.1f) & %.3f(%.3f)\\\\" %
+                             (gauss_nr, ra_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                              dec_tmp[gauss_nr][max_intensity_index] + reference_dec,
+                              velocity[max_intensity_index], "-", "-", intensity[max_intensity_index], "-", max(size),
+                              max(size) * 1.64, gradient, gradient_au))
+
+                output.append([-1, ra_tmp[gauss_nr][max_intensity_index], dec_tmp[gauss_nr][max_intensity_index],
+                               velocity[max_intensity_index], "-", "-", intensity[max_intensity_index], "-", "-", "-",
+                               "-", max(size), max(size) * 1.64, gradient, gradient_au, position_angle,
+                               position_angle2])
+
+            else:
+                latex.append("{\\it %d} & %.3f & %.3f & %.1f & %s & %s & %.3f & %s & %s & %s\\\\" %
+                             (gauss_nr, ra_tmp[gauss_nr][max_intensity_index] + reference_ra,
+                              dec_tmp[gauss_nr][max_intensity_index] + reference_dec,
+                              velocity[max_intensity_index], "-", "-", intensity[max_intensity_index], "-", "-", "-"))
+
+                output.append([-1, ra_tmp[gauss_nr][max_intensity_index], dec_tmp[gauss_nr][max_intensity_index],
+                               velocity[max_intensity_index], "-", "-", intensity[max_intensity_index], "-", "-", "-",
+                               "-", "-", "-", "-", position_angle, position_angle2])
+
+    for sub_group_nr in range(0, len(groups)):
+        latex.append("\n\n")
+        index1, index2 = groups[sub_group_nr][0], groups[sub_group_nr][1]
+        x = velocity[index1:index2]
+        y = intensity[index1:index2]
+        if len(x) < 3:
+            continue
+
+        p = SUB_GROUP_STARTS[sub_group_nr]
+        best_fit = multi_start_fit(x, y, [p] + initial_guesses(x, y, max_components=1))[0]
+        if best_fit is None:
+            continue
+        coeff = best_fit.coeff
+
+        ra_tmp = ra[index1:index2]
+        dec_tmp = dec[index1:index2]
+        slope, intercept, r_value, p_value, std_err = linregress(ra_tmp, dec_tmp)
+        result["sub_groups"].append({"sub_group_nr": sub_group_nr, "first": index1, "last": index2, "coeff": coeff, "slope": slope,
+                                     "intercept": intercept})
+
+        max_intensity_index = np.array(y).argmax()
+        size = pairwise_distances(ra_tmp, dec_tmp)
+        max_separation = find_max_separation(ra_tmp, dec_tmp)
+        gradient = (x[0] - x[len(x) - 1]) / max(size)
+        gradient_au = (x[0] - x[len(x) - 1]) / (max(size) * 1.64)
+
+        latex.append("{\\it %d} & %.3f & %.3f & %.1f & %.2f & %.2f & %.3f & %.3f & %s & %s & %s & %.3f("
+                     "%.3f) & %.3f(%.3f) & %.3f & %.3f)\\\\" %
+                     (sub_group_nr, ra_tmp[max_intensity_index] + reference_ra,
+                      dec_tmp[max_intensity_index] + reference_dec, x[max_intensity_index], coeff[1], coeff[2] * 2,
+                      y[max_intensity_index], coeff[0], "-", "-", "-", max(size), max(size) * 1.64, gradient,
+                      gradient_au, position_angle, position_angle2))
+
+        m, b = np.polyfit([ra_tmp[max_separation["r"]], ra_tmp[max_separation["d"]]],
+                          [dec_tmp[max_separation["r"]], dec_tmp[max_separation["d"]]], 1)
+        position_angle = 90 + np.degrees(np.arctan(m))
+        position_angle2 = 90 + np.degrees(np.arctan(slope))
+
+        output.append([sub_group_nr, ra_tmp[max_intensity_index], dec_tmp[max_intensity_index],
+                       x[max_intensity_index], coeff[1], coeff[2] * 2, y[max_intensity_index], coeff[0], "-", "-", "-",
+                       max(size), max(size) * 1.64, gradient, gradient_au, position_angle, position_angle2])
+
+    return result
@@ -0,0 +1,266 @@
+"""
+multi start gaussian fitting of maser spectra
+"""
+import os
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils.gauss import get_model, get_jacobian
+from utils.metrics import timed, record_fit
+
+MAXFEV = 100000
+
+FitResult = namedtuple("FitResult", ["coeff", "var_matrix", "perr", "score", "success", "nfev", "njev",
+                                     "message", "p0"])
+
+_executors = dict()
+
+
+def fit_score(perr):
+    """
+    score used to select best fit, smaller is better
+
+    :param perr: one standard deviation errors of fitted parameters
+    :return: mean error divided by number of parameters
+    """
+    perr = perr[np.isfinite(perr)]
+    if len(perr) == 0:
+        return np.inf
+    return np.mean(perr) / len(perr)
+
+
+@timed("fit")
+def fit(x, y, p0, method="lm", maxfev=MAXFEV, analytic_jacobian=True):
+    """
+    fit sum of len(p0) / 3 gaussian to spectrum
+
+    :param x: velocity
+    :param y: intensity
+    :param p0: initial guess
+    :param method: least squares method for curve_fit
+    :param maxfev: maximum number of function evaluations
+    :param analytic_jacobian: use closed form jacobian of model instead of finite differences
+    :return: FitResult, success is False and message holds reason if fit failed, score is inf if covariance
+    could not be estimated
+    """
+    from scipy.optimize import curve_fit, OptimizeWarning
+
+    p0 = list(p0)
+    try:
+        model = get_model(len(p0))
+        jacobian = get_jacobian(len(p0)) if analytic_jacobian else None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", OptimizeWarning)
+            coeff, var_matrix, info, message, ier = curve_fit(model, x, y, p0=p0, method=method, maxfev=maxfev,
+                                                              jac=jacobian, full_output=True)
+    except (RuntimeError, ValueError, TypeError, np.linalg.LinAlgError) as error:
+        result = FitResult(None, None, None, np.inf, False, 0, 0, str(error), p0)
+        record_fit(result)
+        return result
+
+    perr = np.sqrt(np.diag(var_matrix))
+    score = fit_score(perr)
+    if not np.isfinite(score):
+        message = "Covariance of the parameters could not be estimated"
+
+    result = FitResult(coeff, var_matrix, perr, score, True, info.get("nfev", 0), info.get("njev", 0), message, p0)
+    record_fit(result)
+    return result
+
+
+def initial_guesses(x, y, max_components=2):
+    """
+    initial guesses from peaks of spectrum
+
+    :param x: velocity
+    :param y: intensity
+    :param max_components: maximum number of gaussian in guess
+    :return: list of initial guesses with 1 to max_components components
+    """
+    from scipy.signal import find_peaks, peak_widths
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < 3:
+        return []
+
+    order = np.argsort(x)
+    x = x[order]
+    y = y[order]
+    channel_width = np.median(np.abs(np.diff(x)))
+    default_width = max((x[-1] - x[0]) / 4, channel_width)
+
+    # pad so that peaks at the edges of spectrum are found too
+    padded = np.concatenate(([-np.inf], y, [-np.inf]))
+    peaks = find_peaks(padded)[0] - 1
+    peaks = peaks[np.argsort(-y[peaks])]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        widths = peak_widths(y, peaks, rel_height=0.5)[0] * channel_width / 2
+
+    components = []
+    for peak, width in zip(peaks, widths):
+        if not np.isfinite(width) or width <= 0:
+            width = default_width
+        components.append([float(y[peak]), float(x[peak]), float(width)])
+
+    guesses = []
+    for number_of_components in range(1, min(max_components, len(components)) + 1):
+        guesses.append([p for component in components[0:number_of_components] for p in component])
+
+    if len(guesses) == 0 or guesses[0][2] != default_width:
+        guesses.append([float(np.max(y)), float(x[np.argmax(y)]), float(default_width)])
+
+    return guesses
+
+
+def get_executor(processes=None):
+    """
+
+    :param processes: number of worker processes, None for cpu count
+    :return: process pool shared by all fits in this process
+    """
+    if processes is None:
+        processes = os.cpu_count()
+    if processes not in _executors:
+        _executors[processes] = ProcessPoolExecutor(max_workers=processes)
+    return _executors[processes]
+
+
+def multi_start_fit(x, y, starts, processes=1, tolerance=None, method="lm", maxfev=MAXFEV, analytic_jacobian=True):
+    """
+    fit spectrum from every initial guess and select fit with smallest fit_score
+
+    :param x: velocity
+    :param y: intensity
+    :param starts: list of initial guesses, length of each guess selects number of gaussian
+    :param processes: number of worker processes, 1 fits in this process, None uses all cpus
+    :param tolerance: stop as soon as a fit with score <= tolerance is found
+    :param method: least squares method for curve_fit
+    :param maxfev: maximum number of function evaluations
+    :param analytic_jacobian: use closed form jacobian of model instead of finite differences
+    :return: best FitResult or None if all fits failed, list of FitResult for all fits that were run
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    results = []
+
+    if processes == 1 or len(starts) <= 1:
+        for p0 in starts:
+            result = fit(x, y, p0, method=method, maxfev=maxfev, analytic_jacobian=analytic_jacobian)
+            results.append(result)
+            if tolerance is not None and result.success and result.score <= tolerance:
+                break
+    else:
+        executor = get_executor(processes)
+        futures = {executor.submit(fit, x, y, p0, method, maxfev, analytic_jacobian): index
+                   for index, p0 in enumerate(starts)}
+        indexed_results = []
+        for future in as_completed(futures):
+            result = future.result()
+            indexed_results.append((futures[future], result))
+            if tolerance is not None and result.success and result.score <= tolerance:
+                for pending in futures:
+                    pending.cancel()
+                break
+        results = [result for index, result in sorted(indexed_results, key=lambda item: item[0])]
+
+    successful = [result for result in results if result.success]
+    if len(successful) == 0:
+        return None, results
+    return min(successful, key=lambda result: result.score), results
+
+
+FIT_TABLE_DTYPE = np.dtype([("epoch", "U32"), ("group_nr", int), ("channels", int), ("amplitude", float),
+                            ("centre", float), ("fwhm", float), ("amplitude_err", float), ("centre_err", float),
+                            ("fwhm_err", float), ("score", float), ("nfev", int), ("success", bool)])
+
+
+def _fit_group_spectrum(velocity, intensity, min_channels):
+    """
+    single gaussian fit of one group, initial guess same as gauss_g78.py plus peak guesses
+
+    :return: row values of FIT_TABLE_DTYPE after epoch and group_nr
+    """
+    nan = float("nan")
+    if len(velocity) < min_channels:
+        return len(velocity), nan, nan, nan, nan, nan, nan, nan, 0, False
+
+    p0 = [max(intensity), min(velocity) + 0.5 * (max(velocity) - min(velocity)), 0.2]
+    best_fit, results = multi_start_fit(velocity, intensity, [p0] + initial_guesses(velocity, intensity,
+                                                                                     max_components=1))
+    nfev = sum(result.nfev for result in results)
+    if best_fit is None:
+        return len(velocity), nan, nan, nan, nan, nan, nan, nan, nfev, False
+
+    a, b, c = best_fit.coeff
+    a_err, b_err, c_err = best_fit.perr
+    return len(velocity), a, b, 2 * abs(c), a_err, b_err, 2 * c_err, best_fit.score, nfev, True
+
+
+def _fit_group_chunk(chunk, min_channels):
+    """
+
+    :param chunk: list of (epoch, group_nr, velocity, intensity)
+    :return: list of FIT_TABLE_DTYPE rows
+    """
+    return [(epoch, group_nr) + _fit_group_spectrum(velocity, intensity, min_channels)
+            for epoch, group_nr, velocity, intensity in chunk]
+
+
+def _split_groups(epoch, group_nr, velocity, intensity):
+    """
+
+    :return: list of (epoch, group_nr, velocity, intensity) for each group sorted by group_nr
+    """
+    group_nr = np.asarray(group_nr)
+    velocity = np.asarray(velocity, dtype=float)
+    intensity = np.asarray(intensity, dtype=float)
+    order = np.argsort(group_nr, kind="stable")
+    groups, offsets = np.unique(group_nr[order], return_index=True)
+    offsets = np.append(offsets, len(order))
+    return [(epoch, int(groups[g]), velocity[order[offsets[g]:offsets[g + 1]]],
+             intensity[order[offsets[g]:offsets[g + 1]]]) for g in range(0, len(groups))]
+
+
+@timed("fit_epochs")
+def fit_epochs(epochs, min_channels=3, processes=1, chunk_size=64):
+    """
+    fit single gaussian to every group of every epoch
+
+    :param epochs: dict epoch: (group_nr, velocity, intensity) arrays of all spots in epoch
+    :param min_channels: groups with less channels are not fitted
+    :param processes: number of worker processes, 1 fits in this process, None uses all cpus
+    :param chunk_size: number of groups sent to worker in one task
+    :return: structured array of FIT_TABLE_DTYPE with one row per (epoch, group), fwhm is 2 * half width
+    """
+    spectra = []
+    for epoch, (group_nr, velocity, intensity) in epochs.items():
+        spectra.extend(_split_groups(epoch, group_nr, velocity, intensity))
+
+    chunks = [spectra[start:start + chunk_size] for start in range(0, len(spectra), chunk_size)]
+    if processes == 1 or len(chunks) <= 1:
+        rows = [row for chunk in chunks for row in _fit_group_chunk(chunk, min_channels)]
+    else:
+        executor = get_executor(processes)
+        rows = [row for chunk_rows in executor.map(_fit_group_chunk, chunks, [min_channels] * len(chunks))
+                for row in chunk_rows]
+
+    return np.array(rows, dtype=FIT_TABLE_DTYPE)
+
+
+def fit_groups(group_nr, velocity, intensity, epoch="", min_channels=3, processes=1, chunk_size=64):
+    """
+    fit single gaussian to every group of one epoch
+
+    :param group_nr: group number of every spot
+    :param velocity: velocity of every spot
+    :param intensity: intensity of every spot
+    :param epoch: epoch name written to table
+    :return: structured array of FIT_TABLE_DTYPE with one row per group
+    """
+    return fit_epochs({epoch: (group_nr, velocity, intensity)}, min_channels=min_channels, processes=processes,
+                      chunk_size=chunk_size)
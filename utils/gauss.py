@@ -0,0 +1,89 @@
+"""
+gaussian models for maser spectra, c is half width at half maximum
+"""
+import numpy as np
+
+LN2 = np.log(2)
+
+
+def gauss(x, *p):
+    a, b, c = p
+    return a * np.exp(-(x - b) ** 2 * LN2 / (c ** 2))
+
+
+def gauss2(x, *p):
+    a1, b1, c1, a2, b2, c2 = p
+    return a1 * np.exp(-(x - b1) ** 2 * LN2 / c1 ** 2) + a2 * np.exp(-(x - b2) ** 2 * LN2 / c2 ** 2)
+
+
+def gauss3(x, *p):
+    a1, b1, c1, a2, b2, c2, a3, b3, c3 = p
+    return a1 * np.exp(-(x - b1) ** 2 * LN2 / c1 ** 2) + a2 * np.exp(-(x - b2) ** 2 * LN2 / c2 ** 2) + \
+        a3 * np.exp(-(x - b3) ** 2 * LN2 / c3 ** 2)
+
+
+def gauss_n(x, *p):
+    """
+
+    :param x: velocity
+    :param p: amplitude, centre, half width for each component
+    :return: sum of len(p) / 3 gaussian
+    """
+    p = np.asarray(p, dtype=float).reshape(-1, 3)
+    x = np.asarray(x, dtype=float)
+    return np.sum(p[:, 0, None] * np.exp(-(x[None, :] - p[:, 1, None]) ** 2 * LN2 / p[:, 2, None] ** 2), axis=0)
+
+
+def gauss_n_jacobian(x, *p):
+    """
+
+    :param x: velocity
+    :param p: amplitude, centre, half width for each component
+    :return: len(x) x len(p) matrix of partial derivatives of gauss_n
+    """
+    p = np.asarray(p, dtype=float).reshape(-1, 3)
+    x = np.asarray(x, dtype=float)
+    a = p[:, 0, None]
+    delta = x[None, :] - p[:, 1, None]
+    c = p[:, 2, None]
+    exponent = np.exp(-delta ** 2 * LN2 / c ** 2)
+    jacobian = np.empty((len(p), 3, len(x)))
+    jacobian[:, 0, :] = exponent
+    jacobian[:, 1, :] = a * exponent * 2 * LN2 * delta / c ** 2
+    jacobian[:, 2, :] = a * exponent * 2 * LN2 * delta ** 2 / c ** 3
+    return jacobian.reshape(-1, len(x)).T
+
+
+def gauss_jacobian(x, *p):
+    a, b, c = p
+    x = np.asarray(x, dtype=float)
+    exponent = np.exp(-(x - b) ** 2 * LN2 / (c ** 2))
+    return np.column_stack((exponent, a * exponent * 2 * LN2 * (x - b) / c ** 2,
+                            a * exponent * 2 * LN2 * (x - b) ** 2 / c ** 3))
+
+
+MODELS = {3: gauss, 6: gauss2, 9: gauss3}
+
+JACOBIANS = {3: gauss_jacobian}
+
+
+def get_model(number_of_parameters):
+    """
+
+    :param number_of_parameters: length of parameter vector
+    :return: model function for that many parameters
+    """
+    if number_of_parameters % 3 != 0:
+        raise ValueError("Number of parameters must be multiple of 3, got " + str(number_of_parameters))
+    return MODELS.get(number_of_parameters, gauss_n)
+
+
+def get_jacobian(number_of_parameters):
+    """
+
+    :param number_of_parameters: length of parameter vector
+    :return: analytic jacobian of model for that many parameters
+    """
+    if number_of_parameters % 3 != 0:
+        raise ValueError("Number of parameters must be multiple of 3, got " + str(number_of_parameters))
+    return JACOBIANS.get(number_of_parameters, gauss_n_jacobian)
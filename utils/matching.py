@@ -0,0 +1,247 @@
+"""
+cross epoch matching of maser spots
+"""
+import numpy as np
+
+from utils.metrics import timed
+
+
+class UnionFind:
+    """
+    disjoint set forest stored in arrays
+    """
+
+    def __init__(self, size):
+        self._parent = np.arange(size)
+        self._size = np.ones(size, dtype=int)
+
+    @classmethod
+    def from_arrays(cls, parent, size):
+        """
+
+        :param parent: parent array of saved forest
+        :param size: set size array of saved forest
+        :return: UnionFind continuing saved forest
+        """
+        union_find = cls(0)
+        union_find._parent = np.asarray(parent, dtype=int).copy()
+        union_find._size = np.asarray(size, dtype=int).copy()
+        return union_find
+
+    def arrays(self):
+        """
+
+        :return: parent array and set size array, see from_arrays
+        """
+        return self._parent.copy(), self._size.copy()
+
+    def add(self, count):
+        """
+        add count nodes in their own sets
+
+        :param count: number of new nodes
+        :return: index of first new node
+        """
+        first = len(self._parent)
+        self._parent = np.concatenate((self._parent, np.arange(first, first + count)))
+        self._size = np.concatenate((self._size, np.ones(count, dtype=int)))
+        return first
+
+    def find(self, node):
+        """
+
+        :param node: node index
+        :return: root of node set
+        """
+        root = node
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[node] != root:
+            self._parent[node], node = root, self._parent[node]
+        return root
+
+    def union(self, node1, node2):
+        """
+        merge sets of node1 and node2, smaller set is attached to larger one
+        """
+        root1 = self.find(node1)
+        root2 = self.find(node2)
+        if root1 == root2:
+            return
+        if self._size[root1] < self._size[root2]:
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        self._size[root1] += self._size[root2]
+
+    def union_edges(self, nodes1, nodes2):
+        """
+        merge sets of all edges nodes1[i], nodes2[i]
+        """
+        for node1, node2 in zip(nodes1.tolist(), nodes2.tolist()):
+            self.union(node1, node2)
+
+    def labels(self):
+        """
+
+        :return: root of every node
+        """
+        parent = self._parent
+        while np.any(parent[parent] != parent):
+            parent = parent[parent]
+        self._parent = parent
+        return parent.copy()
+
+
+def velocities_match(velocity1, velocity2, velocity_window=20.0, rel_tol=100.0):
+    """
+    vectorized test.py compere_velocities
+
+    :param velocity1: velocities of first spots
+    :param velocity2: velocities of second spots
+    :param velocity_window: maximal absolute velocity difference
+    :param rel_tol: relative tolerance as in math.isclose
+    :return: boolean array
+    """
+    difference = np.abs(velocity1 - velocity2)
+    return (difference <= velocity_window) | \
+           (difference <= rel_tol * np.maximum(np.abs(velocity1), np.abs(velocity2)))
+
+
+@timed("match")
+def match_epochs(ra, dec, velocity, epoch, radius=10.0, velocity_window=20.0, rel_tol=100.0):
+    """
+    find pairs of spots from different epochs closer than radius with matching velocity
+
+    :param ra: ra of spots
+    :param dec: dec of spots
+    :param velocity: velocity of spots
+    :param epoch: epoch id of spots
+    :param radius: distance is strictly less than radius, same units as ra, dec
+    :param velocity_window: see velocities_match
+    :param rel_tol: see velocities_match
+    :return: arrays of first spot indexes, second spot indexes and distances, first index is always from
+    earlier epoch id
+    """
+    from scipy.spatial import cKDTree
+
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    epoch = np.asarray(epoch)
+
+    epochs = np.unique(epoch)
+    indexes = [np.flatnonzero(epoch == e) for e in epochs]
+    trees = [cKDTree(np.column_stack((ra[index], dec[index]))) for index in indexes]
+
+    nodes1 = [np.empty(0, dtype=int)]
+    nodes2 = [np.empty(0, dtype=int)]
+    distances = [np.empty(0, dtype=float)]
+    for e1 in range(0, len(epochs)):
+        for e2 in range(e1 + 1, len(epochs)):
+            pairs = trees[e1].sparse_distance_matrix(trees[e2], radius, output_type="ndarray")
+            pairs = pairs[pairs["v"] < radius]
+            node1 = indexes[e1][pairs["i"]]
+            node2 = indexes[e2][pairs["j"]]
+            matched = velocities_match(velocity[node1], velocity[node2], velocity_window, rel_tol)
+            nodes1.append(node1[matched])
+            nodes2.append(node2[matched])
+            distances.append(pairs["v"][matched])
+
+    return np.concatenate(nodes1), np.concatenate(nodes2), np.concatenate(distances)
+
+
+@timed("match_groups")
+def connected_groups(size, nodes1, nodes2):
+    """
+
+    :param size: number of nodes
+    :param nodes1: first nodes of edges
+    :param nodes2: second nodes of edges
+    :return: list of sorted node index arrays of connected components, ordered by smallest node
+    """
+    union_find = UnionFind(size)
+    union_find.union_edges(nodes1, nodes2)
+    labels = union_find.labels()
+
+    order = np.argsort(labels, kind="stable")
+    roots, offsets = np.unique(labels[order], return_index=True)
+    offsets = np.append(offsets, size)
+    groups = [order[offsets[g]:offsets[g + 1]] for g in range(0, len(roots))]
+    groups.sort(key=lambda group: group[0])
+    return groups
+
+
+@timed("leader_groups")
+def leader_groups(velocity, ra, dec, channel, velocity_tolerance, distance_tolerance, tree=None, neighbours=None):
+    """
+    every spot in turn takes all not yet grouped spots within velocity_tolerance and distance_tolerance of it,
+    at most one spot per channel, same as gauss_g78_test.py create_groups
+
+    :param velocity: velocity of spots
+    :param ra: ra of spots
+    :param dec: dec of spots
+    :param channel: channel of spots
+    :param velocity_tolerance: maximal absolute velocity difference to seed spot
+    :param distance_tolerance: maximal distance to seed spot
+    :param tree: cKDTree of (ra, dec), reused between calls with different tolerances
+    :param neighbours: sorted neighbour lists of all spots within distance_tolerance, reused between calls with
+    different velocity tolerances
+    :return: group label of every spot, labels are numbered in order of seed spots
+    """
+    from scipy.spatial import cKDTree
+
+    velocity = np.asarray(velocity, dtype=float)
+    channel = np.asarray(channel)
+    if neighbours is None:
+        if tree is None:
+            tree = cKDTree(np.column_stack((ra, dec)))
+        neighbours = tree.query_ball_point(tree.data, distance_tolerance, return_sorted=True)
+
+    labels = np.full(len(velocity), -1)
+    group = 0
+    for seed in range(0, len(velocity)):
+        members = np.asarray(neighbours[seed], dtype=int)
+        members = members[(labels[members] == -1) & (np.abs(velocity[members] - velocity[seed]) <= velocity_tolerance)]
+        if len(members) == 0:
+            continue
+        members = members[np.sort(np.unique(channel[members], return_index=True)[1])]
+        labels[members] = group
+        group += 1
+    return labels
+
+
+def leader_group_counts(velocity, ra, dec, channel, velocity_tolerances, distance_tolerances):
+    """
+
+    :param velocity_tolerances: velocity tolerances of grid
+    :param distance_tolerances: distance tolerances of grid
+    :return: array of group counts with shape (len(velocity_tolerances), len(distance_tolerances))
+    """
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(np.column_stack((ra, dec)))
+    counts = np.zeros((len(velocity_tolerances), len(distance_tolerances)), dtype=int)
+    for d in range(0, len(distance_tolerances)):
+        # neighbour lists depend only on distance tolerance, so they are queried once for all velocity tolerances
+        neighbours = tree.query_ball_point(tree.data, distance_tolerances[d], return_sorted=True)
+        for v in range(0, len(velocity_tolerances)):
+            labels = leader_groups(velocity, ra, dec, channel, velocity_tolerances[v], distance_tolerances[d],
+                                   neighbours=neighbours)
+            counts[v, d] = labels.max() + 1 if len(labels) > 0 else 0
+    return counts
+
+
+def close_runs(ra, dec, tolerance=1.27):
+    """
+    runs of consecutive spots where every neighbouring pair differs at most by tolerance in ra and dec
+
+    :param ra: ra of spots in output order
+    :param dec: dec of spots in output order
+    :param tolerance: maximal absolute difference of ra and dec of neighbours
+    :return: first and last spot index of every run with at least two spots
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    close = (np.abs(np.diff(ra)) <= tolerance) & (np.abs(np.diff(dec)) <= tolerance)
+    edges = np.diff(np.concatenate(([False], close, [False])).astype(int))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
@@ -0,0 +1,215 @@
+"""
+run metrics of loading, matching, fitting and rendering stages: wall time, call counts, function evaluations of
+fits, fit failures by reason and peak memory, written as JSON or CSV run report
+"""
+import os
+import re
+import sys
+import csv
+import json
+import time
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+_stages = dict()
+_counters = dict()
+_fits = {"count": 0, "nfev": 0, "nfev_max": 0, "njev": 0, "failed": 0}
+_fit_failures = dict()
+_active = []
+_NUMBER = re.compile(r"\d+(\.\d+)?")
+_start_time = time.perf_counter()
+
+
+def _max_rss():
+    """
+
+    :return: peak resident set size of process in bytes, 0 if it is not known on this platform
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def reset():
+    """
+    forget all recorded metrics
+
+    :return: None
+    """
+    global _start_time
+    _stages.clear()
+    _counters.clear()
+    _fit_failures.clear()
+    _fits.update({"count": 0, "nfev": 0, "nfev_max": 0, "njev": 0, "failed": 0})
+    _start_time = time.perf_counter()
+
+
+@contextmanager
+def stage(name):
+    """
+    record wall time, call count and peak memory of block, peak memory is traced python memory of block when
+    tracemalloc is tracing, otherwise peak resident set size of process at end of block, peak increase is peak
+    memory less memory at start of block
+
+    :param name: stage name, metrics of stages with same name are summed
+    """
+    tracing = tracemalloc.is_tracing()
+    start_memory = tracemalloc.get_traced_memory()[0] if tracing else _max_rss()
+    if tracing:
+        peak = tracemalloc.get_traced_memory()[1]
+        if len(_active) > 0:
+            _active[-1][0] = max(_active[-1][0], peak)
+        tracemalloc.reset_peak()
+    entry = [0]
+    _active.append(entry)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_time = time.perf_counter() - start
+        _active.pop()
+        if tracing and tracemalloc.is_tracing():
+            peak = max(entry[0], tracemalloc.get_traced_memory()[1])
+            if len(_active) > 0:
+                _active[-1][0] = max(_active[-1][0], peak)
+        else:
+            peak = _max_rss()
+        metrics = _stages.setdefault(name, {"calls": 0, "wall_time": 0.0, "peak_memory": 0, "peak_increase": 0})
+        metrics["calls"] += 1
+        metrics["wall_time"] += wall_time
+        metrics["peak_memory"] = max(metrics["peak_memory"], peak)
+        metrics["peak_increase"] = max(metrics["peak_increase"], peak - start_memory)
+
+
+def timed(name):
+    """
+    decorator recording every call of function as stage
+
+    :param name: stage name
+    :return: decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+
+    :param name: counter name
+    :param value: increment
+    :return: None
+    """
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def record_fit(result):
+    """
+    count fit, its function evaluations and reason of failure, fits without covariance are failures too
+
+    :param result: utils.fitting.FitResult
+    :return: None
+    """
+    _fits["count"] += 1
+    _fits["nfev"] += result.nfev
+    _fits["nfev_max"] = max(_fits["nfev_max"], result.nfev)
+    _fits["njev"] += result.njev
+    if not result.success or result.score == float("inf"):
+        _fits["failed"] += 1
+        # numbers of the data are dropped so that failures of same kind are counted together
+        reason = _NUMBER.sub("N", str(result.message).split("\n")[0])
+        _fit_failures[reason] = _fit_failures.get(reason, 0) + 1
+
+
+def report():
+    """
+
+    :return: dict with "wall_time" and "peak_memory" of run, "stages" dict name: calls, wall_time, peak_memory,
+    peak_increase, "counters" and "fits" with count, nfev, nfev_mean, nfev_max, njev, failed and "failures" by reason
+    """
+    fits = dict(_fits)
+    fits["nfev_mean"] = fits["nfev"] / fits["count"] if fits["count"] > 0 else 0.0
+    fits["failures"] = dict(sorted(_fit_failures.items(), key=lambda item: -item[1]))
+    peak_memory = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else _max_rss()
+    return {"wall_time": time.perf_counter() - _start_time, "peak_memory": peak_memory,
+            "memory_source": "tracemalloc" if tracemalloc.is_tracing() else "max_rss",
+            "stages": {name: dict(metrics) for name, metrics in sorted(_stages.items())},
+            "counters": dict(sorted(_counters.items())), "fits": fits}
+
+
+def write_report(file):
+    """
+    write report as CSV if file name ends with .csv, else as JSON
+
+    :param file: report file
+    :return: report dict
+    """
+    run_report = report()
+    directory = os.path.dirname(file)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    if not file.endswith(".csv"):
+        with open(file, "w") as report_file:
+            json.dump(run_report, report_file, indent=1)
+        return run_report
+
+    with open(file, "w", newline="") as report_file:
+        writer = csv.writer(report_file)
+        writer.writerow(["kind", "name", "calls", "wall_time", "peak_memory", "peak_increase", "value"])
+        writer.writerow(["run", "total", 1, run_report["wall_time"], run_report["peak_memory"], "", ""])
+        for name, metrics in run_report["stages"].items():
+            writer.writerow(["stage", name, metrics["calls"], metrics["wall_time"], metrics["peak_memory"],
+                             metrics["peak_increase"], ""])
+        for name, value in run_report["counters"].items():
+            writer.writerow(["counter", name, "", "", "", "", value])
+        for name in ["count", "nfev", "nfev_mean", "nfev_max", "njev", "failed"]:
+            writer.writerow(["fit", name, "", "", "", "", run_report["fits"][name]])
+        for reason, value in run_report["fits"]["failures"].items():
+            writer.writerow(["fit_failure", reason, "", "", "", "", value])
+    return run_report
+
+
+def instrument(function, report_file=None, profile_file=None, trace_memory=False, profile_lines=25):
+    """
+    wrap function, usually main() of a script, in optional cProfile and tracemalloc and write run report when it
+    returns or exits
+
+    :param function: function to wrap
+    :param report_file: JSON or CSV run report, None for no report
+    :param profile_file: cProfile statistics file, None for no profiling
+    :param trace_memory: trace python allocations with tracemalloc, peak memory of stages is then per stage
+    :param profile_lines: number of functions with largest cumulative time printed after profiling
+    :return: wrapped function
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profiler = None
+        if profile_file is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+        if trace_memory:
+            tracemalloc.start()
+        reset()
+        try:
+            if profiler is not None:
+                return profiler.runcall(function, *args, **kwargs)
+            return function(*args, **kwargs)
+        finally:
+            if report_file is not None:
+                write_report(report_file)
+            if trace_memory:
+                tracemalloc.stop()
+            if profiler is not None:
+                import pstats
+                profiler.dump_stats(profile_file)
+                pstats.Stats(profiler).sort_stats("cumulative").print_stats(profile_lines)
+    return wrapper
@@ -0,0 +1,218 @@
+"""
+dependency tracking runner of analysis scripts, a stage runs again only when content of its inputs changed
+"""
+import os
+import sys
+import glob
+import json
+import fnmatch
+import hashlib
+import subprocess
+import configparser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from parsers.configparser_ import ConfigParser, CONFIG_FILE_PATH
+from parsers.epoch_parser import CACHE_DIR, file_checksum
+
+STATE_FILE = os.path.join(CACHE_DIR, "pipeline.json")
+LOG_DIR = os.path.join(CACHE_DIR, "pipeline")
+
+
+class Stage:
+    """
+    one script of analysis chain with declared input files, output files and configuration values
+    """
+
+    def __init__(self, name, script, arguments=(), inputs=(), outputs=(), config_keys=()):
+        """
+
+        :param name: stage name
+        :param script: path of python script
+        :param arguments: command line arguments of script
+        :param inputs: input file paths or glob patterns relative to working directory
+        :param outputs: output file paths relative to working directory
+        :param config_keys: list of (section, key) of config.cfg values read by script, key None for whole section
+        """
+        self.name = name
+        self.script = script
+        self.arguments = list(arguments)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config_keys = list(config_keys)
+
+    def command(self):
+        """
+
+        :return: command line of stage
+        """
+        return [sys.executable, self.script] + self.arguments
+
+    def input_files(self):
+        """
+
+        :return: sorted existing input files, paths without glob characters are kept also when missing
+        """
+        files = set()
+        for pattern in self.inputs:
+            if glob.has_magic(pattern):
+                files.update(file for file in glob.glob(pattern) if os.path.isfile(file))
+            else:
+                files.add(pattern)
+        return sorted(files)
+
+    def digest(self):
+        """
+        hash of everything that decides output of stage
+
+        :return: sha1 hex digest of script content, arguments, configuration values and input file contents
+        """
+        sha1 = hashlib.sha1()
+        sha1.update(file_checksum(self.script).encode())
+        sha1.update(json.dumps(self.arguments).encode())
+        config = ConfigParser(CONFIG_FILE_PATH)
+        for section, key in self.config_keys:
+            if key is None:
+                value = sorted(config.get_items(section).items())
+            else:
+                value = config.get_config(section, key)
+            sha1.update(json.dumps([section, key, value]).encode())
+        for file in self.input_files():
+            checksum = file_checksum(file) if os.path.isfile(file) else "missing"
+            sha1.update((file + ":" + checksum).encode())
+        return sha1.hexdigest()
+
+
+def stage_dependencies(stages):
+    """
+
+    :param stages: list of stages
+    :return: dict stage name: set of names of stages producing its inputs
+    """
+    producers = dict()
+    for stage in stages:
+        for output in stage.outputs:
+            producers[os.path.normpath(output)] = stage.name
+
+    dependencies = dict()
+    for stage in stages:
+        dependencies[stage.name] = set()
+        for pattern in stage.inputs:
+            for output, producer in producers.items():
+                if producer != stage.name and (os.path.normpath(pattern) == output or
+                                               (glob.has_magic(pattern) and fnmatch.fnmatch(output, pattern))):
+                    dependencies[stage.name].add(producer)
+    return dependencies
+
+
+def _check_acyclic(dependencies):
+    visited = set()
+    for name in dependencies:
+        path = [name]
+        stack = [iter(dependencies[name])]
+        while len(stack) > 0:
+            dependency = next(stack[-1], None)
+            if dependency is None:
+                visited.add(path.pop())
+                stack.pop()
+            elif dependency in path:
+                raise ValueError("pipeline has dependency cycle " + " -> ".join(path + [dependency]))
+            elif dependency not in visited:
+                path.append(dependency)
+                stack.append(iter(dependencies[dependency]))
+
+
+def _load_state(state_file):
+    if not os.path.isfile(state_file):
+        return dict()
+    with open(state_file) as state_data:
+        return json.load(state_data)
+
+
+def _save_state(state, state_file):
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    with open(state_file + ".tmp", "w") as state_data:
+        json.dump(state, state_data, indent=1, sort_keys=True)
+    os.replace(state_file + ".tmp", state_file)
+
+
+def _run_stage(stage, log_dir, environment):
+    """
+
+    :param stage: stage
+    :param log_dir: directory of stage logs
+    :param environment: environment variables of script
+    :return: exit code of script
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, stage.name + ".log"), "w") as log:
+        return subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT, env=environment).returncode
+
+
+def run_pipeline(stages, processes=None, force=False, dry_run=False, state_file=STATE_FILE, log_dir=LOG_DIR):
+    """
+    run stages whose digest differs from last successful run, independent stages run concurrently, stage starts
+    after stages producing its inputs are finished, so unchanged outputs of a rerun stage do not rerun later stages
+
+    :param stages: list of stages
+    :param processes: number of concurrently running stages, default cpu count
+    :param force: run all stages
+    :param dry_run: only report stages that would run
+    :param state_file: json file of digests of last successful runs
+    :param log_dir: directory of stage output logs
+    :return: dict stage name: "up to date", "ran", "would run", "failed" or "skipped"
+    """
+    if processes is None:
+        processes = os.cpu_count()
+    dependencies = stage_dependencies(stages)
+    _check_acyclic(dependencies)
+    state = _load_state(state_file)
+    environment = dict(os.environ, MPLBACKEND="Agg")
+
+    status = dict()
+    digests = dict()
+    running = dict()
+    with ThreadPoolExecutor(max(1, processes)) as executor:
+        while len(status) + len(running) < len(stages) or len(running) > 0:
+            started = False
+            for stage in stages:
+                if stage.name in status or stage.name in running.values():
+                    continue
+                if any(dependency not in status for dependency in dependencies[stage.name]):
+                    continue
+                started = True
+                if any(status[dependency] in ("failed", "skipped") for dependency in dependencies[stage.name]):
+                    status[stage.name] = "skipped"
+                    continue
+
+                # a stage whose configuration values or script cannot be read fails alone, its dependants are skipped
+                try:
+                    digest = stage.digest()
+                except (configparser.Error, OSError) as error:
+                    status[stage.name] = "failed"
+                    print(stage.name, "failed:", type(error).__name__ + ":", error)
+                    continue
+                changed_upstream = any(status[dependency] == "would run" for dependency in dependencies[stage.name])
+                outputs_exist = all(os.path.exists(output) for output in stage.outputs)
+                if not force and not changed_upstream and outputs_exist and state.get(stage.name) == digest:
+                    status[stage.name] = "up to date"
+                elif dry_run:
+                    status[stage.name] = "would run"
+                else:
+                    print("running", stage.name, " ".join(stage.command()))
+                    running[executor.submit(_run_stage, stage, log_dir, environment)] = stage.name
+                    state.pop(stage.name, None)
+                    digests[stage.name] = digest
+
+            if started or len(running) == 0:
+                continue
+            finished, not_finished = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.result() == 0:
+                    status[name] = "ran"
+                    state[name] = digests[name]
+                else:
+                    status[name] = "failed"
+                    print(name, "failed, see", os.path.join(log_dir, name + ".log"))
+                _save_state(state, state_file)
+    return status
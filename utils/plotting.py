@@ -0,0 +1,204 @@
+"""
+lazy loading of matplotlib, scripts import pyplot only when a figure is made
+"""
+import os
+
+import numpy as np
+
+from utils.metrics import timed, stage
+
+BATCH_BACKEND = "Agg"
+
+
+def get_pyplot(backend=None, batch=False):
+    """
+
+    :param backend: matplotlib backend selected before pyplot is imported, None keeps matplotlib default
+    :param batch: use non interactive backend instead of backend
+    :return: matplotlib.pyplot module
+    """
+    import matplotlib
+    if batch:
+        backend = BATCH_BACKEND
+    if backend is not None:
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def parse_group_numbers(values):
+    """
+
+    :param values: list of group numbers and inclusive ranges, for example ["1", "4-7", "9,10"]
+    :return: list of group numbers in given order without duplicates
+    """
+    group_numbers = []
+    for value in values:
+        for item in str(value).split(","):
+            item = item.strip()
+            if len(item) == 0:
+                continue
+            if "-" in item:
+                first, last = item.split("-", 1)
+                numbers = range(int(first), int(last) + 1)
+            else:
+                numbers = [int(item)]
+            for number in numbers:
+                if number not in group_numbers:
+                    group_numbers.append(number)
+    return group_numbers
+
+
+def add_batch_arguments(parser):
+    """
+    add --batch and --output_dir arguments to argparse parser
+
+    :param parser: argparse parser
+    :return: None
+    """
+    parser.add_argument('--batch', action='store_true',
+                        help='non interactive backend, figures are saved to output directory instead of shown')
+    parser.add_argument('--output_dir', '--output-dir', type=str, default="plots",
+                        help='output directory of figures in batch mode')
+
+
+def show_or_save(plt, batch, output_dir, name, file_format="png"):
+    """
+    show all open figures or in batch mode save and close them
+
+    :param plt: matplotlib.pyplot module
+    :param batch: save figures instead of showing
+    :param output_dir: output directory of figures
+    :param name: file name of figures, figure number is appended if there are several open figures
+    :param file_format: file format of saved figures
+    :return: list of saved files
+    """
+    if not batch:
+        plt.show()
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    figure_numbers = plt.get_fignums()
+    saved_files = []
+    with stage("save_figures"):
+        for figure_number in figure_numbers:
+            suffix = "" if len(figure_numbers) == 1 else "_" + str(figure_number)
+            file = os.path.join(output_dir, name + suffix + "." + file_format)
+            figure = plt.figure(figure_number)
+            figure.savefig(file, format=file_format)
+            plt.close(figure)
+            saved_files.append(file)
+    return saved_files
+
+
+def velocity_colors(velocity, velocity_min, velocity_max, cmap="jet"):
+    """
+    colours of all spots at once, same as cm.jet((velocity - velocity_min) / (velocity_max - velocity_min), 1)
+
+    :param velocity: velocity of spots
+    :param velocity_min: velocity at start of colour map
+    :param velocity_max: velocity at end of colour map
+    :param cmap: name of colour map
+    :return: array of rgba colours, spots outside velocity range are black
+    """
+    from matplotlib import colormaps
+
+    velocity = np.asarray(velocity, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        colors = colormaps[cmap]((velocity - velocity_min) / (velocity_max - velocity_min), 1)
+    colors[(velocity < velocity_min) | (velocity > velocity_max)] = (0, 0, 0, 1)
+    return colors
+
+
+@timed("render")
+def draw_spots(ax, x, y, radius, colors, linewidth=2, autolim=False, **kwargs):
+    """
+    draw all spots of a map as one EllipseCollection instead of one Circle artist per spot
+
+    :param ax: matplotlib axes
+    :param x: ra of spots
+    :param y: dec of spots
+    :param radius: radius of spots in data units
+    :param colors: face colours of spots
+    :param linewidth: line width of spot edges
+    :param autolim: update data limits of axes as add_patch does, add_artist does not
+    :param kwargs: other EllipseCollection arguments, for example edgecolors or alpha
+    :return: EllipseCollection
+    """
+    from matplotlib.collections import EllipseCollection
+
+    diameter = 2 * np.broadcast_to(np.asarray(radius, dtype=float), np.shape(x))
+    collection = EllipseCollection(diameter, diameter, np.zeros(len(diameter)), units="xy",
+                                   offsets=np.column_stack((x, y)), offset_transform=ax.transData, facecolors=colors,
+                                   linewidths=linewidth, **kwargs)
+    ax.add_collection(collection, autolim=autolim)
+    if autolim:
+        ax.autoscale_view()
+    return collection
+
+
+@timed("render")
+def draw_spectrum(ax, velocity, intensity, colors, linewidth=2, **kwargs):
+    """
+    draw spectrum as one LineCollection of segments between neighbour channels
+
+    :param ax: matplotlib axes
+    :param velocity: velocity of channels
+    :param intensity: intensity of channels
+    :param colors: colour of every segment, segment i joins channels i and i + 1
+    :param linewidth: line width
+    :param kwargs: other LineCollection arguments
+    :return: LineCollection
+    """
+    from matplotlib.collections import LineCollection
+
+    points = np.column_stack((velocity, intensity))
+    collection = LineCollection(np.stack((points[:-1], points[1:]), axis=1), colors=colors[:len(points) - 1],
+                                linewidths=linewidth, **kwargs)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    return collection
+
+
+@timed("render")
+def draw_vectors(ax, x, y, dx, dy, color="black", **kwargs):
+    """
+    draw all motion vectors of one layer with one quiver call, every arrow goes from (x, y) to (x + dx, y + dy) in
+    data units with head at (x + dx, y + dy) as annotate with arrowstyle "<-"
+
+    :param ax: matplotlib axes
+    :param x: ra of vector starts
+    :param y: dec of vector starts
+    :param dx: ra displacement in data units
+    :param dy: dec displacement in data units
+    :param color: colour of arrows
+    :param kwargs: other quiver arguments, for example label or width
+    :return: Quiver
+    """
+    kwargs.setdefault("width", 0.002)
+    kwargs.setdefault("headwidth", 4)
+    kwargs.setdefault("headlength", 5)
+    kwargs.setdefault("headaxislength", 4.5)
+    return ax.quiver(x, y, dx, dy, angles="xy", scale_units="xy", scale=1, color=color, **kwargs)
+
+
+@timed("render")
+def draw_segments(ax, x1, y1, x2, y2, color="grey", **kwargs):
+    """
+    draw line segments from (x1, y1) to (x2, y2) as one LineCollection, for example error wedges of vectors
+
+    :param ax: matplotlib axes
+    :param x1: x of segment starts
+    :param y1: y of segment starts
+    :param x2: x of segment ends
+    :param y2: y of segment ends
+    :param color: colour of segments
+    :param kwargs: other LineCollection arguments, for example alpha
+    :return: LineCollection
+    """
+    from matplotlib.collections import LineCollection
+
+    segments = np.stack((np.column_stack((x1, y1)), np.column_stack((x2, y2))), axis=1)
+    collection = LineCollection(segments, colors=color, **kwargs)
+    ax.add_collection(collection, autolim=False)
+    return collection
@@ -0,0 +1,125 @@
+"""
+straight line fits of spot positions against time
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from utils.metrics import timed
+
+LinearFit = namedtuple("LinearFit", ["slope", "intercept", "covariance", "slope_err", "intercept_err", "points"])
+
+
+@timed("motion_fit")
+def fit_linear_motions(t, values, sigma=None, absolute_sigma=False):
+    """
+    weighted least squares fit of values = slope * t + intercept for every feature at once, same result as
+    curve_fit of straight line for each feature
+
+    :param t: time of epochs
+    :param values: array features x epochs, nan marks missing epoch
+    :param sigma: one standard deviation errors of values, array features x epochs or None
+    :param absolute_sigma: if False covariance is scaled by reduced chi square as in curve_fit
+    :return: LinearFit with arrays of one value per feature, covariance is array features x 2 x 2 with order
+    slope, intercept, features with less than 2 epochs have nan parameters
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    t = np.broadcast_to(np.asarray(t, dtype=float), values.shape)
+    if sigma is None:
+        weights = np.ones(values.shape)
+    else:
+        weights = 1.0 / np.broadcast_to(np.asarray(sigma, dtype=float), values.shape) ** 2
+
+    # missing epochs get zero weight, so every feature is solved with its own normal equations in one pass
+    observed = np.isfinite(values) & np.isfinite(weights)
+    weights = np.where(observed, weights, 0.0)
+    values = np.where(observed, values, 0.0)
+    points = observed.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sum_of_weights = weights.sum(axis=1)
+        t_mean = (weights * t).sum(axis=1) / sum_of_weights
+        values_mean = (weights * values).sum(axis=1) / sum_of_weights
+        dt = np.where(observed, t - t_mean[:, None], 0.0)
+        stt = (weights * dt ** 2).sum(axis=1)
+        slope = (weights * dt * (values - values_mean[:, None])).sum(axis=1) / stt
+        intercept = values_mean - slope * t_mean
+
+        residuals = np.where(observed, values - (slope[:, None] * t + intercept[:, None]), 0.0)
+        chi2 = (weights * residuals ** 2).sum(axis=1)
+        scale = np.ones(len(values)) if absolute_sigma else \
+            np.where(points > 2, chi2 / (points - 2), np.inf)
+
+        covariance = np.empty((len(values), 2, 2))
+        covariance[:, 0, 0] = scale / stt
+        covariance[:, 0, 1] = covariance[:, 1, 0] = -t_mean * scale / stt
+        covariance[:, 1, 1] = scale * (1.0 / sum_of_weights + t_mean ** 2 / stt)
+
+    slope[points < 2] = np.nan
+    intercept[points < 2] = np.nan
+    covariance[points < 2] = np.nan
+    return LinearFit(slope, intercept, covariance, np.sqrt(covariance[:, 0, 0]), np.sqrt(covariance[:, 1, 1]),
+                     points)
+
+
+def empty_motion_sums(size):
+    """
+
+    :param size: number of features
+    :return: array features x 6 of running sums n, t mean, values mean, sum of squared t deviations, sum of products
+    of t and values deviations and sum of squared values deviations, all zero
+    """
+    return np.zeros((size, 6))
+
+
+def update_motion_sums(sums, t, values):
+    """
+    rank one update of running sums of unweighted straight line fits with one new epoch of every feature, deviations
+    are accumulated around running means, so sums stay accurate for large t
+
+    :param sums: array features x 6 from empty_motion_sums, updated in place
+    :param t: time of new epoch, scalar or array of one time per feature
+    :param values: value of every feature in new epoch, nan marks feature without new epoch
+    :return: sums
+    """
+    values = np.asarray(values, dtype=float)
+    t = np.broadcast_to(np.asarray(t, dtype=float), values.shape)
+    observed = np.isfinite(values)
+    n = sums[observed, 0] + 1
+    dt = t[observed] - sums[observed, 1]
+    dv = values[observed] - sums[observed, 2]
+    sums[observed, 0] = n
+    sums[observed, 1] += dt / n
+    sums[observed, 2] += dv / n
+    sums[observed, 3] += dt * (t[observed] - sums[observed, 1])
+    sums[observed, 4] += dt * (values[observed] - sums[observed, 2])
+    sums[observed, 5] += dv * (values[observed] - sums[observed, 2])
+    return sums
+
+
+def fit_motion_sums(sums):
+    """
+    straight line fits from running sums, same result as fit_linear_motions without sigma
+
+    :param sums: array features x 6 from update_motion_sums
+    :return: LinearFit with arrays of one value per feature
+    """
+    points = sums[:, 0].astype(int)
+    t_mean = sums[:, 1]
+    stt = sums[:, 3]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = sums[:, 4] / stt
+        intercept = sums[:, 2] - slope * t_mean
+        chi2 = np.maximum(sums[:, 5] - slope * sums[:, 4], 0.0)
+        scale = np.where(points > 2, chi2 / (points - 2), np.inf)
+
+        covariance = np.empty((len(sums), 2, 2))
+        covariance[:, 0, 0] = scale / stt
+        covariance[:, 0, 1] = covariance[:, 1, 0] = -t_mean * scale / stt
+        covariance[:, 1, 1] = scale * (1.0 / points + t_mean ** 2 / stt)
+
+    slope[points < 2] = np.nan
+    intercept[points < 2] = np.nan
+    covariance[points < 2] = np.nan
+    return LinearFit(slope, intercept, covariance, np.sqrt(covariance[:, 0, 0]), np.sqrt(covariance[:, 1, 1]),
+                     points)
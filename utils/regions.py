@@ -0,0 +1,145 @@
+"""
+mean motions of spots aggregated over regions
+"""
+import numpy as np
+
+from utils.metrics import timed
+
+
+def box_membership(x, y, boxes):
+    """
+
+    :param x: ra of spots
+    :param y: dec of spots
+    :param boxes: list of [x max, x min, y max, y min], borders are excluded
+    :return: boolean array regions x spots
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    boxes = np.asarray(boxes, dtype=float).reshape((-1, 4))
+    return (x[None, :] < boxes[:, 0:1]) & (x[None, :] > boxes[:, 1:2]) & \
+           (y[None, :] < boxes[:, 2:3]) & (y[None, :] > boxes[:, 3:4])
+
+
+def polygon_membership(x, y, polygons):
+    """
+
+    :param x: ra of spots
+    :param y: dec of spots
+    :param polygons: list of polygons, each polygon is list of (x, y) vertexes
+    :return: boolean array regions x spots
+    """
+    from matplotlib.path import Path
+
+    points = np.column_stack((x, y))
+    return np.array([Path(polygon).contains_points(points) for polygon in polygons], dtype=bool).reshape(
+        (len(polygons), len(points)))
+
+
+def label_membership(labels):
+    """
+
+    :param labels: cluster label of every spot, negative labels are not in any region
+    :return: boolean array regions x spots, one region for every label from 0 to max label
+    """
+    labels = np.asarray(labels, dtype=int)
+    return labels[None, :] == np.arange(0, labels.max() + 1 if len(labels) > 0 else 0)[:, None]
+
+
+def aggregate_regions(membership, velocity, x, y, flux, reference=0):
+    """
+    per region and epoch sums of spot positions and displacements from reference epoch
+
+    :param membership: boolean array regions x spots
+    :param velocity: velocity of spots
+    :param x: ra of spots, array epochs x spots
+    :param y: dec of spots, array epochs x spots
+    :param flux: flux of spots, array epochs x spots
+    :param reference: index of reference epoch
+    :return: dict with index of "reference" epoch and arrays, "count" and "velocity" (mean) have one value per
+    region, "x", "y" (mean position), "dx", "dy" (summed displacement), "mean_dx", "mean_dy", "length" (length of
+    summed displacement), "mean_length" and "max_flux" are arrays regions x epochs
+    """
+    membership = np.asarray(membership, dtype=bool)
+    weights = membership.astype(float)
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    flux = np.atleast_2d(np.asarray(flux, dtype=float))
+
+    count = weights.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inverse_count = 1.0 / count
+        dx = weights @ (x - x[reference]).T
+        dy = weights @ (y - y[reference]).T
+        length = np.sqrt(dx ** 2 + dy ** 2)
+        result = {"reference": reference, "count": count.astype(int),
+                  "velocity": weights @ np.asarray(velocity, dtype=float) * inverse_count,
+                  "x": weights @ x.T * inverse_count[:, None],
+                  "y": weights @ y.T * inverse_count[:, None],
+                  "dx": dx, "dy": dy,
+                  "mean_dx": dx * inverse_count[:, None],
+                  "mean_dy": dy * inverse_count[:, None],
+                  "length": length,
+                  "mean_length": length * inverse_count[:, None],
+                  "max_flux": np.where(membership[:, None, :], flux[None, :, :], -np.inf).max(axis=2,
+                                                                                            initial=-np.inf)}
+    return result
+
+
+@timed("aggregate")
+def aggregate_runs(starts, ends, velocity, x, y, flux):
+    """
+    per group sums of mean_motion.py, groups are disjoint runs of rows, see utils.matching.close_runs
+
+    :param starts: first row of every run
+    :param ends: last row of every run
+    :param velocity: velocity of rows
+    :param x: ra of rows, array epochs x rows
+    :param y: dec of rows, array epochs x rows
+    :param flux: flux of rows, array epochs x rows
+    :return: dict with "count" and "velocity" (sum) with one value per run, "x", "y" (sums) and "max_flux" arrays
+    epochs x runs, "dx", "dy" (summed displacement from first epoch) arrays epochs - 1 x runs
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    flux = np.atleast_2d(np.asarray(flux, dtype=float))
+    starts = np.asarray(starts, dtype=int)
+    ends = np.asarray(ends, dtype=int)
+    count = ends - starts + 1
+    if len(count) == 0:
+        empty = np.empty((len(x), 0))
+        return {"count": count, "velocity": np.empty(0), "x": empty, "y": empty, "max_flux": empty,
+                "dx": empty[1:], "dy": empty[1:]}
+
+    # every per run sum is one reduceat over the gathered rows
+    members = np.concatenate([np.arange(start, end + 1) for start, end in zip(starts, ends)]).astype(int)
+    offsets = np.concatenate(([0], np.cumsum(count)[:-1])).astype(int)
+    return {"count": count,
+            "velocity": np.add.reduceat(np.asarray(velocity, dtype=float)[members], offsets),
+            "x": np.add.reduceat(x[:, members], offsets, axis=1),
+            "y": np.add.reduceat(y[:, members], offsets, axis=1),
+            "max_flux": np.maximum.reduceat(flux[:, members], offsets, axis=1),
+            "dx": np.add.reduceat(x[1:, members] - x[0, members], offsets, axis=1),
+            "dy": np.add.reduceat(y[1:, members] - y[0, members], offsets, axis=1)}
+
+
+def motion_table(regions, epoch, flux_epochs=None):
+    """
+    table of mean_motion1.py positionanglemotion files
+
+    :param regions: result of aggregate_regions
+    :param epoch: index of second epoch
+    :param flux_epochs: epochs used for maximal flux, default all
+    :return: array with columns velocity, x, y, dx, dy, mean dx, mean dy, length, mean length, x and y of
+    second epoch, max flux for every non empty region
+    """
+    if flux_epochs is None:
+        flux_epochs = slice(None)
+    reference = regions["reference"]
+    table = np.column_stack((regions["velocity"], regions["x"][:, reference], regions["y"][:, reference],
+                             regions["dx"][:, epoch], regions["dy"][:, epoch],
+                             regions["mean_dx"][:, epoch], regions["mean_dy"][:, epoch],
+                             regions["length"][:, epoch], regions["mean_length"][:, epoch],
+                             regions["x"][:, epoch], regions["y"][:, epoch],
+                             regions["max_flux"][:, flux_epochs].max(axis=1)))
+    return table[regions["count"] > 0]
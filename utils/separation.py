@@ -0,0 +1,184 @@
+"""
+vectorized separations between spots
+"""
+import numpy as np
+
+UNITS = {"rad": 1.0, "deg": np.pi / 180.0, "arcsec": np.pi / (180.0 * 3600.0),
+         "mas": np.pi / (180.0 * 3600.0 * 1000.0)}
+
+BLOCK_SIZE = 1024
+HULL_THRESHOLD = 2048
+
+
+def separation(ra1, dec1, ra2, dec2, unit="arcsec"):
+    """
+    great circle distance with Vincenty formula (same as astropy SkyCoord.separation), broadcasts over arrays
+
+    :param ra1: right ascension of first points
+    :param dec1: declination of first points
+    :param ra2: right ascension of second points
+    :param dec2: declination of second points
+    :param unit: unit of input and output angles
+    :return: separation in unit
+    """
+    scale = UNITS[unit]
+    ra1 = np.asarray(ra1, dtype=float) * scale
+    dec1 = np.asarray(dec1, dtype=float) * scale
+    ra2 = np.asarray(ra2, dtype=float) * scale
+    dec2 = np.asarray(dec2, dtype=float) * scale
+
+    sin_delta_ra = np.sin(ra2 - ra1)
+    cos_delta_ra = np.cos(ra2 - ra1)
+    sin_dec1 = np.sin(dec1)
+    sin_dec2 = np.sin(dec2)
+    cos_dec1 = np.cos(dec1)
+    cos_dec2 = np.cos(dec2)
+
+    num1 = cos_dec2 * sin_delta_ra
+    num2 = cos_dec1 * sin_dec2 - sin_dec1 * cos_dec2 * cos_delta_ra
+    denominator = sin_dec1 * sin_dec2 + cos_dec1 * cos_dec2 * cos_delta_ra
+    return np.arctan2(np.hypot(num1, num2), denominator) / scale
+
+
+def separation_matrix(ra, dec, unit="arcsec"):
+    """
+
+    :param ra: right ascension of points
+    :param dec: declination of points
+    :param unit: unit of input and output angles
+    :return: n x n matrix of separations
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    return separation(ra[:, None], dec[:, None], ra[None, :], dec[None, :], unit=unit)
+
+
+def pairwise_distances(ra, dec):
+    """
+    euclidean distances of all pairs j < k in the same order as nested j, k loop
+
+    :param ra: ra offsets
+    :param dec: dec offsets
+    :return: condensed distance array of length n * (n - 1) / 2
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    j, k = np.triu_indices(len(ra), k=1)
+    return np.hypot(ra[j] - ra[k], dec[j] - dec[k])
+
+
+def convex_hull(x, y):
+    """
+    monotone chain convex hull
+
+    :param x: x coordinates
+    :param y: y coordinates
+    :return: indexes of hull vertices in counter clockwise order
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.lexsort((y, x))
+    if len(order) < 3:
+        return order
+
+    def cross(o, a, b):
+        return (x[a] - x[o]) * (y[b] - y[o]) - (y[a] - y[o]) * (x[b] - x[o])
+
+    lower = []
+    for point in order:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+
+    upper = []
+    for point in order[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+
+    return np.array(lower[:-1] + upper[:-1], dtype=int)
+
+
+def _rotating_calipers(x, y, hull):
+    """
+
+    :return: indexes of most distant pair of hull vertices
+    """
+    h = len(hull)
+    if h == 1:
+        return hull[0], hull[0]
+    if h == 2:
+        return hull[0], hull[1]
+
+    def area(a, b, c):
+        return abs((x[b] - x[a]) * (y[c] - y[a]) - (y[b] - y[a]) * (x[c] - x[a]))
+
+    def distance2(a, b):
+        return (x[a] - x[b]) ** 2 + (y[a] - y[b]) ** 2
+
+    best = (distance2(hull[0], hull[1]), hull[0], hull[1])
+    k = 1
+    for i in range(0, h):
+        i_next = (i + 1) % h
+        while area(hull[i], hull[i_next], hull[(k + 1) % h]) > area(hull[i], hull[i_next], hull[k]):
+            k = (k + 1) % h
+        for a, b in ((hull[i], hull[k]), (hull[i_next], hull[k])):
+            if distance2(a, b) > best[0]:
+                best = (distance2(a, b), a, b)
+    return best[1], best[2]
+
+
+def _max_separation_blocks(ra, dec, unit):
+    best_separation = -1.0
+    best_pair = (0, -1)
+    for start in range(0, len(ra), BLOCK_SIZE):
+        block = separation(ra[start:start + BLOCK_SIZE, None], dec[start:start + BLOCK_SIZE, None],
+                           ra[None, :], dec[None, :], unit=unit)
+        flat_index = np.argmax(block)
+        if block.flat[flat_index] > best_separation:
+            best_separation = block.flat[flat_index]
+            best_pair = (start + flat_index // len(ra), flat_index % len(ra))
+    return best_pair, best_separation
+
+
+def find_max_separation(ra, dec, unit="arcsec", method="auto", return_matrix=False, return_sizes=False):
+    """
+    find most separated pair of points
+
+    :param ra: right ascension of points
+    :param dec: declination of points
+    :param unit: unit of input and output angles
+    :param method: "matrix" for exact search over all pairs, "hull" for convex hull with rotating calipers on
+    ra, dec offsets (valid for small fields), "auto" selects hull for large groups
+    :param return_matrix: add full separation matrix to result under key "matrix"
+    :param return_sizes: add condensed euclidean distances of all pairs to result under key "size"
+    :return: dict with indexes "r", "d" of most separated pair and their "separation"
+    """
+    ra = np.asarray(ra, dtype=float)
+    dec = np.asarray(dec, dtype=float)
+    result = {"r": 0, "d": -1, "separation": 0}
+
+    if method == "auto":
+        method = "hull" if len(ra) > HULL_THRESHOLD and not return_matrix else "matrix"
+
+    if len(ra) >= 2:
+        if method == "hull":
+            x = ra * np.cos(dec * UNITS[unit])
+            r, d = _rotating_calipers(x, dec, convex_hull(x, dec))
+            r, d = min(r, d), max(r, d)
+            separation_ = separation(ra[r], dec[r], ra[d], dec[d], unit=unit)
+        elif method == "matrix":
+            (r, d), separation_ = _max_separation_blocks(ra, dec, unit)
+        else:
+            raise ValueError("Unknown method " + str(method))
+
+        if separation_ > 0:
+            result = {"r": int(r), "d": int(d), "separation": float(separation_)}
+
+    if return_matrix:
+        result["matrix"] = separation_matrix(ra, dec, unit=unit)
+
+    if return_sizes:
+        result["size"] = pairwise_distances(ra, dec)
+
+    return result
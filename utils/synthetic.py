@@ -0,0 +1,165 @@
+"""
+synthetic maser surveys: epochs of spots in groups with gaussian spectra, noise and known proper motions, written
+in the .out and .groups column layouts with a matching configuration file
+"""
+import os
+import datetime
+
+import numpy as np
+
+from parsers.epoch_parser import GROUPS_DTYPE, OUT_DTYPE
+
+TRUTH_DTYPE = np.dtype([("group_nr", int), ("velocity", float), ("fwhm", float), ("amplitude", float),
+                        ("ra", float), ("dec", float), ("ra_slope", float), ("dec_slope", float)])
+
+GROUPS_FORMAT = ["%d"] + ["%.5f"] * (len(GROUPS_DTYPE.names) - 1)
+TRUTH_FORMAT = ["%d"] + ["%.18e"] * (len(TRUTH_DTYPE.names) - 1)
+FIRST_DATE = datetime.date(2004, 11, 6)
+
+
+def generate_survey(spots, epochs=5, spots_per_group=5, channel_width=0.05, velocity_range=(-10.0, 0.0),
+                    fwhm=0.3, noise=0.05, variability=0.3, spacing=30.0, group_size=0.3, position_noise=0.02,
+                    motion=0.3, detection=0.9, interval=730, seed=0):
+    """
+    spots of every group are consecutive channels of one gaussian line, group positions are uniform in a square
+    field with constant density, so matching work grows linearly with number of spots
+
+    :param spots: number of spots of every epoch when all groups are detected
+    :param epochs: number of epochs
+    :param spots_per_group: channels of every group
+    :param channel_width: velocity of one channel
+    :param velocity_range: range of group centre velocities
+    :param fwhm: mean full width at half maximum of lines, widths are drawn from 0.5 fwhm to 1.5 fwhm
+    :param noise: standard deviation of intensity noise
+    :param variability: standard deviation of log of amplitude change between epochs
+    :param spacing: mean distance between neighbour groups in mas
+    :param group_size: standard deviation of spot positions around group position in mas
+    :param position_noise: standard deviation of spot position noise of every epoch in mas
+    :param motion: standard deviation of proper motion in mas per year
+    :param detection: probability that a group is detected in an epoch
+    :param interval: days between epochs
+    :param seed: random seed
+    :return: dict with "epochs" names, "dates" (d.m.yyyy), "mjd" array, "groups" list of GROUPS_DTYPE arrays and
+    "spot_id" list of arrays (group_nr * spots_per_group + channel of group) of every epoch, "spots_per_group" and
+    "truth" TRUTH_DTYPE array of every group, slopes are mas per day
+    """
+    random = np.random.default_rng(seed)
+    group_count = max(1, int(np.ceil(spots / spots_per_group)))
+    field = spacing * np.sqrt(group_count)
+
+    truth = np.empty(group_count, dtype=TRUTH_DTYPE)
+    truth["group_nr"] = np.arange(0, group_count)
+    truth["velocity"] = random.uniform(velocity_range[0], velocity_range[1], group_count)
+    truth["fwhm"] = fwhm * random.uniform(0.5, 1.5, group_count)
+    truth["amplitude"] = np.exp(random.normal(0.0, 1.0, group_count))
+    truth["ra"] = random.uniform(-field / 2, field / 2, group_count)
+    truth["dec"] = random.uniform(-field / 2, field / 2, group_count)
+    truth["ra_slope"] = random.normal(0.0, motion, group_count) / 365.25
+    truth["dec_slope"] = random.normal(0.0, motion, group_count) / 365.25
+
+    # channels of every group are centred on channel of its velocity
+    centre_channel = np.round((truth["velocity"] - velocity_range[0]) / channel_width)
+    channel = (centre_channel[:, None] + np.arange(0, spots_per_group) - spots_per_group // 2).ravel()
+    spot_group = np.repeat(np.arange(0, group_count), spots_per_group)
+    velocity = velocity_range[0] + channel * channel_width
+    sigma = truth["fwhm"][spot_group] / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+    profile = np.exp(-0.5 * ((velocity - truth["velocity"][spot_group]) / sigma) ** 2)
+    ra_offset = random.normal(0.0, group_size, len(channel))
+    dec_offset = random.normal(0.0, group_size, len(channel))
+
+    days = np.arange(0, epochs) * interval
+    dates = [FIRST_DATE + datetime.timedelta(days=int(day)) for day in days]
+    survey = {"epochs": ["sy%03d" % (epoch + 1) for epoch in range(0, epochs)],
+              "dates": ["%d.%d.%d" % (date.day, date.month, date.year) for date in dates],
+              "mjd": np.array([(date - datetime.date(1858, 11, 17)).days for date in dates], dtype=float),
+              "groups": [], "spot_id": [], "spots_per_group": spots_per_group, "truth": truth}
+    for epoch in range(0, epochs):
+        detected = np.repeat(random.random(group_count) < detection, spots_per_group)
+        amplitude = truth["amplitude"] * np.exp(random.normal(0.0, variability, group_count))
+        data = np.empty(int(detected.sum()), dtype=GROUPS_DTYPE)
+        data["group_nr"] = spot_group[detected]
+        data["channel"] = channel[detected]
+        data["velocity"] = velocity[detected]
+        intensity = amplitude[spot_group] * profile + random.normal(0.0, noise, len(channel))
+        data["intensity"] = intensity[detected]
+        data["integral"] = intensity[detected] * channel_width
+        data["ra"] = (truth["ra"][spot_group] + ra_offset + truth["ra_slope"][spot_group] * days[epoch] +
+                      random.normal(0.0, position_noise, len(channel)))[detected]
+        data["dec"] = (truth["dec"][spot_group] + dec_offset + truth["dec_slope"][spot_group] * days[epoch] +
+                       random.normal(0.0, position_noise, len(channel)))[detected]
+        survey["groups"].append(data)
+        survey["spot_id"].append(np.flatnonzero(detected))
+    return survey
+
+
+def out_table(groups):
+    """
+
+    :param groups: GROUPS_DTYPE array
+    :return: OUT_DTYPE array of same spots
+    """
+    data = np.empty(len(groups), dtype=OUT_DTYPE)
+    for name in OUT_DTYPE.names:
+        data[name] = groups[name]
+    return data
+
+
+def track_table(survey):
+    """
+    table of spots detected in all epochs in test.py output layout, rows are in group order, so spots of a group are
+    consecutive rows as mean_motion.py expects
+
+    :param survey: result of generate_survey
+    :return: array rows x (1 + 3 * epochs) of vel and ra, dec, flux1 of every epoch
+    """
+    spot_count = len(survey["truth"]) * survey["spots_per_group"]
+    rows = np.full((len(survey["epochs"]), spot_count), -1)
+    for epoch in range(0, len(survey["epochs"])):
+        rows[epoch, survey["spot_id"][epoch]] = np.arange(0, len(survey["spot_id"][epoch]))
+    complete = (rows >= 0).all(axis=0)
+
+    data = np.empty((int(complete.sum()), 1 + 3 * len(survey["epochs"])))
+    for epoch in range(0, len(survey["epochs"])):
+        spots = survey["groups"][epoch][rows[epoch, complete]]
+        data[:, 0] = spots["velocity"]
+        data[:, 1 + 3 * epoch] = spots["ra"]
+        data[:, 2 + 3 * epoch] = spots["dec"]
+        data[:, 3 + 3 * epoch] = spots["intensity"]
+    return data
+
+
+def write_survey(survey, directory):
+    """
+    write data_files/<epoch>.out, groups/<epoch>.groups, config/config.cfg with paths, file order and dates of survey,
+    output2/output.dat track table and truth.dat with true parameters of groups
+
+    :param survey: result of generate_survey
+    :param directory: survey directory
+    :return: None
+    """
+    for sub_directory in ["data_files", "groups", "config", "output2"]:
+        os.makedirs(os.path.join(directory, sub_directory), exist_ok=True)
+
+    for epoch, groups in zip(survey["epochs"], survey["groups"]):
+        np.savetxt(os.path.join(directory, "data_files", epoch + ".out"), out_table(groups))
+        np.savetxt(os.path.join(directory, "groups", epoch + ".groups"), groups, fmt=GROUPS_FORMAT)
+
+    header = ['vel']
+    for epoch in survey["epochs"]:
+        header.extend(["ra_" + epoch + ".out", "dec_" + epoch + ".out", "flux1_" + epoch + ".out"])
+    np.savetxt(os.path.join(directory, "output2", "output.dat"), track_table(survey), delimiter=",",
+               header=",".join(header))
+    np.savetxt(os.path.join(directory, "truth.dat"), survey["truth"], delimiter=",", fmt=TRUTH_FORMAT,
+               header=",".join(TRUTH_DTYPE.names))
+
+    with open(os.path.join(directory, "config", "config.cfg"), "w") as config_file:
+        config_file.write("[paths]\n")
+        config_file.write("dataFiles:" + os.path.join(os.path.abspath(directory), "data_files", "") + "\n\n")
+        config_file.write("[parameters]\n")
+        config_file.write("fileOrder:" + ", ".join(epoch + ".out" for epoch in survey["epochs"]) + "\n")
+        config_file.write("dates:" + ", ".join(epoch + "-" + date for epoch, date in
+                                               zip(survey["epochs"], survey["dates"])) + "\n")
+        config_file.write("gauss:" + ";".join(epoch.upper() + ":" for epoch in survey["epochs"]) + "\n\n")
+        config_file.write("[grouops]\n")
+        for epoch in survey["epochs"]:
+            config_file.write(epoch + ":0," + str(survey["spots_per_group"]) + "\n")
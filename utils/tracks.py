@@ -0,0 +1,286 @@
+"""
+persisted cross epoch matching state, new epochs are matched against saved epochs and motion fits of tracks are
+updated with rank one updates, result is the same as matching all epochs of test.py at once
+"""
+import os
+import json
+import pickle
+
+import numpy as np
+
+from parsers.epoch_parser import file_checksum
+from utils.matching import UnionFind, velocities_match
+from utils.metrics import timed
+from utils.proper_motion import empty_motion_sums, update_motion_sums, fit_motion_sums
+
+SPOT_COLUMNS = ["ch", "velocity", "flux1", "flux2", "ra", "dec", "epoch"]
+
+
+def source_signature(file):
+    """
+
+    :param file: epoch file
+    :return: [size, mtime, checksum] of file
+    """
+    stat = os.stat(file)
+    return [stat.st_size, stat.st_mtime_ns, file_checksum(file)]
+
+
+def is_same_source(signature, file):
+    """
+
+    :param signature: saved source_signature
+    :param file: epoch file
+    :return: True if file content is unchanged, checksum is computed only when size or mtime changed
+    """
+    if not os.path.isfile(file):
+        return False
+    stat = os.stat(file)
+    if [stat.st_size, stat.st_mtime_ns] == signature[0:2]:
+        return True
+    return stat.st_size == signature[0] and file_checksum(file) == signature[2]
+
+
+def update_motion_sums_at(sums, rows, t, values):
+    """
+    update_motion_sums of selected rows
+
+    :param sums: array features x 6
+    :param rows: indexes of updated features
+    :param t: time of epoch
+    :param values: value of every selected feature, nan marks missing
+    :return: None
+    """
+    block = sums[rows]
+    update_motion_sums(block, t, values)
+    sums[rows] = block
+
+
+class Tracks:
+    """
+    spots of ingested epochs, union find forest of matched spots and per track first spot of every epoch and running
+    sums of ra and dec motion fits, per track values are valid at union find roots
+    """
+
+    def __init__(self, radius=10.0, velocity_window=20.0, rel_tol=100.0):
+        """
+
+        :param radius: matching radius, see utils.matching.match_epochs
+        :param velocity_window: see utils.matching.velocities_match
+        :param rel_tol: see utils.matching.velocities_match
+        """
+        self.parameters = {"radius": radius, "velocity_window": velocity_window, "rel_tol": rel_tol}
+        self.files = []
+        self.mjd = []
+        self.sources = []
+        self.spots = {column: np.empty(0) for column in SPOT_COLUMNS}
+        self.spots["epoch"] = np.empty(0, dtype=int)
+        self.offsets = np.zeros(1, dtype=int)
+        self.first_spot = np.empty((0, 0), dtype=int)
+        self.ra_sums = empty_motion_sums(0)
+        self.dec_sums = empty_motion_sums(0)
+        self._union_find = UnionFind(0)
+        self._trees = []
+        self._saved_trees = 0
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def t(self):
+        """
+
+        :return: days of ingested epochs from first epoch
+        """
+        return np.array(self.mjd) - self.mjd[0]
+
+    def is_prefix_of(self, files, data_file_path, parameters=None, mjd=None):
+        """
+
+        :param files: epoch files in configuration file order
+        :param data_file_path: directory of epoch files
+        :param parameters: matching parameters, default parameters of these tracks
+        :param mjd: MJD of every file of files, default MJD of ingested epochs
+        :return: True if ingested epochs are unchanged first files with unchanged dates, so only later files have to
+        be ingested
+        """
+        if parameters is not None and parameters != self.parameters:
+            return False
+        if self.files != files[0:len(self.files)]:
+            return False
+        # motion sums are in days from first epoch, so every changed date invalidates them
+        if mjd is not None and self.mjd != [float(day) for day in mjd[0:len(self.mjd)]]:
+            return False
+        return all(is_same_source(self.sources[index], os.path.join(data_file_path, self.files[index]))
+                   for index in range(0, len(self.files)))
+
+    @timed("ingest")
+    def ingest(self, file, data, mjd, source=None):
+        """
+        add epoch after all ingested epochs, its spots are matched against spots of every ingested epoch, tracks
+        that only get new spots are updated with one rank one update, tracks merged by new spots are refitted
+
+        :param file: epoch file name
+        :param data: structured array of .out file, see parsers.epoch_parser.load_out
+        :param mjd: MJD of epoch
+        :param source: source_signature of epoch file
+        :return: number of new matches
+        """
+        from scipy.spatial import cKDTree
+
+        epoch = len(self.files)
+        count = len(data)
+        first = self._union_find.add(count)
+        columns = {"ch": data["channel"], "velocity": data["velocity"], "flux1": data["intensity"],
+                   "flux2": data["integral"], "ra": data["ra"], "dec": data["dec"], "epoch": np.full(count, epoch)}
+        for column in SPOT_COLUMNS:
+            self.spots[column] = np.concatenate((self.spots[column], columns[column]))
+        self.files.append(file)
+        self.mjd.append(float(mjd))
+        self.sources.append(source)
+        self.offsets = np.append(self.offsets, first + count)
+
+        self.first_spot = np.pad(self.first_spot, ((0, count), (0, 1)), constant_values=-1)
+        self.ra_sums = np.concatenate((self.ra_sums, empty_motion_sums(count)))
+        self.dec_sums = np.concatenate((self.dec_sums, empty_motion_sums(count)))
+
+        tree = cKDTree(np.column_stack((data["ra"], data["dec"])))
+        old_nodes = [np.empty(0, dtype=int)]
+        new_nodes = [np.empty(0, dtype=int)]
+        for old_epoch in range(0, epoch):
+            pairs = self._trees[old_epoch].sparse_distance_matrix(tree, self.parameters["radius"],
+                                                                  output_type="ndarray")
+            pairs = pairs[pairs["v"] < self.parameters["radius"]]
+            node1 = self.offsets[old_epoch] + pairs["i"]
+            node2 = first + pairs["j"]
+            matched = velocities_match(self.spots["velocity"][node1], self.spots["velocity"][node2],
+                                       self.parameters["velocity_window"], self.parameters["rel_tol"])
+            old_nodes.append(node1[matched])
+            new_nodes.append(node2[matched])
+        self._trees.append(tree)
+        old_nodes = np.concatenate(old_nodes)
+        new_nodes = np.concatenate(new_nodes)
+
+        old_roots = [self._union_find.find(node) for node in old_nodes.tolist()]
+        self._union_find.union_edges(old_nodes, new_nodes)
+
+        # first new spot and ingested tracks of every track touched by the new epoch
+        new_spots = dict()
+        for node in range(first, first + count):
+            new_spots.setdefault(self._union_find.find(node), node)
+        merged = dict()
+        for node, old_root in zip(new_nodes.tolist(), old_roots):
+            merged.setdefault(self._union_find.find(node), set()).add(old_root)
+
+        roots = np.array(list(new_spots.keys()), dtype=int)
+        refit = []
+        for root in roots.tolist():
+            tracks = sorted(merged.get(root, set()))
+            if len(tracks) == 1:
+                self.first_spot[root] = self.first_spot[tracks[0]]
+                self.ra_sums[root] = self.ra_sums[tracks[0]]
+                self.dec_sums[root] = self.dec_sums[tracks[0]]
+            elif len(tracks) > 1:
+                # first spot of epoch has smallest index, so merged track takes smallest spot of every epoch
+                spots = self.first_spot[tracks]
+                self.first_spot[root] = np.where((spots >= 0).any(axis=0),
+                                                 np.where(spots >= 0, spots, len(self)).min(axis=0), -1)
+                refit.append(root)
+            self.first_spot[root, epoch] = new_spots[root]
+
+        t = self.t()
+        update_motion_sums_at(self.ra_sums, roots, t[epoch], self.spots["ra"][self.first_spot[roots, epoch]])
+        update_motion_sums_at(self.dec_sums, roots, t[epoch], self.spots["dec"][self.first_spot[roots, epoch]])
+        if len(refit) > 0:
+            self.ra_sums[refit] = 0.0
+            self.dec_sums[refit] = 0.0
+            for fit_epoch in range(0, epoch + 1):
+                spots = self.first_spot[refit, fit_epoch]
+                ra = np.where(spots >= 0, self.spots["ra"][spots], np.nan)
+                dec = np.where(spots >= 0, self.spots["dec"][spots], np.nan)
+                update_motion_sums_at(self.ra_sums, refit, t[fit_epoch], ra)
+                update_motion_sums_at(self.dec_sums, refit, t[fit_epoch], dec)
+        return len(new_nodes)
+
+    def roots(self):
+        """
+
+        :return: root spot of every track ordered by smallest spot of track
+        """
+        labels = self._union_find.labels()
+        roots = np.flatnonzero(labels == np.arange(len(labels)))
+        first_spot = np.where(self.first_spot[roots] >= 0, self.first_spot[roots], len(self))
+        return roots[np.argsort(first_spot.min(axis=1), kind="stable")]
+
+    def complete_tracks(self):
+        """
+
+        :return: array tracks x epochs of first spot of every epoch for tracks found in all epochs, ordered as
+        test.py output
+        """
+        first_spot = self.first_spot[self.roots()]
+        return first_spot[(first_spot >= 0).all(axis=1)]
+
+    def motions(self, min_epochs=2):
+        """
+
+        :param min_epochs: minimal number of epochs of track
+        :return: roots of tracks, LinearFit of ra and LinearFit of dec
+        """
+        roots = self.roots()
+        roots = roots[self.ra_sums[roots, 0] >= min_epochs]
+        return roots, fit_motion_sums(self.ra_sums[roots]), fit_motion_sums(self.dec_sums[roots])
+
+    def save(self, directory):
+        """
+
+        :param directory: state directory
+        :return: None
+        """
+        os.makedirs(directory, exist_ok=True)
+        # trees of ingested epochs do not change, only trees of epochs ingested after load are written
+        for epoch in range(self._saved_trees, len(self._trees)):
+            with open(os.path.join(directory, "tree_%d.pkl" % epoch), "wb") as tree_data:
+                pickle.dump(self._trees[epoch], tree_data, protocol=pickle.HIGHEST_PROTOCOL)
+        self._saved_trees = len(self._trees)
+        parent, size = self._union_find.arrays()
+        arrays = {"spot_" + column: self.spots[column] for column in SPOT_COLUMNS}
+        np.savez(os.path.join(directory, "state.tmp.npz"), offsets=self.offsets, first_spot=self.first_spot,
+                 ra_sums=self.ra_sums, dec_sums=self.dec_sums, parent=parent, size=size, **arrays)
+        with open(os.path.join(directory, "state.tmp.json"), "w") as state_data:
+            json.dump({"parameters": self.parameters, "files": self.files, "mjd": self.mjd, "sources": self.sources},
+                      state_data, indent=1)
+        os.replace(os.path.join(directory, "state.tmp.npz"), os.path.join(directory, "state.npz"))
+        os.replace(os.path.join(directory, "state.tmp.json"), os.path.join(directory, "state.json"))
+
+    @classmethod
+    def load(cls, directory):
+        """
+
+        :param directory: state directory
+        :return: saved Tracks or None if there is no valid saved state
+        """
+        try:
+            with open(os.path.join(directory, "state.json")) as state_data:
+                state = json.load(state_data)
+            arrays = np.load(os.path.join(directory, "state.npz"))
+            tracks = cls(**state["parameters"])
+            tracks.files = state["files"]
+            tracks.mjd = state["mjd"]
+            tracks.sources = state["sources"]
+            tracks.spots = {column: arrays["spot_" + column] for column in SPOT_COLUMNS}
+            tracks.offsets = arrays["offsets"]
+            tracks.first_spot = arrays["first_spot"]
+            tracks.ra_sums = arrays["ra_sums"]
+            tracks.dec_sums = arrays["dec_sums"]
+            tracks._union_find = UnionFind.from_arrays(arrays["parent"], arrays["size"])
+            tracks._trees = []
+            for epoch in range(0, len(tracks.files)):
+                with open(os.path.join(directory, "tree_%d.pkl" % epoch), "rb") as tree_data:
+                    tracks._trees.append(pickle.load(tree_data))
+            tracks._saved_trees = len(tracks._trees)
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            return None
+        if len(tracks.offsets) != len(tracks.files) + 1 or len(tracks.first_spot) != len(tracks):
+            return None
+        return tracks
+
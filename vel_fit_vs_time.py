@@ -1,13 +1,12 @@
 import sys
-import os
 import argparse
 import random
 
 import numpy as np
-from astropy.io import ascii
-import matplotlib.pyplot as plt
 
-from parsers.configparser_ import ConfigParser
+from parsers.cloudlet_catalog import CATALOG_FILE, read_cloudlets, import_sats_files
+from parsers.configparser_ import ConfigParser, get_file_order, get_dates
+from utils.plotting import get_pyplot
 
 
 def get_configs(section, key):
@@ -21,45 +20,33 @@ def get_configs(section, key):
     return config.get_config(section, key)
 
 
-def get_cloudlet_sub_files_for_group(cloudlet_sub_files, group):
-    file_order = [file.strip() for file in get_configs("parameters", "fileOrder").split(",")]
-    cloudlet_sub_files_for_group = [f for f in cloudlet_sub_files if int(f.split("_")[4].replace(".", "")) == group]
-    cloudlet_sub_files_for_group_tmp = [0] * len(file_order)
-    for file in file_order:
-        epoch = file.split(".")[0]
-        for c_file in cloudlet_sub_files_for_group:
-            c_epoch = c_file.split("_")[3]
-            if epoch == c_epoch:
-                cloudlet_sub_files_for_group_tmp[file_order.index(file)] = c_file
+def main(catalog_file, import_csv):
+    if import_csv:
+        print("imported", import_sats_files("./", catalog_file), "cloudlet_sub files")
+    cloudlets = read_cloudlets(catalog_file=catalog_file)
+    groups = np.unique(cloudlets["group_nr"])
+    epochs = [file.split(".")[0] for file in get_file_order()]
 
-    cloudlet_sub_files_for_group = cloudlet_sub_files_for_group_tmp
-    return cloudlet_sub_files_for_group
-
-
-def main():
-    cloudlet_sub_files = [file for file in os.listdir("./") if file.startswith("cloudlet_sub")]
-    groups = sorted(list(set([int(f.split("_")[4].replace(".", "")) for f in cloudlet_sub_files])))
-    cloudlet_sub_files_for_all_groups = {g: get_cloudlet_sub_files_for_group(cloudlet_sub_files, g) for g in groups}
-
-    dates = {file.split("-")[0].strip(): file.split("-")[1].strip() for file in
-             get_configs("parameters", "dates").split(",")}
+    dates = get_dates()
 
+    plt = get_pyplot()
     fig, ax = plt.subplots(nrows=1, ncols=1, figsize=(16, 16), dpi=120)
 
-    for group in groups:
+    # catalog rows are ordered by group, so rows of a group are one slice
+    group_starts = np.searchsorted(cloudlets["group_nr"], groups, side="left")
+    group_ends = np.searchsorted(cloudlets["group_nr"], groups, side="right")
+    for group_index in range(0, len(groups)):
         color = [random.uniform(0.3, 1.0), random.uniform(0.0, 0.3), random.uniform(0.0, 0.3)]
-        cloudlet_sub_files_for_group = cloudlet_sub_files_for_all_groups[group]
-        for file in cloudlet_sub_files_for_group:
-            if file != 0:
-                epoch = file.split("_")[3]
-                date = dates[epoch]
-                cloudlet_sub_data = ascii.read(file)
-                vel_fit = np.array(cloudlet_sub_data["vel_fit"], dtype=np.float)
-                fit_amp = np.array(cloudlet_sub_data["fit_amp"], dtype=np.float)
-                main_index = np.where(fit_amp == max(fit_amp))[0][0]
-                main_vel_fit = vel_fit[main_index]
-                main_fit_amp = fit_amp[main_index]
-                ax.scatter(date, main_vel_fit, s=100*main_fit_amp, edgecolor=color, alpha=0.9, facecolors='none')
+        start, end = group_starts[group_index], group_ends[group_index]
+        for epoch in epochs:
+            rows = start + np.where(cloudlets["epoch"][start:end] == epoch)[0]
+            fit_amp = cloudlets["fit_amp"][rows]
+            if len(rows) == 0 or np.all(np.isnan(fit_amp)):
+                continue
+            main_index = rows[np.nanargmax(fit_amp)]
+            main_vel_fit = cloudlets["vel_fit"][main_index]
+            main_fit_amp = cloudlets["fit_amp"][main_index]
+            ax.scatter(dates[epoch], main_vel_fit, s=100*main_fit_amp, edgecolor=color, alpha=0.9, facecolors='none')
 
     ax.set_xlabel("Observation epoch date")
     ax.set_ylabel("Velocity [km s$^{-1}$]")
@@ -68,6 +55,9 @@ def main():
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='vel_fit vs time')
+    parser.add_argument('--catalog', type=str, help='results catalog of cloudlet statistics', default=CATALOG_FILE)
+    parser.add_argument('--import_csv', action='store_true',
+                        help='first import cloudlet_sub csv files of working directory into catalog')
     args = parser.parse_args()
-    main()
+    main(args.catalog, args.import_csv)
     sys.exit(0)
\ No newline at end of file